@@ -1,20 +1,103 @@
 """Enhanced backend_app.py with device-specific monitoring and AI suggestions"""
 from __future__ import annotations
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, make_response, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
-from datetime import datetime, timedelta
+from scipy.signal import lfilter
+from datetime import date, datetime, timedelta, timezone
 import os
 import random
 import json # Import json module for direct dumping
+import logging
+import re
+import bisect
+import codecs
+import time
+import shutil
+import uuid
+import hashlib
+import zlib
+import threading
+import itertools
+import multiprocessing
+import tempfile
+import asyncio
+import io
+import sys
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, reduce, wraps
+from itertools import islice
+
+try:
+  import resource  # Unix only; used to report peak RSS after streaming uploads
+except ImportError:  # pragma: no cover - Windows
+  resource = None
+
+try:
+  import orjson  # optional fast JSON encoder; see json_dumps
+except ImportError:
+  orjson = None
+
+try:
+  import pyarrow as pa
+  import pyarrow.dataset as ds
+except ImportError:  # Parquet persistence is unavailable without pyarrow
+  pa = ds = None
 
 app = Flask(__name__)
 CORS(app)
 
-# Global DataFrame
-df: pd.DataFrame | None = None
+# Logging: "text" (event key=value) or "json" lines on stderr; DEBUG shows ingest and model details
+LOG_LEVEL = os.environ.get("ENERGY_LOG_LEVEL", "WARNING").upper()
+LOG_FORMAT = os.environ.get("ENERGY_LOG_FORMAT", "text").lower()
+# Serialize responses with orjson when it is installed, unless ENERGY_FAST_JSON=0
+FAST_JSON = orjson is not None and os.environ.get("ENERGY_FAST_JSON", "1").lower() not in ("0", "false", "no")
+
+# Published snapshot per tenant (household), least recently used first; see get_tenant.
+# Snapshots are never modified once published: writers build a new one and swap it in.
+tenants: OrderedDict[str, dict] = OrderedDict()
+# Serializes registry inserts and evictions; readers never take it
+_registry_lock = threading.Lock()
+# One writer at a time per tenant (see _tenant_lock)
+_tenant_locks: dict[str, threading.RLock] = {}
+# Data versions are unique across tenants and reloads
+_data_versions = itertools.count(1)
+DEFAULT_TENANT = "default"
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Tenants are evicted, least recently used first, once their readings exceed this budget
+TENANT_MEMORY_BUDGET_MB = float(os.environ.get("ENERGY_TENANT_MEMORY_MB", "2048"))
+
+# Updated without a lock, so counts can be slightly low under heavy concurrency
+registry_stats = {
+  "hits": 0,
+  "misses": 0,
+  "loads": 0,
+  "evictions": 0,
+}
+
+# Serialized read responses per tenant data version, least recently used first; see cached_response
+response_cache: OrderedDict[tuple, dict] = OrderedDict()
+_response_cache_lock = threading.Lock()
+RESPONSE_CACHE_MB = float(os.environ.get("ENERGY_RESPONSE_CACHE_MB", "64"))
+response_cache_stats = {
+  "hits": 0,
+  "misses": 0,
+  "not_modified": 0,
+  "stores": 0,
+  "evictions": 0,
+  "invalidations": 0,
+  "bytes": 0,
+}
+
+# Parquet persistence of ingested readings, enabled by pointing ENERGY_STORAGE_DIR at a directory
+STORAGE_DIR = os.environ.get("ENERGY_STORAGE_DIR")
+STORAGE_PARTITION_BY_DEVICE = os.environ.get("ENERGY_STORAGE_PARTITION_BY_DEVICE", "").lower() in ("1", "true", "yes")
 
 # Create static folder if it doesn't exist
 if not os.path.exists('static'):
@@ -30,6 +113,230 @@ DEVICE_CATEGORIES = {
   'Fan': {'min_power': 30, 'max_power': 100, 'efficiency_range': (85, 95)}
 }
 
+# ---------------------------------------------------------------------------
+# LOGGING AND JSON ENCODING
+# ---------------------------------------------------------------------------
+def _json_default(obj):
+  """Encode the NumPy scalars/arrays and dates analytics results may carry."""
+  if isinstance(obj, np.generic):
+      return obj.item()
+  if isinstance(obj, np.ndarray):
+      return obj.tolist()
+  if isinstance(obj, (datetime, date)):  # includes pd.Timestamp
+      return obj.isoformat()
+  raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def json_dumps(obj, sort_keys: bool = False, indent: bool = False) -> bytes:
+  """Serialize obj to compact UTF-8 JSON, with orjson when FAST_JSON is on."""
+  if FAST_JSON:
+      option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+      if sort_keys:
+          option |= orjson.OPT_SORT_KEYS
+      if indent:
+          option |= orjson.OPT_INDENT_2
+      return orjson.dumps(obj, default=_json_default, option=option)
+  separators = None if indent else (",", ":")
+  return json.dumps(obj, default=_json_default, sort_keys=sort_keys, indent=2 if indent else None,
+                    separators=separators, ensure_ascii=False).encode()
+
+class EnergyJSONProvider(DefaultJSONProvider):
+  """jsonify through json_dumps: NumPy values and dates encode natively, and orjson does the work when available."""
+  def dumps(self, obj, **kwargs) -> str:
+      if kwargs:
+          kwargs.setdefault("default", _json_default)
+          return super().dumps(obj, **kwargs)
+      return json_dumps(obj, sort_keys=self.sort_keys).decode()
+  
+  def loads(self, s, **kwargs):
+      if FAST_JSON and not kwargs:
+          return orjson.loads(s)
+      return super().loads(s, **kwargs)
+  
+  def response(self, *args, **kwargs):
+      obj = self._prepare_response_obj(args, kwargs)
+      indent = (self.compact is None and self._app.debug) or self.compact is False
+      with stage("serialize"):
+          body = json_dumps(obj, sort_keys=self.sort_keys, indent=indent) + b"\n"
+      return self._app.response_class(body, mimetype=self.mimetype)
+
+app.json = EnergyJSONProvider(app)
+
+class _EventFormatter(logging.Formatter):
+  """Formats log_event records as "event key=value ..." lines, or one JSON object per line."""
+  def format(self, record: logging.LogRecord) -> str:
+      fields = getattr(record, "fields", {})
+      if LOG_FORMAT == "json":
+          entry = {"time": self.formatTime(record), "level": record.levelname, "event": record.getMessage(), **fields}
+          if record.exc_info:
+              entry["exception"] = self.formatException(record.exc_info)
+          return json_dumps(entry).decode()
+      line = " ".join([self.formatTime(record), record.levelname, record.getMessage()]
+                      + [f"{key}={value}" for key, value in fields.items()])
+      if record.exc_info:
+          line += "\n" + self.formatException(record.exc_info)
+      return line
+
+logger = logging.getLogger("energy_tracker")
+if not logger.handlers:
+  _log_handler = logging.StreamHandler()
+  _log_handler.setFormatter(_EventFormatter())
+  logger.addHandler(_log_handler)
+  logger.propagate = False
+logger.setLevel(LOG_LEVEL)
+
+def log_event(level: int, event: str, **fields):
+  """
+  Log a named event with structured fields.
+
+  A disabled level costs one isEnabledFor check; guard fields that are expensive to
+  build (e.g. frame previews) with logger.isEnabledFor as well.
+  """
+  if logger.isEnabledFor(level):
+      logger.log(level, event, extra={"fields": fields})
+
+# ---------------------------------------------------------------------------
+# METRICS AND PROFILING
+# ---------------------------------------------------------------------------
+# Upper bounds (seconds) of the request latency and stage duration histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# With ENERGY_PROFILING=1, ?profile=1 (or an X-Profile: 1 header) returns a sampled stack profile
+# of the request instead of its response; one request is profiled at a time. Off by default, as
+# profiles expose source paths and sampling slows the whole process while it runs
+PROFILING_ENABLED = os.environ.get("ENERGY_PROFILING", "0").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_MS = float(os.environ.get("ENERGY_PROFILE_INTERVAL_MS", "1"))
+
+# Histograms as per-bucket counts (the last one is +Inf) plus the sum of observations
+_metrics_lock = threading.Lock()
+request_histograms: dict[tuple[str, str], dict] = {}  # (method, route)
+request_counts: dict[tuple[str, str, int], int] = {}  # (method, route, status)
+stage_histograms: dict[str, dict] = {}
+_profile_lock = threading.Lock()
+
+def _observe(histograms: dict, key, seconds: float):
+  """Add one observation to a histogram (holding _metrics_lock)."""
+  histogram = histograms.get(key)
+  if histogram is None:
+      histogram = histograms[key] = {"counts": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0}
+  histogram["counts"][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+  histogram["sum"] += seconds
+
+@contextmanager
+def stage(name: str):
+  """
+  Time a named stage of request work (parse, frame, groupby, model_fit, serialize, ...).
+
+  Durations feed the stage histograms of /api/metrics and, inside a request, its
+  Server-Timing header. Usable as a context manager or a function decorator.
+  """
+  started = time.perf_counter()
+  try:
+      yield
+  finally:
+      elapsed = time.perf_counter() - started
+      with _metrics_lock:
+          _observe(stage_histograms, name, elapsed)
+      if has_request_context() and "stage_timings" in g:
+          g.stage_timings.append((name, elapsed))
+
+class _StackSampler:
+  """Samples one thread's Python stack from a background thread, counting identical stacks."""
+  def __init__(self, thread_id: int, interval: float):
+      self.thread_id = thread_id
+      self.interval = interval
+      self.stacks = Counter()
+      self._labels = {}
+      self._stop = threading.Event()
+      # Let the sampler get the GIL about as often as it asks for it while profiling
+      self._switch_interval = sys.getswitchinterval()
+      sys.setswitchinterval(min(interval, self._switch_interval))
+      self.started = time.perf_counter()
+      self._thread = threading.Thread(target=self._run, name="energy-profiler", daemon=True)
+      self._thread.start()
+  
+  def _label(self, code) -> str:
+      label = self._labels.get(code)
+      if label is None:
+          label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+      return label
+  
+  def _run(self):
+      while not self._stop.wait(self.interval):
+          frame = sys._current_frames().get(self.thread_id)
+          if frame is None:
+              return
+          stack = []
+          while frame is not None:
+              stack.append(self._label(frame.f_code))
+              frame = frame.f_back
+          self.stacks[";".join(reversed(stack))] += 1
+  
+  def stop(self) -> str:
+      """Stop sampling; the stacks in folded format ("outer;...;inner count" per line) for flame graphs."""
+      self._stop.set()
+      self._thread.join()
+      sys.setswitchinterval(self._switch_interval)
+      self.elapsed = time.perf_counter() - self.started
+      return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _profile_requested() -> bool:
+  environ = request.environ
+  # Skip parsing the query string for the usual request that does not mention profiling
+  if "profile" not in environ.get("QUERY_STRING", "") and "HTTP_X_PROFILE" not in environ:
+      return False
+  flag = request.args.get("profile") or request.headers.get("X-Profile") or ""
+  return flag.lower() in ("1", "true", "yes")
+
+@app.before_request
+def _start_request_metrics():
+  context = g._get_current_object()
+  context.request_started = time.perf_counter()
+  context.stage_timings = []
+  context.profile_requested = _profile_requested()
+  if PROFILING_ENABLED and context.profile_requested and _profile_lock.acquire(blocking=False):
+      context.profiler = _StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+
+@app.after_request
+def _record_request_metrics(response):
+  context = g._get_current_object()
+  started = context.pop("request_started", None)
+  if started is None:
+      return response
+  elapsed = time.perf_counter() - started
+  # The rule, not the path, so device names and the like do not each become a series
+  rule = request.url_rule
+  method, route = request.method, rule.rule if rule is not None else "unmatched"
+  with _metrics_lock:
+      _observe(request_histograms, (method, route), elapsed)
+      key = (method, route, response.status_code)
+      request_counts[key] = request_counts.get(key, 0) + 1
+  response.headers["Server-Timing"] = ", ".join(
+      [f"{name};dur={seconds * 1000:.2f}" for name, seconds in context.stage_timings] + [f"total;dur={elapsed * 1000:.2f}"])
+  
+  profiler = context.pop("profiler", None)
+  if profiler is not None:
+      stacks = profiler.stop()
+      _profile_lock.release()
+      profiled = app.response_class(stacks, mimetype="text/plain")
+      profiled.headers.update({
+          "X-Profile-Samples": str(sum(profiler.stacks.values())),
+          "X-Profile-Interval-Ms": str(PROFILE_INTERVAL_MS),
+          "X-Profile-Status": str(response.status_code),
+          "Server-Timing": response.headers["Server-Timing"],
+          "Cache-Control": "no-store",
+      })
+      return profiled
+  if context.profile_requested:
+      response.headers["X-Profile"] = "busy" if PROFILING_ENABLED else "disabled"
+  return response
+
+@app.teardown_request
+def _stop_profiler(exc):
+  # Only left running if the request failed before after_request
+  profiler = g.pop("profiler", None)
+  if profiler is not None:
+      profiler.stop()
+      _profile_lock.release()
+
 # ---------------------------------------------------------------------------
 # SERVE STATIC FILES (HTML, CSS, JS)
 # ---------------------------------------------------------------------------
@@ -46,114 +353,1253 @@ def serve_static_files(filename):
 # ---------------------------------------------------------------------------
 # DATA PROCESSING FUNCTIONS
 # ---------------------------------------------------------------------------
-def load_data_from_json(json_data: list[dict]):
+# Fields pulled out of each record's "result" object, with the default used when missing
+RESULT_FIELDS = {
+  "power": 0.0,
+  "voltage": 0.0,
+  "current": 0.0,
+  "electricity": 0.0,
+}
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Measurements kept as float32 in memory, with the decimals that must round-trip exactly
+FLOAT32_COLUMNS = {"power": 2, "voltage": 2, "current": 2}
+
+# Streaming uploads are read in chunks of this many bytes and converted in batches of records
+STREAM_CHUNK_BYTES = 1 << 20
+# A JSON decode error this close to the end of a chunk may be a value cut off by the chunk
+# boundary (a number, a literal such as -Infinity, a \uXXXX\uXXXX escape) rather than bad input
+JSON_CUTOFF_CHARS = 12
+# Matches when only characters that could extend a number remain
+_JSON_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+_JSON_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_JSON_COMMA = re.compile(r"[ \t\r\n]*,")
+UPLOAD_BATCH_SIZE = 50_000
+NDJSON_MIMETYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+def _frame_from_records(json_data: list[dict]) -> pd.DataFrame:
+  """Flatten uploaded records into a readings DataFrame using columnar operations."""
+  items = [item for item in json_data if "result" in item and item.get("success", False)]
+  if not items:
+      return pd.DataFrame()
+  results = [item["result"] for item in items]
+
+  # Pull each field out as one column, then convert the whole column at once
+  columns = {}
+  device_names = pd.Series([res.get("device_name") for res in results], dtype=object)
+  columns["device_name"] = device_names.fillna("Unknown")
+  for field, default in RESULT_FIELDS.items():
+      values = np.array([res.get(field) for res in results], dtype=np.float64)
+      values[np.isnan(values)] = default
+      columns[field] = values
+  columns["switch_status"] = np.array([bool(res.get("switch", False)) for res in results], dtype=bool)
+
+  # Parse update_time in one pass; fall back to the epoch-ms "t" field, then to now
+  timestamps = pd.to_datetime(
+      pd.Series([res.get("update_time") for res in results], dtype=object),
+      format=TIMESTAMP_FORMAT, errors="coerce"
+  )
+  missing = timestamps.isna()
+  if missing.any():
+      epoch_ms = pd.to_numeric(pd.Series([item.get("t") for item in items], dtype=object), errors="coerce")
+      timestamps = timestamps.fillna(pd.to_datetime(epoch_ms, unit="ms", errors="coerce"))
+      timestamps = timestamps.fillna(pd.Timestamp(datetime.now()))
+
+  frame = pd.DataFrame({"timestamp": timestamps.astype("datetime64[ns]"), **columns})
+  return frame[["timestamp", "device_name", "power", "voltage", "current", "electricity", "switch_status"]]
+
+def _add_derived_columns(frame: pd.DataFrame) -> pd.DataFrame:
+  """Add the hour/date columns used by the analytics functions, order rows by time and compact dtypes."""
+  if not frame["timestamp"].is_monotonic_increasing:
+      frame = frame.sort_values("timestamp", kind="stable", ignore_index=True)
+  frame["device_name"] = frame["device_name"].astype("category")
+  frame["hour"] = frame["timestamp"].dt.hour.astype(np.int8)
+  frame["date"] = frame["timestamp"].dt.normalize()
+  return _compact_measurements(frame)
+
+def _compact_measurements(frame: pd.DataFrame) -> pd.DataFrame:
+  """Store measurement columns as float32 when every value survives the round trip."""
+  for column, decimals in FLOAT32_COLUMNS.items():
+      values = frame[column].to_numpy()
+      if values.dtype != np.float64:
+          continue
+      narrow = values.astype(np.float32)
+      if np.array_equal(np.round(narrow.astype(np.float64), decimals), values):
+          frame[column] = narrow
+  return frame
+
+def _measurement(frame: pd.DataFrame, column: str) -> pd.Series:
+  """A measurement column as float64 with exactly the values that were uploaded."""
+  values = frame[column]
+  if values.dtype == np.float32:
+      return values.astype(np.float64).round(FLOAT32_COLUMNS[column])
+  return values
+
+def _concat_readings(frames: list[pd.DataFrame]) -> pd.DataFrame:
+  """Concatenate reading frames while keeping the compact dtypes of the parts."""
+  frames = [frame for frame in frames if not frame.empty] or frames[:1]
+  if len(frames) > 1:
+      # Categoricals only survive concat when every part has the same categories
+      names = pd.api.types.union_categoricals([frame["device_name"] for frame in frames], ignore_order=True)
+      frames = [frame.assign(device_name=frame["device_name"].cat.set_categories(names.categories)) for frame in frames]
+      for column in FLOAT32_COLUMNS:
+          if len({frame[column].dtype for frame in frames}) > 1:
+              frames = [frame.assign(**{column: _measurement(frame, column)}) for frame in frames]
+  return pd.concat(frames, ignore_index=True)
+
+def _merge_readings(existing: pd.DataFrame, batch: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+  """
+  Upsert a time-sorted, de-duplicated batch into the time-sorted store.
+
+  Readings are keyed on (device_name, timestamp); a batch reading replaces any stored
+  reading with the same key. Only the part of the store at or after the batch's first
+  timestamp is touched, so appending newer readings never re-sorts the history.
+  Returns the merged frame and the stored rows that were replaced.
+  """
+  split = int(existing["timestamp"].searchsorted(batch["timestamp"].iloc[0], side="left"))
+  head, tail = existing.iloc[:split], existing.iloc[split:]
+  
+  replaced = tail.iloc[0:0]
+  if not tail.empty:
+      batch_keys = pd.MultiIndex.from_frame(batch[["device_name", "timestamp"]])
+      is_replaced = pd.MultiIndex.from_frame(tail[["device_name", "timestamp"]]).isin(batch_keys)
+      replaced = tail[is_replaced]
+      tail = _concat_readings([tail[~is_replaced], batch]).sort_values("timestamp", kind="stable")
+  else:
+      tail = batch
+  
+  merged = _concat_readings([head, tail])
+  return merged, replaced
+
+def load_data_from_json(json_data: list[dict], tenant_id: str = DEFAULT_TENANT):
   """Convert JSON data into DataFrame with device categorization."""
-  global df
-  rows = []
-  
-  print(f"DEBUG: load_data_from_json received {len(json_data)} items.") # DEBUG
-  
-  for item in json_data:
-      # Handle the specific format with "result" key
-      if "result" in item and item.get("success", False):
-          res = item["result"]
-          device_name = res.get("device_name", "Unknown")
-          power = float(res.get("power", 0.0))
-          voltage = float(res.get("voltage", 0.0))
-          current = float(res.get("current", 0.0))
-          electricity = float(res.get("electricity", 0.0))
-          # Explicitly cast to Python bool here
-          switch_status = bool(res.get("switch", False)) 
-          ts_iso = res.get("update_time")
-          
+  with stage("frame"):
+      frame = _frame_from_records(json_data)
+      if frame.empty:
+          raise ValueError("No valid rows in payload")
+      frame = _add_derived_columns(frame)
+  
+  df = _set_data(tenant_id, frame, "upload")["df"]
+  if logger.isEnabledFor(logging.DEBUG):
+      log_event(logging.DEBUG, "upload.loaded", tenant=tenant_id, records=len(json_data), rows=len(df),
+                devices=df["device_name"].nunique(), head=df.head().to_dict(orient="records"))
+  return df
+
+def _iter_ndjson(stream, chunk_size: int = STREAM_CHUNK_BYTES):
+  """Yield one record per non-empty line of a newline-delimited JSON byte stream."""
+  pending = b""
+  while True:
+      chunk = stream.read(chunk_size)
+      lines = (pending + chunk).split(b"\n")
+      pending = lines.pop() if chunk else b""
+      for line in lines:
+          if line.strip():
+              yield json.loads(line)
+      if not chunk:
+          return
+
+def _iter_json_array(stream, chunk_size: int = STREAM_CHUNK_BYTES):
+  """
+  Yield the elements of a top-level JSON array, reading the byte stream chunk by chunk.
+
+  Raises ValueError as soon as the text read so far cannot be part of a single JSON array:
+  elements must be separated by exactly one comma and only whitespace may follow the "]".
+  """
+  decoder = json.JSONDecoder()
+  utf8 = codecs.getincrementaldecoder("utf-8")()
+  buffer, pos = "", 0
+  # What comes next: the "[" (start), a value or "]" (first), a value (value),
+  # "," or "]" (separator), or only whitespace (done)
+  expect = "start"
+  eof = False
+  
+  while True:
+      pos = _JSON_WHITESPACE.match(buffer, pos).end()
+      if pos < len(buffer):
+          char = buffer[pos]
+          if expect == "start":
+              if char != "[":
+                  raise ValueError("Streaming upload expects a JSON array or NDJSON body")
+              expect, pos = "first", pos + 1
+              continue
+          if expect == "done":
+              raise ValueError("Unexpected data after the end of the JSON array")
+          if expect in ("first", "separator") and char == "]":
+              expect, pos = "done", pos + 1
+              continue
+          if expect == "separator":
+              if char != ",":
+                  raise ValueError(f"Expecting ',' or ']' after an array element, found {char!r}")
+              expect, pos = "value", pos + 1
+              continue
           try:
-              if ts_iso:
-                  ts = datetime.strptime(ts_iso, "%Y-%m-%dT%H:%M:%SZ")
-              else:
-                  ts = datetime.now()
-          except (ValueError, TypeError):
-              ts = datetime.now()
+              value, end = decoder.raw_decode(buffer, pos)
+          except json.JSONDecodeError as e:
+              # Unless it is near the end of the buffer, where the chunk may have cut a value short
+              if eof or not (e.msg.startswith("Unterminated string") or len(buffer) - e.pos <= JSON_CUTOFF_CHARS):
+                  raise
+          else:
+              # A number running to the end of the buffer may continue in the next chunk
+              if eof or not _JSON_NUMBER_TAIL.match(buffer, end):
+                  yield value
+                  # Usually the comma follows directly; anything else is checked as a separator above
+                  comma = _JSON_COMMA.match(buffer, end)
+                  expect, pos = ("value", comma.end()) if comma else ("separator", end)
+                  continue
+      
+      if eof:
+          if expect == "done":
+              return
+          raise ValueError("Unexpected end of JSON array")
+      chunk = stream.read(chunk_size)
+      eof = not chunk
+      buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+      pos = 0
+
+def _frame_from_stream(records, batch_size: int = UPLOAD_BATCH_SIZE) -> tuple[pd.DataFrame, int]:
+  """Convert an iterator of records into one DataFrame, holding at most one batch of dicts at a time."""
+  parts = []
+  batches = 0
+  while True:
+      batch = list(islice(records, batch_size))
+      if not batch:
+          break
+      batches += 1
+      part = _frame_from_records(batch)
+      del batch
+      if not part.empty:
+          # Dictionary-encode names per batch so repeated strings are not kept per row
+          part["device_name"] = part["device_name"].astype("category")
+          parts.append(part)
+  
+  if not parts:
+      return pd.DataFrame(), batches
+  
+  frame = _concat_readings(parts)
+  del parts
+  return frame, batches
+
+def _peak_rss_mb() -> float | None:
+  """Process peak resident set size in MB, if the platform exposes it."""
+  if resource is None:
+      return None
+  # ru_maxrss is reported in kilobytes on Linux
+  return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def _frame_memory_bytes(frame: pd.DataFrame) -> int:
+  """Memory used by a frame, including the Python objects in object columns."""
+  return int(frame.memory_usage(index=True, deep=True).sum())
+
+def _set_data(tenant_id: str, frame: pd.DataFrame, mode: str, persist: bool = True) -> dict:
+  """Replace a tenant's data: build a snapshot with everything derived from frame and publish it."""
+  with _tenant_lock(tenant_id):
+      if persist and _storage_enabled():
+          _persist_all(frame, tenant_id)
+      device_index = _build_device_index(frame)
+      return _publish(_snapshot(tenant_id, frame, device_index, mode, _frame_memory_bytes(frame),
+                                rollups=_build_rollups(frame)))
+
+def _versioned(tenant: dict, key: str | tuple, compute):
+  """Return compute() for a snapshot, computing it at most once per snapshot (i.e. per data version)."""
+  cache = tenant["derived_cache"]
+  if key not in cache:
+      # Concurrent readers of one snapshot may both compute; they get the same value
+      cache[key] = compute()
+  return cache[key]
+
+def _snapshot(tenant_id: str, frame: pd.DataFrame, device_index: dict, mode: str, memory_bytes: int,
+              forecast_cache: dict | None = None, rollups: dict | None = None, anomalies: dict | None = None) -> dict:
+  """A new version of a tenant's data with fresh ingest counters and derived caches."""
+  tenant = _new_tenant(tenant_id)
+  rollups = rollups if rollups is not None else _build_rollups(frame)
+  tenant.update({
+      "df": frame,
+      "device_index": device_index,
+      "rollups": rollups,
+      # Without a previous state the detector runs over the whole history
+      "anomalies": anomalies if anomalies is not None else _detect_anomalies(None, frame),
+      # Fits from the previous version can be advanced instead of refitted (see _forecast_kwh)
+      "forecast_cache": dict(forecast_cache) if forecast_cache else {},
+  })
+  tenant["ingest_stats"].update({
+      "data_version": next(_data_versions),
+      "rows": len(frame),
+      "devices": len(device_index),
+      "memory_bytes": memory_bytes,
+      "rollup_bytes": _rollups_memory_bytes(rollups),
+      "last_ingest_time": datetime.now().isoformat(timespec="seconds"),
+      "last_ingest_mode": mode,
+  })
+  return tenant
+
+def _publish(tenant: dict) -> dict:
+  """Make a snapshot the tenant's current version with one registry assignment."""
+  tenant_id = tenant["tenant_id"]
+  with _registry_lock:
+      tenants[tenant_id] = tenant
+      tenants.move_to_end(tenant_id)
+      _invalidate_responses(tenant_id)
+      # Publishing makes the tenant most recently used, which may push others out
+      _evict_over_budget(keep=tenant_id)
+  return tenant
+
+# ---------------------------------------------------------------------------
+# TENANT REGISTRY
+# ---------------------------------------------------------------------------
+def _new_tenant(tenant_id: str) -> dict:
+  """Empty per-tenant state: the readings frame plus everything derived from it."""
+  return {
+      "tenant_id": tenant_id,
+      "df": None,
+      # Per-device aggregates, built with the snapshot (see _device_stats)
+      "device_index": {},
+      # Hourly/daily/monthly aggregates per device, built with the snapshot (see _build_rollups)
+      "rollups": {},
+      # Running per-device detector statistics and the recent anomaly events (see _detect_anomalies)
+      "anomalies": {},
+      # Small household-level aggregates computed on first use (see _versioned)
+      "derived_cache": {},
+      # Fitted trends per scope (household or ("device", name)), tagged with their data version
+      "forecast_cache": {},
+      # Counters set at ingest so /api/health never has to touch the data
+      "ingest_stats": {
+          "data_version": 0,
+          "rows": 0,
+          "devices": 0,
+          "memory_bytes": 0,
+          "rollup_bytes": 0,
+          "last_ingest_time": None,
+          "last_ingest_mode": None,
+      },
+  }
+
+def _tenant_lock(tenant_id: str) -> threading.RLock:
+  """The lock serializing writers (uploads, appends, loads) of one tenant; only writers and storage loads create one."""
+  lock = _tenant_locks.get(tenant_id)
+  if lock is None:
+      lock = _tenant_locks.setdefault(tenant_id, threading.RLock())
+  return lock
+
+def get_tenant(tenant_id: str = DEFAULT_TENANT, load: bool = True) -> dict:
+  """
+  Return a tenant's current snapshot, marking it most recently used.
+
+  The hit path takes no locks: callers keep using the snapshot they got even if a newer
+  one is published meanwhile. A tenant that is not resident is restored from Parquet
+  storage when load is set and storage holds data for it; otherwise an empty state is
+  returned, which only joins the registry once something is ingested into it.
+  """
+  tenant = tenants.get(tenant_id)
+  if tenant is not None:
+      registry_stats["hits"] += 1
+      try:
+          tenants.move_to_end(tenant_id)
+      except KeyError:  # evicted since the lookup; the snapshot itself is still valid
+          pass
+      return tenant
+  
+  registry_stats["misses"] += 1
+  # Checked before taking the lock, so lookups of unknown ids leave no lock behind
+  if not load or not _has_stored_readings(tenant_id):
+      return _new_tenant(tenant_id)
+  with _tenant_lock(tenant_id):
+      # Another request may have loaded the tenant while this one waited
+      tenant = tenants.get(tenant_id)
+      if tenant is None:
+          tenant = restore_from_storage(tenant_id)
+          if tenant is None:
+              return _new_tenant(tenant_id)
+          registry_stats["loads"] += 1
+      return tenant
+
+def _resident_bytes(tenant: dict) -> int:
+  """Memory a resident tenant holds: its readings plus their rollups."""
+  return tenant["ingest_stats"]["memory_bytes"] + tenant["ingest_stats"]["rollup_bytes"]
+
+def _registry_memory_bytes() -> int:
+  return sum(_resident_bytes(tenant) for tenant in list(tenants.values()))
+
+def _evict_over_budget(keep: str):
+  """Drop least recently used tenants until the resident readings fit the memory budget (holding _registry_lock)."""
+  budget = TENANT_MEMORY_BUDGET_MB * 1024 * 1024
+  total = _registry_memory_bytes()
+  for tenant_id in list(tenants):
+      if total <= budget:
+          break
+      if tenant_id == keep:
+          continue
+      evicted = tenants.pop(tenant_id, None)
+      if evicted is None:
+          continue
+      total -= _resident_bytes(evicted)
+      registry_stats["evictions"] += 1
+      _invalidate_responses(tenant_id)
+      if not _storage_enabled():
+          log_event(logging.WARNING, "tenant.evicted_unpersisted", tenant=tenant_id,
+                    detail="no persistent storage; its data must be re-uploaded")
+
+def _request_tenant_id() -> str:
+  """Tenant named by the ?tenant= parameter or the X-Tenant-ID header."""
+  return request.args.get("tenant") or request.headers.get("X-Tenant-ID") or DEFAULT_TENANT
+
+@app.before_request
+def _check_tenant_id():
+  if request.path.startswith("/api/") and not TENANT_ID_PATTERN.match(_request_tenant_id()):
+      return jsonify({"error": "invalid tenant id", "status": "error"}), 400
+
+# ---------------------------------------------------------------------------
+# RESPONSE CACHE
+# ---------------------------------------------------------------------------
+def _response_cache_key(tenant: dict) -> tuple:
+  """Cache key for the current request against a tenant snapshot."""
+  args = tuple(sorted((key, value) for key, value in request.args.items(multi=True) if key != "tenant"))
+  return (tenant["tenant_id"], tenant["ingest_stats"]["data_version"], request.path, args)
+
+def _store_response(key: tuple, entry: dict):
+  """Insert an entry, evicting least recently used ones to stay within RESPONSE_CACHE_MB."""
+  budget = RESPONSE_CACHE_MB * 1024 * 1024
+  size = len(entry["body"])
+  if size > budget:
+      return
+  with _response_cache_lock:
+      previous = response_cache.pop(key, None)
+      if previous is not None:
+          response_cache_stats["bytes"] -= len(previous["body"])
+      response_cache[key] = entry
+      response_cache_stats["bytes"] += size
+      response_cache_stats["stores"] += 1
+      while response_cache_stats["bytes"] > budget:
+          _, evicted = response_cache.popitem(last=False)
+          response_cache_stats["bytes"] -= len(evicted["body"])
+          response_cache_stats["evictions"] += 1
+
+def _invalidate_responses(tenant_id: str):
+  """Drop every cached response of a tenant (its data changed or it left the registry)."""
+  with _response_cache_lock:
+      for key in [key for key in response_cache if key[0] == tenant_id]:
+          response_cache_stats["bytes"] -= len(response_cache.pop(key)["body"])
+          response_cache_stats["invalidations"] += 1
+
+def cached_response(bypass=None):
+  """
+  Cache a read route's serialized 200 responses per tenant data version, with ETags.
+
+  Entries are keyed by tenant, data version, path and query arguments, so an upload makes
+  them unreachable (and _publish drops them). Responses carry a content ETag and
+  "Cache-Control: no-cache": clients revalidate and get 304 Not Modified while the data
+  is unchanged. bypass() returning true skips the cache for a request.
+  """
+  def decorator(view):
+      @wraps(view)
+      def wrapper(*args, **kwargs):
+          # A profiled request has to do the work to be worth profiling
+          if (bypass is not None and bypass()) or "profiler" in g:
+              return view(*args, **kwargs)
+          # Peek so the lookup neither loads the tenant nor counts twice in registry_stats;
+          # a tenant that is not resident yet is loaded and served by the view, uncached
+          tenant = tenants.get(_request_tenant_id())
+          if tenant is None:
+              return view(*args, **kwargs)
           
-          rows.append({
-              "timestamp": ts,
-              "device_name": device_name,
-              "power": power,
-              "voltage": voltage,
-              "current": current,
-              "electricity": electricity,
-              "switch_status": switch_status # This should now be a native Python bool
-          })
+          key = _response_cache_key(tenant)
+          with _response_cache_lock:
+              entry = response_cache.get(key)
+              if entry is not None:
+                  response_cache.move_to_end(key)
+          hit = entry is not None
+          if hit:
+              response_cache_stats["hits"] += 1
+              # The view (and its get_tenant) is skipped, so mark the tenant used here
+              registry_stats["hits"] += 1
+              try:
+                  tenants.move_to_end(tenant["tenant_id"])
+              except KeyError:  # evicted since the lookup; the cached body is still for its snapshot
+                  pass
+          else:
+              response_cache_stats["misses"] += 1
+              response = make_response(view(*args, **kwargs))
+              if response.status_code != 200:
+                  return response
+              body = response.get_data()
+              entry = {
+                  "body": body,
+                  "status": response.status_code,
+                  "mimetype": response.mimetype,
+                  "etag": hashlib.blake2b(body, digest_size=16).hexdigest(),
+              }
+              # The view reads the registry itself; store only if it saw the version the key names
+              current = tenants.get(tenant["tenant_id"])
+              if current is not None and current["ingest_stats"]["data_version"] == key[1]:
+                  _store_response(key, entry)
+          
+          response = app.response_class(entry["body"], status=entry["status"], mimetype=entry["mimetype"])
+          response.set_etag(entry["etag"])
+          response.headers["Cache-Control"] = "no-cache"
+          response.headers["X-Cache"] = "hit" if hit else "miss"
+          response = response.make_conditional(request)
+          if response.status_code == 304:
+              response_cache_stats["not_modified"] += 1
+          return response
+      return wrapper
+  return decorator
+
+# ---------------------------------------------------------------------------
+# PER-DEVICE AGGREGATE INDEX
+# ---------------------------------------------------------------------------
+def _device_stats(frame: pd.DataFrame) -> dict[str, dict]:
+  """Compute the per-device aggregates for a frame with grouped passes over all devices."""
+  if frame.empty:
+      return {}
+  if frame["power"].dtype != np.float64:
+      frame = frame.assign(power=_measurement(frame, "power"))
   
-  if not rows:
-      print("DEBUG: No valid rows extracted from payload.") # DEBUG
-      raise ValueError("No valid rows in payload")
+  groups = frame.groupby("device_name", sort=False, observed=True)
+  totals = groups.agg(
+      count=("power", "size"),
+      total_energy=("electricity", "sum"),
+      power_sum=("power", "sum"),
+      peak_usage=("power", "max"),
+      on_count=("switch_status", "sum"),
+      first_timestamp=("timestamp", "min"),
+  )
+  latest = groups.tail(1).set_index("device_name")
   
-  df = pd.DataFrame(rows)
-  df["hour"] = df["timestamp"].dt.hour
-  df["date"] = df["timestamp"].dt.date
-  print(f"DEBUG: DataFrame loaded with {len(df)} rows. First 5 rows:\n{df.head()}") # DEBUG
-  return df
+  # On-state power moments feed the efficiency score (mean and sum of squared deviations)
+  on_stats = _on_power_moments(frame)
+  
+  hourly = frame.groupby(["device_name", "hour"], observed=True).agg(
+      power_sum=("power", "sum"), count=("power", "size"), energy_sum=("electricity", "sum")
+  )
+  hourly_sum = hourly["power_sum"].unstack(fill_value=0.0).reindex(columns=range(24), fill_value=0.0)
+  hourly_count = hourly["count"].unstack(fill_value=0).reindex(columns=range(24), fill_value=0)
+  hourly_energy = hourly["energy_sum"].unstack(fill_value=0.0).reindex(columns=range(24), fill_value=0.0)
+  daily = frame.groupby(["device_name", "date"], observed=True)["electricity"].sum()
+  
+  stats = {}
+  for device_name, row in totals.iterrows():
+      on_count = int(row["on_count"])
+      on_mean, on_m2 = on_stats.get(device_name, (0.0, 0.0))
+      stats[device_name] = {
+          "count": int(row["count"]),
+          "total_energy": float(row["total_energy"]),
+          "power_sum": float(row["power_sum"]),
+          "peak_usage": float(row["peak_usage"]),
+          "latest_power": float(latest.at[device_name, "power"]),
+          "latest_switch": bool(latest.at[device_name, "switch_status"]),
+          "latest_timestamp": latest.at[device_name, "timestamp"],
+          "first_timestamp": row["first_timestamp"],
+          "on_count": on_count,
+          "on_power_mean": on_mean,
+          "on_power_m2": on_m2 if on_count > 1 else 0.0,
+          "hourly_power_sum": hourly_sum.loc[device_name].to_numpy(dtype=np.float64),
+          "hourly_count": hourly_count.loc[device_name].to_numpy(dtype=np.int64),
+          "hourly_energy_sum": hourly_energy.loc[device_name].to_numpy(dtype=np.float64),
+          "daily_energy": daily.xs(device_name, level="device_name"),
+      }
+  return stats
 
-def generate_device_data() -> dict:
+def _on_power_moments(frame: pd.DataFrame) -> dict[str, tuple[float, float]]:
+  """
+  Mean and sum of squared deviations of on-state power per device, in one grouped pass.
+
+  Rows are sorted by device once, and each device's contiguous run is reduced the way
+  Series.mean/std reduce (two passes of pairwise np.sum), so scores built from these
+  moments equal calculate_device_efficiency's bit for bit.
+  """
+  on = frame["switch_status"].to_numpy(dtype=bool)
+  codes = frame["device_name"].cat.codes.to_numpy()[on]
+  power = _measurement(frame, "power").to_numpy(dtype=np.float64)[on]
+  order = np.argsort(codes, kind="stable")
+  codes, power = codes[order], power[order]
+  starts = np.flatnonzero(np.diff(codes, prepend=-1))
+  ends = np.append(starts[1:], len(codes))
+  names = frame["device_name"].cat.categories
+  moments = {}
+  for code, start, end in zip(codes[starts].tolist(), starts.tolist(), ends.tolist()):
+      segment = power[start:end]
+      mean = segment.sum() / (end - start)
+      moments[names[code]] = (float(mean), float(((mean - segment) ** 2).sum()))
+  return moments
+
+def _merge_device_stats(current: dict, update: dict) -> dict:
+  """Combine the aggregates of existing readings with those of a batch of new readings."""
+  count_a, count_b = current["on_count"], update["on_count"]
+  on_count = count_a + count_b
+  if count_a and count_b:
+      # Pairwise combination of means and squared deviations (Chan et al.)
+      delta = update["on_power_mean"] - current["on_power_mean"]
+      on_mean = current["on_power_mean"] + delta * count_b / on_count
+      on_m2 = current["on_power_m2"] + update["on_power_m2"] + delta * delta * count_a * count_b / on_count
+  else:
+      on_mean = current["on_power_mean"] if count_a else update["on_power_mean"]
+      on_m2 = current["on_power_m2"] if count_a else update["on_power_m2"]
+  
+  is_newer = update["latest_timestamp"] >= current["latest_timestamp"]
+  latest = update if is_newer else current
+  return {
+      "count": current["count"] + update["count"],
+      "total_energy": current["total_energy"] + update["total_energy"],
+      "power_sum": current["power_sum"] + update["power_sum"],
+      "peak_usage": max(current["peak_usage"], update["peak_usage"]),
+      "latest_power": latest["latest_power"],
+      "latest_switch": latest["latest_switch"],
+      "latest_timestamp": latest["latest_timestamp"],
+      "first_timestamp": min(current["first_timestamp"], update["first_timestamp"]),
+      "on_count": on_count,
+      "on_power_mean": on_mean,
+      "on_power_m2": on_m2,
+      "hourly_power_sum": current["hourly_power_sum"] + update["hourly_power_sum"],
+      "hourly_count": current["hourly_count"] + update["hourly_count"],
+      "hourly_energy_sum": current["hourly_energy_sum"] + update["hourly_energy_sum"],
+      "daily_energy": current["daily_energy"].add(update["daily_energy"], fill_value=0.0).sort_index(),
+  }
+
+@stage("groupby")
+def _appended_device_index(device_index: dict, batch: pd.DataFrame, replaced: pd.DataFrame,
+                           merged: pd.DataFrame) -> dict[str, dict]:
+  """A device index with an appended batch folded in, without rescanning unaffected history."""
+  index = dict(device_index)
+  # Replaced readings cannot be subtracted from a max, so those devices are recomputed
+  corrected = set(replaced["device_name"].unique())
+  if corrected:
+      index.update(_device_stats(merged[merged["device_name"].isin(corrected)]))
+  fresh = batch[~batch["device_name"].isin(corrected)]
+  reorder = bool(corrected)
+  for device_name, stats in _device_stats(fresh).items():
+      if device_name in index:
+          reorder |= stats["first_timestamp"] <= index[device_name]["first_timestamp"]
+          index[device_name] = _merge_device_stats(index[device_name], stats)
+      else:
+          reorder = True
+          index[device_name] = stats
+  
+  return _order_by_first_appearance(index, merged) if reorder else index
+
+def _order_by_first_appearance(index: dict[str, dict], frame: pd.DataFrame) -> dict[str, dict]:
+  """Order index entries the way a full rebuild would: by first appearance in the time-sorted frame."""
+  timestamps = frame["timestamp"]
+  position = {}
+  for first in {stats["first_timestamp"] for stats in index.values()}:
+      # Only the rows sharing a device's first timestamp decide ties between devices
+      lo, hi = timestamps.searchsorted(first, side="left"), timestamps.searchsorted(first, side="right")
+      for rank, device_name in enumerate(frame["device_name"].iloc[lo:hi].unique()):
+          if device_name in index and index[device_name]["first_timestamp"] == first:
+              position[device_name] = (first, rank)
+  return dict(sorted(index.items(), key=lambda item: position[item[0]]))
+
+# ---------------------------------------------------------------------------
+# DEVICE TIME SERIES (windowed, resampled and downsampled history)
+# ---------------------------------------------------------------------------
+SERIES_BUCKETS = {"15m": 15 * 60, "1h": 3600, "1d": 86400}  # seconds
+SERIES_MAX_POINTS = 2000
+
+def _series_index(tenant: dict) -> dict:
+  """
+  Row positions of each device's readings in time order, built once per snapshot.
+
+  The frame is sorted by time, so a stable sort by device code leaves every device's rows
+  contiguous and still time-ordered; a window is then two binary searches on timestamps.
+  """
+  def build():
+      frame = tenant["df"]
+      codes = frame["device_name"].cat.codes.to_numpy()
+      order = np.argsort(codes, kind="stable")
+      bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(frame["device_name"].cat.categories)))])
+      return {
+          "order": order,
+          "timestamps": frame["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)[order],
+          "bounds": {name: (int(bounds[code]), int(bounds[code + 1]))
+                     for code, name in enumerate(frame["device_name"].cat.categories)},
+      }
+  return _versioned(tenant, "series_index", build)
+
+def _series_window(tenant: dict, device_name: str, start: datetime | None, end: datetime | None) -> tuple[np.ndarray, np.ndarray]:
+  """Timestamps (ns) and frame row positions of a device's readings in [start, end)."""
+  index = _series_index(tenant)
+  lo, hi = index["bounds"][device_name]
+  timestamps = index["timestamps"][lo:hi]
+  first = np.searchsorted(timestamps, pd.Timestamp(start).value) if start is not None else 0
+  last = np.searchsorted(timestamps, pd.Timestamp(end).value) if end is not None else len(timestamps)
+  return timestamps[first:last], index["order"][lo + first:lo + last]
+
+def _window_values(frame: pd.DataFrame, column: str, rows: np.ndarray) -> np.ndarray:
+  """A measurement at the given rows as float64, converting only those rows (see _measurement)."""
+  values = frame[column].to_numpy()[rows]
+  if values.dtype == np.float32:
+      return values.astype(np.float64).round(FLOAT32_COLUMNS[column])
+  return values.astype(np.float64)
+
+def _resample(timestamps: np.ndarray, power: np.ndarray, energy: np.ndarray,
+              bucket_seconds: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+  """Mean power and total energy per time bucket, for buckets that have readings."""
+  if len(timestamps) == 0:
+      return timestamps, power, energy
+  bucket_ns = bucket_seconds * 1_000_000_000
+  buckets = timestamps // bucket_ns
+  # Readings are time-sorted, so each bucket is one run
+  starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+  counts = np.diff(np.append(starts, len(buckets)))
+  return (buckets[starts] * bucket_ns,
+          np.add.reduceat(power, starts) / counts,
+          np.add.reduceat(energy, starts))
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+  """
+  Positions of the points Largest-Triangle-Three-Buckets keeps to draw y(x) with threshold points.
+
+  Keeps the first and last point and, for each of threshold - 2 buckets in between, the point
+  forming the largest triangle with the previous pick and the next bucket's average.
+  """
+  n = len(x)
+  if threshold >= n or threshold < 3:
+      return np.arange(n)
+  x = (x - x[0]).astype(np.float64)  # relative to the first point, for precision with ns timestamps
+  y = y.astype(np.float64)
+  edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2) + 1).astype(np.int64)
+  edges[-1] = n - 1
+  # Averages of each bucket's successor (the last point for the final bucket)
+  next_starts = np.append(edges[1:-1], n - 1)
+  next_counts = np.diff(np.append(next_starts, n))
+  avg_x = np.add.reduceat(x, next_starts) / next_counts
+  avg_y = np.add.reduceat(y, next_starts) / next_counts
+  # Buckets as rows, padded by repeating their last point: argmax returns the first occurrence
+  sizes = np.diff(edges)
+  columns = np.minimum(np.arange(sizes.max()), sizes[:, None] - 1)
+  bucket_x, bucket_y = x[edges[:-1, None] + columns], y[edges[:-1, None] + columns]
+  
+  # The loop is sequential (each pick depends on the last), so scalars stay plain Python floats
+  starts, avg_x, avg_y = edges.tolist(), avg_x.tolist(), avg_y.tolist()
+  picked = [0]
+  px, py = float(x[0]), float(y[0])
+  for bucket in range(threshold - 2):
+      # Twice the triangle area, expanded so only the candidate coordinates vary
+      slope_y, slope_x = px - avg_x[bucket], avg_y[bucket] - py
+      areas = np.abs(slope_y * bucket_y[bucket] + slope_x * bucket_x[bucket] - (slope_y * py + slope_x * px))
+      best = int(areas.argmax())
+      picked.append(starts[bucket] + best)
+      px, py = float(bucket_x[bucket, best]), float(bucket_y[bucket, best])
+  picked.append(n - 1)
+  return np.array(picked, dtype=np.int64)
+
+def device_series(tenant: dict, device_name: str, start: datetime | None = None, end: datetime | None = None,
+                  bucket: str | None = None, max_points: int = SERIES_MAX_POINTS) -> dict:
+  """
+  A device's power and energy history over [start, end), optionally resampled into buckets
+  and downsampled with LTTB to at most max_points points (0 keeps every point).
+
+  Work is proportional to the readings in the window, not to the device's whole history.
+  """
+  timestamps, rows = _series_window(tenant, device_name, start, end)
+  power = _window_values(tenant["df"], "power", rows)
+  energy = _window_values(tenant["df"], "electricity", rows)
+  readings = len(rows)
+  if bucket is not None:
+      timestamps, power, energy = _resample(timestamps, power, energy, SERIES_BUCKETS[bucket])
+  kept = _lttb_indices(timestamps, power, max_points) if max_points else np.arange(len(timestamps))
+  downsampled = len(kept) < len(timestamps)
+  if downsampled:
+      timestamps, power, energy = timestamps[kept], power[kept], energy[kept]
+  
+  labels = np.char.add(np.datetime_as_string(timestamps.astype("datetime64[ns]"), unit="s"), "Z")
+  return {
+      "device_name": device_name,
+      "from": start.strftime(TIMESTAMP_FORMAT) if start is not None else None,
+      "to": end.strftime(TIMESTAMP_FORMAT) if end is not None else None,
+      "bucket": bucket,
+      "readings": readings,
+      "points": len(timestamps),
+      "downsampled": downsampled,
+      "timestamps": labels.tolist(),
+      "power": np.round(power, 3).tolist(),
+      "energy_kwh": np.round(energy, 4).tolist(),
+  }
+
+# ---------------------------------------------------------------------------
+# ROLLUPS (hourly/daily/monthly aggregates per device)
+# ---------------------------------------------------------------------------
+# Coarsest first; a query uses the coarsest grain whose buckets fit inside its range
+ROLLUP_GRAINS = ("month", "day", "hour")
+ROLLUP_BUCKET_NS = {"day": 86_400 * 10**9, "hour": 3_600 * 10**9}
+# How each field combines when buckets are merged into coarser ones
+ROLLUP_AGGREGATIONS = {"energy": "sum", "power_sum": "sum", "count": "sum", "power_min": "min",
+                       "power_max": "max", "on_count": "sum"}
+
+def _floor_buckets(timestamps: np.ndarray, grain: str) -> np.ndarray:
+  """Start (ns) of the grain bucket holding each timestamp (ns)."""
+  if grain == "month":
+      return timestamps.view("datetime64[ns]").astype("datetime64[M]").astype("datetime64[ns]").view(np.int64)
+  size = ROLLUP_BUCKET_NS[grain]
+  return timestamps // size * size
+
+def _ceil_bucket(timestamp: int, grain: str) -> int:
+  """The first grain boundary at or after a timestamp (ns)."""
+  floor = int(_floor_buckets(np.array([timestamp], dtype=np.int64), grain)[0])
+  if floor == timestamp:
+      return floor
+  if grain == "month":
+      return int((np.datetime64(floor, "ns").astype("datetime64[M]") + 1).astype("datetime64[ns]").astype(np.int64))
+  return floor + ROLLUP_BUCKET_NS[grain]
+
+def _reading_fields(frame: pd.DataFrame, rows: slice) -> dict[str, np.ndarray]:
+  """Raw readings in the same shape as rollup rows (each reading is its own bucket)."""
+  power = _window_values(frame, "power", rows)
+  return {
+      "bucket": frame["timestamp"].to_numpy(dtype="datetime64[ns]")[rows].view(np.int64),
+      "energy": _window_values(frame, "electricity", rows),
+      "power_sum": power,
+      "count": np.ones(len(power), dtype=np.int64),
+      "power_min": power,
+      "power_max": power,
+      "on_count": frame["switch_status"].to_numpy()[rows].astype(np.int64),
+  }
+
+def _regroup(table: pd.DataFrame, grain: str) -> pd.DataFrame:
+  """Combine rows (readings or finer buckets) into grain buckets per device, sorted by bucket."""
+  table = table.assign(bucket=_floor_buckets(table["bucket"].to_numpy(), grain))
+  return table.groupby(["bucket", "device"], sort=True).agg(ROLLUP_AGGREGATIONS).reset_index()
+
+def _rollup_tables(frame: pd.DataFrame, devices: dict[str, int]) -> dict[str, dict[str, np.ndarray]]:
+  """
+  Rollups of a time-sorted frame, as column arrays per grain.
+
+  Devices are numbered by `devices` (name -> code), which is extended with unseen names
+  so that rollups of different frames share codes.
+  """
+  names = frame["device_name"].cat.categories
+  for name in names:
+      devices.setdefault(name, len(devices))
+  codes = np.array([devices[name] for name in names], dtype=np.int32)[frame["device_name"].cat.codes.to_numpy()]
+  table = pd.DataFrame({"device": codes, **_reading_fields(frame, slice(None))})
+  tables = {}
+  for grain in reversed(ROLLUP_GRAINS):  # hours from readings, days from hours, months from days
+      table = _regroup(table, grain)
+      tables[grain] = {column: table[column].to_numpy() for column in table.columns}
+      for column in ("count", "on_count"):  # counts per bucket fit easily; halves their memory
+          tables[grain][column] = tables[grain][column].astype(np.int32)
+  return tables
+
+@stage("rollups")
+def _build_rollups(frame: pd.DataFrame) -> dict:
+  """Hourly, daily and monthly sum/count/min/max/on-count per device for a snapshot."""
+  devices = {}
+  return {"devices": devices, **_rollup_tables(frame, devices)}
+
+@stage("rollups")
+def _appended_rollups(rollups: dict, merged: pd.DataFrame, earliest: pd.Timestamp) -> dict:
+  """
+  Rollups after an append whose earliest reading is `earliest`.
+
+  Buckets before that reading's month cannot have changed, so they are kept and only the
+  readings from that month on are rolled up again (which also covers replaced readings).
+  """
+  since = int(_floor_buckets(np.array([pd.Timestamp(earliest).value], dtype=np.int64), "month")[0])
+  devices = dict(rollups["devices"])
+  recent = merged.iloc[merged["timestamp"].searchsorted(pd.Timestamp(since)):]
+  fresh = _rollup_tables(recent, devices)
+  appended = {"devices": devices}
+  for grain in ROLLUP_GRAINS:
+      kept = np.searchsorted(rollups[grain]["bucket"], since)
+      appended[grain] = {column: np.concatenate([values[:kept], fresh[grain][column]])
+                         for column, values in rollups[grain].items()}
+  return appended
+
+def _rollups_memory_bytes(rollups: dict) -> int:
+  return sum(values.nbytes for grain in ROLLUP_GRAINS if grain in rollups for values in rollups[grain].values())
+
+def _split_range(start: int, end: int, grains: tuple) -> list[tuple[str, int, int]]:
+  """
+  Cover [start, end) with (grain, lo, hi) pieces, using the coarsest grain whose whole
+  buckets fit and finer grains for the edges; what no grain fits is ("raw", lo, hi).
+  """
+  if start >= end:
+      return []
+  if not grains:
+      return [("raw", start, end)]
+  grain, finer = grains[0], grains[1:]
+  lo = _ceil_bucket(start, grain)
+  hi = int(_floor_buckets(np.array([end], dtype=np.int64), grain)[0])
+  if lo >= hi:
+      return _split_range(start, end, finer)
+  return _split_range(start, lo, finer) + [(grain, lo, hi)] + _split_range(hi, end, finer)
+
+def _piece_rows(tenant: dict, grain: str, lo: int, hi: int, device_name: str | None) -> dict[str, np.ndarray]:
+  """Rollup rows (or raw readings for "raw") with buckets in [lo, hi), optionally for one device."""
+  if grain == "raw":
+      frame = tenant["df"]
+      timestamps = frame["timestamp"]
+      rows = slice(timestamps.searchsorted(pd.Timestamp(lo)), timestamps.searchsorted(pd.Timestamp(hi)))
+      fields = _reading_fields(frame, rows)
+      if device_name is not None:
+          keep = (frame["device_name"].iloc[rows] == device_name).to_numpy()
+          fields = {column: values[keep] for column, values in fields.items()}
+      return fields
+  
+  table = tenant["rollups"][grain]
+  rows = slice(np.searchsorted(table["bucket"], lo), np.searchsorted(table["bucket"], hi))
+  fields = {column: values[rows] for column, values in table.items() if column != "device"}
+  if device_name is not None:
+      keep = table["device"][rows] == tenant["rollups"]["devices"][device_name]
+      fields = {column: values[keep] for column, values in fields.items()}
+  return fields
+
+def query_usage(tenant: dict, start: datetime | None = None, end: datetime | None = None,
+                device_name: str | None = None, by: str | None = None) -> dict:
+  """
+  Energy and power statistics over [start, end), for one device or the household, answered
+  from the rollups: whole months from the monthly rollup, the rest from daily and hourly ones,
+  and only sub-hour edges from raw readings. With by= (a grain) the result is per bucket.
+
+  Work depends on the number of buckets in the range, not on the readings behind them.
+  """
+  timestamps = tenant["df"]["timestamp"]
+  first = _floor_buckets(np.array([timestamps.iloc[0].value], dtype=np.int64), "month")[0]
+  lo = pd.Timestamp(start).value if start is not None else int(first)
+  hi = pd.Timestamp(end).value if end is not None else _ceil_bucket(timestamps.iloc[-1].value + 1, "month")
+  grains = ROLLUP_GRAINS[ROLLUP_GRAINS.index(by):] if by is not None else ROLLUP_GRAINS
+  pieces = _split_range(lo, hi, grains)
+  parts = [_piece_rows(tenant, *piece, device_name) for piece in pieces]
+  sources = {grain: 0 for grain in (*ROLLUP_GRAINS, "raw")}
+  for (grain, _, _), part in zip(pieces, parts):
+      sources[grain] += len(part["bucket"])
+  rows = {column: np.concatenate([part[column] for part in parts]) if parts else np.empty(0)
+          for column in ("bucket", *ROLLUP_AGGREGATIONS)}
+  
+  if by is None:
+      # The whole range is one group
+      starts = np.array([0]) if len(rows["bucket"]) else np.array([], dtype=np.int64)
+  else:
+      # Pieces are in time order and sorted within, so each bucket of the grain is one run
+      labels = _floor_buckets(rows["bucket"].astype(np.int64), by)
+      starts = np.flatnonzero(np.diff(labels, prepend=labels[0] - 1)) if len(labels) else np.array([], dtype=np.int64)
+  reducers = {"sum": np.add, "min": np.minimum, "max": np.maximum}
+  groups = {column: reducers[how].reduceat(rows[column], starts) if len(starts) else rows[column][:0]
+            for column, how in ROLLUP_AGGREGATIONS.items()}
+  counts = groups["count"]
+  with np.errstate(divide="ignore", invalid="ignore"):
+      power_mean = np.where(counts > 0, groups["power_sum"] / counts, np.nan)
+  
+  def values(array, decimals):
+      return [None if np.isnan(value) else value for value in np.round(array.astype(np.float64), decimals).tolist()]
+  
+  result = {
+      "device_name": device_name,
+      "from": pd.Timestamp(lo).strftime(TIMESTAMP_FORMAT),
+      "to": pd.Timestamp(hi).strftime(TIMESTAMP_FORMAT),
+      "by": by,
+      "sources": sources,
+  }
+  stats = {
+      "energy_kwh": values(groups["energy"], 4),
+      "readings": counts.astype(np.int64).tolist(),
+      "on_readings": groups["on_count"].astype(np.int64).tolist(),
+      "power_min": values(groups["power_min"], 3),
+      "power_max": values(groups["power_max"], 3),
+      "power_mean": values(power_mean, 3),
+  }
+  if by is None:
+      empty = {"energy_kwh": 0.0, "readings": 0, "on_readings": 0, "power_min": None, "power_max": None, "power_mean": None}
+      result.update({key: column[0] if column else empty[key] for key, column in stats.items()})
+  else:
+      labels = np.char.add(np.datetime_as_string(labels[starts].astype("datetime64[ns]"), unit="s"), "Z") if len(starts) else []
+      result.update({"buckets": list(labels), **stats})
+  return result
+
+# ---------------------------------------------------------------------------
+# ANOMALY DETECTION (streaming, per device)
+# ---------------------------------------------------------------------------
+# Smoothing of the exponentially weighted power statistics; 0.05 weighs roughly the last 40 readings
+ANOMALY_ALPHA = float(os.environ.get("ENERGY_ANOMALY_ALPHA", "0.05"))
+# On-state power this many running standard deviations from the running mean is flagged, once a
+# device has enough on-state readings and only if it is at least this many watts off
+ANOMALY_Z_THRESHOLD = float(os.environ.get("ENERGY_ANOMALY_Z", "4"))
+ANOMALY_WARMUP_READINGS = 20
+ANOMALY_MIN_DEVIATION_W = 10.0
+# Off-state power above this is a phantom load (the threshold the standby suggestions use)
+STANDBY_THRESHOLD_W = 5.0
+# Supply voltage below 90% of nominal is a sag, above 110% a surge; 0 V means not measured
+NOMINAL_VOLTAGE = float(os.environ.get("ENERGY_NOMINAL_VOLTAGE", "230"))
+VOLTAGE_BANDS = {"voltage_sag": 0.9 * NOMINAL_VOLTAGE, "voltage_surge": 1.1 * NOMINAL_VOLTAGE}
+# Most recent events kept per tenant; older ones only remain in the per-kind counts
+ANOMALY_FEED_SIZE = int(os.environ.get("ENERGY_ANOMALY_FEED_SIZE", "1000"))
+ANOMALY_KINDS = ("power_spike", "power_drop", "phantom_load", "voltage_sag", "voltage_surge")
+VOLTAGE_BAND_NAMES = {-1: "sag", 0: "normal", 1: "surge"}
+
+def _new_detector() -> dict:
+  """Running statistics of one device: a fixed handful of numbers however long its history."""
+  return {
+      "on_count": 0,
+      "power_mean": 0.0,  # EWMA of on-state power
+      "power_var": 0.0,   # EWMA variance of on-state power
+      "standby_power": None,  # EWMA of off-state power
+      "phantom": False,
+      "voltage_band": 0,  # -1 sag, 0 normal, 1 surge
+      "last_timestamp": None,  # ns; older readings (backfills, replacements) are not scored again
+  }
+
+def _ewma(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+  """y[t] = alpha * values[t] + (1 - alpha) * y[t-1] from y[-1] = initial, as one linear filter pass."""
+  return lfilter([alpha], [1.0, alpha - 1.0], values, zi=[(1.0 - alpha) * initial])[0]
+
+def _shifted(values: np.ndarray, first) -> np.ndarray:
+  """values moved one step later, with `first` in front: the state each reading was compared with."""
+  return np.concatenate([[first], values[:-1]])
+
+def _standby_monthly_cost(power: float) -> float:
+  """₹ per month if a device kept drawing `power` watts around the clock."""
+  return power * 24 * 30 * 5.5 / 1000
+
+def _detect_device(detector: dict, timestamps: np.ndarray, power: np.ndarray, voltage: np.ndarray,
+                   switch: np.ndarray) -> tuple[dict, list[tuple]]:
+  """
+  Advance one device's detector over its new readings (time-sorted arrays).
+
+  Returns the new detector and the events as (reading positions, kind, level, spread) arrays:
+  level is the running mean, standby baseline or band limit the reading was judged against.
+  """
+  alpha = ANOMALY_ALPHA
+  detector = dict(detector)
+  events = []
+  
+  on = power[switch]
+  if len(on):
+      on_count = detector["on_count"]
+      mean0 = detector["power_mean"] if on_count else on[0]
+      means = _ewma(on, alpha, mean0)
+      expected = _shifted(means, mean0)
+      deviation = on - expected
+      variances = _ewma((1.0 - alpha) * deviation * deviation, alpha, detector["power_var"])
+      spread = np.sqrt(_shifted(variances, detector["power_var"]))
+      flagged = np.abs(deviation) > np.maximum(ANOMALY_Z_THRESHOLD * spread, ANOMALY_MIN_DEVIATION_W)
+      flagged &= on_count + np.arange(len(on)) >= ANOMALY_WARMUP_READINGS
+      positions = np.flatnonzero(switch)
+      for kind, hits in ((0, flagged & (deviation > 0)), (1, flagged & (deviation < 0))):
+          if hits.any():
+              events.append((positions[hits], kind, expected[hits], spread[hits]))
+      detector.update(on_count=on_count + len(on), power_mean=float(means[-1]), power_var=float(variances[-1]))
+  
+  off = power[~switch]
+  if len(off):
+      standby0 = detector["standby_power"] if detector["standby_power"] is not None else off[0]
+      baseline = _ewma(off, alpha, standby0)
+      phantom = baseline > STANDBY_THRESHOLD_W
+      # An event when the baseline rises past the threshold, not for every reading above it
+      rising = phantom & ~_shifted(phantom, detector["phantom"])
+      if rising.any():
+          events.append((np.flatnonzero(~switch)[rising], 2, baseline[rising], np.full(int(rising.sum()), np.nan)))
+      detector.update(standby_power=float(baseline[-1]), phantom=bool(phantom[-1]))
+  
+  measured = np.flatnonzero(voltage > 0)
+  if len(measured):
+      volts = voltage[measured]
+      bands = np.where(volts < VOLTAGE_BANDS["voltage_sag"], -1, np.where(volts > VOLTAGE_BANDS["voltage_surge"], 1, 0))
+      entering = (bands != 0) & (bands != _shifted(bands, detector["voltage_band"]))
+      for kind, band, limit in ((3, -1, VOLTAGE_BANDS["voltage_sag"]), (4, 1, VOLTAGE_BANDS["voltage_surge"])):
+          hits = entering & (bands == band)
+          if hits.any():
+              events.append((measured[hits], kind, np.full(int(hits.sum()), limit), np.full(int(hits.sum()), np.nan)))
+      detector["voltage_band"] = int(bands[-1])
+  
+  detector["last_timestamp"] = int(timestamps[-1])
+  return detector, events
+
+def _anomaly_event(event_id: int, kind: str, timestamp: int, device_name: str, power: float, voltage: float,
+                   current: float, level: float, spread: float) -> dict:
+  event = {"id": event_id, "timestamp": pd.Timestamp(timestamp).strftime(TIMESTAMP_FORMAT),
+           "device": device_name, "kind": kind}
+  if kind == "phantom_load":
+      event.update(standby_power=round(level, 2), monthly_cost=round(_standby_monthly_cost(level), 2))
+  elif kind in VOLTAGE_BANDS:
+      event.update(voltage=voltage, limit=round(level, 1), current=current, power=power)
+  else:
+      event.update(power=power, expected_power=round(level, 2), std_power=round(spread, 2),
+                   z=round((power - level) / spread, 1) if spread > 0 else None)
+  return event
+
+@stage("anomalies")
+def _detect_anomalies(state: dict | None, frame: pd.DataFrame) -> dict:
+  """
+  Fold time-sorted readings into a tenant's anomaly state and return the new state.
+
+  Each device keeps EWMA mean/variance of its on-state power, an EWMA standby baseline and
+  its voltage band, so work is O(1) per reading and memory O(1) per device; the readings of a
+  batch are filtered per device in vectorized passes. Only the ANOMALY_FEED_SIZE most recent
+  events are kept (as dicts); the counts cover every event ever detected.
+  """
+  state = state or {"devices": {}, "events": deque(maxlen=ANOMALY_FEED_SIZE),
+                    "counts": dict.fromkeys(ANOMALY_KINDS, 0), "next_id": 1}
+  if frame is None or frame.empty:
+      return state
+  
+  names = frame["device_name"].cat.categories
+  codes = frame["device_name"].cat.codes.to_numpy()
+  order = np.argsort(codes, kind="stable")
+  sorted_codes = codes[order]
+  starts = np.flatnonzero(np.diff(sorted_codes, prepend=-1))
+  ends = np.append(starts[1:], len(order))
+  timestamps = frame["timestamp"].to_numpy().view(np.int64)
+  power = _measurement(frame, "power").to_numpy(dtype=np.float64)
+  voltage = _measurement(frame, "voltage").to_numpy(dtype=np.float64)
+  switch = frame["switch_status"].to_numpy(dtype=bool)
+  
+  devices = dict(state["devices"])
+  found = []
+  for code, start, end in zip(sorted_codes[starts].tolist(), starts.tolist(), ends.tolist()):
+      name = names[code]
+      detector = devices.get(name) or _new_detector()
+      rows = order[start:end]
+      if detector["last_timestamp"] is not None:
+          rows = rows[np.searchsorted(timestamps[rows], detector["last_timestamp"], side="right"):]
+      if not len(rows):
+          continue
+      devices[name], events = _detect_device(detector, timestamps[rows], power[rows], voltage[rows], switch[rows])
+      found.extend((rows[positions], kind, level, spread) for positions, kind, level, spread in events)
+  
+  counts = dict(state["counts"])
+  feed = deque(state["events"], maxlen=ANOMALY_FEED_SIZE)
+  next_id = state["next_id"]
+  if found:
+      rows = np.concatenate([rows for rows, _, _, _ in found])
+      kinds = np.concatenate([np.full(len(rows), kind) for rows, kind, _, _ in found])
+      levels = np.concatenate([level for _, _, level, _ in found])
+      spreads = np.concatenate([spread for _, _, _, spread in found])
+      # Frame rows are in time order, so sorting by row orders the events by time
+      by_time = np.argsort(rows, kind="stable")
+      for kind, count in enumerate(np.bincount(kinds, minlength=len(ANOMALY_KINDS)).tolist()):
+          counts[ANOMALY_KINDS[kind]] += count
+      # Only the events that stay in the feed are formatted
+      kept = by_time[-ANOMALY_FEED_SIZE:] if ANOMALY_FEED_SIZE else by_time[:0]
+      first_id = next_id + len(by_time) - len(kept)
+      current = _measurement(frame, "current")
+      for offset, event in enumerate(kept.tolist()):
+          row = int(rows[event])
+          feed.append(_anomaly_event(first_id + offset, ANOMALY_KINDS[kinds[event]], int(timestamps[row]),
+                                     names[codes[row]], float(power[row]), float(voltage[row]),
+                                     float(current.iat[row]), float(levels[event]), float(spreads[event])))
+      next_id += len(by_time)
+  return {"devices": devices, "events": feed, "counts": counts, "next_id": next_id}
+
+# ---------------------------------------------------------------------------
+# PARALLEL INDEX BUILD (process pool over a shared Arrow IPC file)
+# ---------------------------------------------------------------------------
+# Worker processes for building the device index; 0 builds it on the request thread
+ANALYTICS_WORKERS = int(os.environ.get("ENERGY_ANALYTICS_WORKERS", "0"))
+# Smaller frames are indexed in-process, where they finish before IPC and task overhead pays off
+PARALLEL_MIN_ROWS = int(os.environ.get("ENERGY_PARALLEL_MIN_ROWS", "1000000"))
+INDEX_COLUMNS = ["timestamp", "device_name", "power", "electricity", "switch_status", "hour", "date"]
+# tmpfs when available, so the IPC file is shared memory rather than disk
+SHARED_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_analytics_pool: ProcessPoolExecutor | None = None
+_analytics_pool_size = 0
+_analytics_pool_lock = threading.Lock()
+
+def _get_analytics_pool(workers: int) -> ProcessPoolExecutor:
+  """The shared worker pool, (re)started with the requested number of processes."""
+  global _analytics_pool, _analytics_pool_size
+  with _analytics_pool_lock:
+      if _analytics_pool is None or _analytics_pool_size != workers:
+          if _analytics_pool is not None:
+              _analytics_pool.shutdown(wait=True)
+          # spawn rather than fork: forking a threaded server can copy held locks into the child
+          _analytics_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+          _analytics_pool_size = workers
+      return _analytics_pool
+
+@stage("groupby")
+def _build_device_index(frame: pd.DataFrame) -> dict[str, dict]:
+  """The device index for a frame, built across the worker pool when it is configured and worthwhile."""
+  if ANALYTICS_WORKERS < 1 or pa is None or len(frame) < PARALLEL_MIN_ROWS:
+      return _device_stats(frame)
+  return _parallel_device_stats(frame, ANALYTICS_WORKERS)
+
+def _device_shards(row_counts: np.ndarray, shards: int) -> list[list[int]]:
+  """Split device codes into shards with similar row totals (largest devices placed first)."""
+  loads = np.zeros(shards, dtype=np.int64)
+  codes = [[] for _ in range(shards)]
+  for code in np.argsort(row_counts, kind="stable")[::-1]:
+      if row_counts[code] == 0:
+          break
+      target = int(loads.argmin())
+      codes[target].append(int(code))
+      loads[target] += row_counts[code]
+  return [shard for shard in codes if shard]
+
+def _parallel_device_stats(frame: pd.DataFrame, workers: int) -> dict[str, dict]:
+  """
+  Compute _device_stats across worker processes, one shard of devices per task.
+
+  The readings are written once to an Arrow IPC file in shared memory. Each worker maps
+  it without copying and materializes only its own devices' rows, so the frame is never
+  pickled. The results are the small per-device aggregate dicts.
+  """
+  table = pa.Table.from_pandas(frame[INDEX_COLUMNS], preserve_index=False).combine_chunks()
+  fd, path = tempfile.mkstemp(suffix=".arrow", dir=SHARED_TMP_DIR)
+  os.close(fd)
+  try:
+      with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+          writer.write_table(table)
+      del table
+
+      row_counts = np.bincount(frame["device_name"].cat.codes, minlength=len(frame["device_name"].cat.categories))
+      pool = _get_analytics_pool(workers)
+      futures = [pool.submit(_device_stats_worker, path, shard) for shard in _device_shards(row_counts, workers)]
+      index = {}
+      for future in futures:
+          index.update(future.result())
+  finally:
+      os.remove(path)
+  return _order_by_first_appearance(index, frame)
+
+def _device_stats_worker(path: str, device_codes: list[int]) -> dict[str, dict]:
+  """Pool task: _device_stats for the devices with the given category codes, read from the shared IPC file."""
+  with pa.memory_map(path) as source:
+      table = pa.ipc.open_file(source).read_all()
+      codes = table.column("device_name").combine_chunks().indices.to_numpy()
+      frame = table.filter(pa.array(np.isin(codes, device_codes))).to_pandas()
+  return _device_stats(frame)
+
+def generate_device_data(tenant: dict) -> dict:
   """Generate device-specific data and analysis."""
-  if df is None or df.empty:
+  if tenant["df"] is None or tenant["df"].empty:
       return {}
   
   device_data = {}
-  unique_devices = df['device_name'].unique()
-  
-  for device_name in unique_devices:
-      device_df = df[df['device_name'] == device_name]
+  efficiencies = _device_efficiencies(tenant)
+  for device_name, stats in tenant["device_index"].items():
+      current_power = stats['latest_power']
+      is_active = stats['latest_switch']
+      efficiency = efficiencies[device_name]
       
-      if not device_df.empty:
-          # Get latest reading
-          latest_reading = device_df.iloc[-1]
-          current_power = float(latest_reading['power'])
-          print(f"DEBUG: Type of switch_status in DataFrame for {device_name} (before assignment): {type(latest_reading['switch_status'])}") # NEW DEBUG
-          is_active = bool(latest_reading['switch_status']) # Should already be Python bool
-          
-          # Calculate totals
-          total_energy = float(device_df['electricity'].sum())
-          peak_usage = float(device_df['power'].max())
-          avg_power = float(device_df['power'].mean())
-          
-          # Calculate efficiency based on usage patterns
-          efficiency = calculate_device_efficiency(device_df, device_name)
-          
-          # Generate suggestions based on data analysis only
-          suggestions = generate_device_suggestions(device_name, current_power, efficiency, is_active)
-          
-          # Get hourly usage pattern
-          hourly_usage = {int(k): float(v) for k, v in device_df.groupby('hour')['power'].mean().to_dict().items()} # Ensure int keys, float values
-          
-          device_data[device_name] = {
-              'currentPower': current_power,
-              'totalEnergy': total_energy,
-              'peakUsage': peak_usage,
-              'averagePower': avg_power,
-              'isActive': is_active, # Reflect real device status
-              'efficiency': efficiency,
-              'suggestions': suggestions,
-              'hourlyUsage': hourly_usage,
-              'dataPoints': len(device_df)
-          }
+      # Generate suggestions based on data analysis only
+      suggestions = generate_device_suggestions(device_name, current_power, efficiency, is_active)
+      
+      device_data[device_name] = {
+          'currentPower': current_power,
+          'totalEnergy': stats['total_energy'],
+          'peakUsage': stats['peak_usage'],
+          'averagePower': stats['power_sum'] / stats['count'],
+          'isActive': is_active, # Reflect real device status
+          'efficiency': efficiency,
+          'suggestions': suggestions,
+          'hourlyUsage': _hourly_means(stats),
+          'dataPoints': stats['count']
+      }
   
   return device_data
 
-def calculate_device_efficiency(device_df: pd.DataFrame, device_name: str) -> float:
-  """Calculate device efficiency based on usage patterns."""
-  if device_df.empty:
-      return 85.0
-  
-  # Calculate efficiency based on power consistency and switch usage
-  power_values = device_df['power'].values
-  switch_on_time = device_df['switch_status'].sum() / len(device_df)
-  
+def _device_data(tenant: dict) -> dict:
+  """generate_device_data for a snapshot, computed once and shared by every route that needs it."""
+  return _versioned(tenant, "device_data", lambda: generate_device_data(tenant))
+
+def _hourly_means(stats: dict) -> dict[int, float]:
+  """Mean power per hour of day for the hours that have readings."""
+  counts = stats['hourly_count']
+  return {hour: float(stats['hourly_power_sum'][hour] / counts[hour]) for hour in np.flatnonzero(counts).tolist()}
+
+def _efficiency_score(on_count: int, power_mean: float, power_std: float, device_name: str) -> float:
+  """Blend on-state power consistency with the category's base efficiency."""
   # Power efficiency (consistency when on)
-  on_power_values = device_df[device_df['switch_status'] == True]['power']
-  if len(on_power_values) > 1:
-      power_std = on_power_values.std()
-      power_mean = on_power_values.mean()
+  if on_count > 1:
       power_consistency = max(0, 100 - (power_std / power_mean * 100)) if power_mean > 0 else 0
   else:
       power_consistency = 85
@@ -167,120 +1613,194 @@ def calculate_device_efficiency(device_df: pd.DataFrame, device_name: str) -> fl
   
   return min(max(efficiency, 60), 98)
 
-def generate_device_suggestions(device_name: str, current_power: float, efficiency: float, is_active: bool) -> list[str]:
-  """Generate sophisticated AI-powered suggestions with financial impact and technical depth."""
-  suggestions = []
+def efficiency_scores(on_count: np.ndarray, power_mean: np.ndarray, power_m2: np.ndarray,
+                      device_names: list[str]) -> np.ndarray:
+  """_efficiency_score for many devices at once, from on-state counts and power moments."""
+  on_count = np.asarray(on_count)
+  power_mean = np.asarray(power_mean, dtype=np.float64)
+  with np.errstate(divide="ignore", invalid="ignore"):
+      power_std = np.sqrt(np.asarray(power_m2, dtype=np.float64) / (on_count - 1))
+      consistency = np.where(power_mean > 0, np.maximum(0, 100 - (power_std / power_mean * 100)), 0)
+  consistency = np.where(on_count > 1, consistency, 85)
+  base = np.array([sum(DEVICE_CATEGORIES.get(name, {'efficiency_range': (80, 90)})['efficiency_range']) / 2
+                   for name in device_names], dtype=np.float64)
+  return np.clip(consistency * 0.4 + base * 0.6, 60, 98)
+
+def _device_efficiencies(tenant: dict) -> dict[str, float]:
+  """Efficiency of every device in a snapshot, scored in one vectorized pass over the device index."""
+  def score():
+      index = tenant["device_index"]
+      names = list(index)
+      scores = efficiency_scores(
+          np.array([stats["on_count"] for stats in index.values()], dtype=np.int64),
+          np.array([stats["on_power_mean"] for stats in index.values()], dtype=np.float64),
+          np.array([stats["on_power_m2"] for stats in index.values()], dtype=np.float64),
+          names)
+      return dict(zip(names, scores.tolist()))
+  return _versioned(tenant, "efficiency", score)
+
+def calculate_efficiencies(frame: pd.DataFrame) -> dict[str, float]:
+  """calculate_device_efficiency for every device of a frame in one grouped pass."""
+  if frame.empty:
+      return {}
+  on_count = frame.groupby("device_name", sort=False, observed=True)["switch_status"].sum()
+  moments = _on_power_moments(frame)
+  names = on_count.index.tolist()
+  means, m2s = zip(*(moments.get(name, (0.0, 0.0)) for name in names))
+  scores = efficiency_scores(on_count.to_numpy(dtype=np.int64), means, m2s, names)
+  return dict(zip(names, scores.tolist()))
+
+def calculate_device_efficiency(device_df: pd.DataFrame, device_name: str) -> float:
+  """Calculate device efficiency based on usage patterns."""
+  if device_df.empty:
+      return 85.0
   
-  # Device-specific optimization strategies with ROI calculations
-  device_strategies = {
-      'AC': {
-          'low_efficiency': [
-              f"AC efficiency at {efficiency:.1f}% indicates potential 35-40% cost savings through inverter upgrade. ROI: 4.2 years with ₹800/month savings.",
-              "Implement smart scheduling: Pre-cool during off-peak hours (2-5PM) and raise thermostat 2°C during peak hours. Immediate 25% cost reduction.",
-              "Install programmable thermostat with occupancy sensors. Reduces runtime by 30% through zone-based cooling optimization."
-          ],
-          'standby_power': [
-              f"AC consuming {current_power:.1f}W in standby mode costs ₹{(current_power * 24 * 30 * 5.5 / 1000):.0f}/month. Install smart switch for 100% elimination.",
-              "Phantom load detected. Smart power management can eliminate this ₹200+/month waste through automated standby control."
-          ],
-          'optimization': [
-              "Consider variable refrigerant flow (VRF) system for 40% efficiency improvement and precise temperature control.",
-              "Implement demand response automation: Shift 60% of cooling load to off-peak hours for 30% cost reduction."
-          ]
-      },
-      'Fridge': {
-          'low_efficiency': [
-              f"Fridge efficiency at {efficiency:.1f}% suggests compressor optimization needed. Professional maintenance can improve efficiency by 15-20%.",
-              "Consider upgrading to 5-star BEE rated model. Investment: ₹35,000, Annual savings: ₹4,200, Payback: 8.3 years.",
-              "Implement smart temperature monitoring: Optimal 3-4°C reduces energy consumption by 12% while maintaining food safety."
-          ],
-          'optimization': [
-              "Install door seal sensors and temperature alerts for 8-10% efficiency improvement through proactive maintenance.",
-              "Optimize placement: Ensure 6-inch clearance from walls and away from heat sources for 15% efficiency gain."
-          ]
-      },
-      'Television': {
-          'standby_power': [
-              f"TV standby consumption of {current_power:.1f}W costs ₹{(current_power * 24 * 30 * 5.5 / 1000):.0f}/month. Smart power strips eliminate 100% of phantom load.",
-              "Entertainment center phantom loads typically waste ₹300-500/month. Automated power management ROI: 3-4 months."
-          ],
-          'optimization': [
-              "Implement viewing time automation: Auto-shutdown after 2 hours of inactivity saves 20-25% on entertainment energy costs.",
-              "Optimize display settings: Reduce brightness by 20% for 15% power reduction with minimal visual impact."
-          ]
-      },
-      'Light': {
-          'optimization': [
-              f"LED upgrade opportunity: Current lighting efficiency at {efficiency:.1f}% vs 95%+ for premium LEDs. 60-70% energy reduction possible.",
-              "Smart lighting automation: Occupancy sensors and daylight harvesting can reduce lighting costs by 40-50%.",
-              "Implement circadian lighting: Automated dimming schedules reduce energy by 25% while improving sleep quality."
-          ],
-          'low_efficiency': [
-              "Incandescent/CFL detected. LED conversion: ₹2,000 investment, ₹400/month savings, 5-month payback period.",
-              "Smart dimming systems can extend LED life by 3x while reducing energy consumption by 30-40%."
-          ]
-      },
-      'Fan': {
-          'optimization': [
-              f"Fan efficiency at {efficiency:.1f}% indicates BLDC motor upgrade opportunity. 50% energy savings with variable speed control.",
-              "Smart fan automation: Temperature-based speed control reduces energy by 35% while maintaining comfort.",
-              "Ceiling fan optimization: Proper blade angle and regular cleaning improves efficiency by 15-20%."
-          ],
-          'low_efficiency': [
-              "Consider BLDC fan upgrade: ₹8,000 investment, ₹200/month savings, 3.3-year payback with superior performance.",
-              "Variable speed drives can optimize fan performance for 25-30% energy reduction through demand-based operation."
-          ]
-      },
-      'Washing Machine': {
-          'optimization': [
-              f"Washing machine efficiency at {efficiency:.1f}% suggests load optimization needed. Full loads reduce per-kg energy cost by 40%.",
-              "Cold water washing: 90% of energy goes to heating. Cold wash reduces energy by 85% with modern detergents.",
-              "Time-of-use optimization: Shift washing to off-peak hours for 35% cost reduction on heating elements."
-          ],
-          'low_efficiency': [
-              "Front-loading upgrade opportunity: 40% less water, 25% less energy, ₹300/month savings with ₹45,000 investment.",
-              "Smart load sensing technology can optimize water and energy usage for 20-25% efficiency improvement."
-          ]
-      }
+  on_power_values = _measurement(device_df, 'power')[device_df['switch_status'] == True]
+  if len(on_power_values) > 1:
+      return _efficiency_score(len(on_power_values), on_power_values.mean(), on_power_values.std(), device_name)
+  return _efficiency_score(len(on_power_values), 0.0, 0.0, device_name)
+
+# Suggestion templates per device and situation, formatted with device, efficiency,
+# power and monthly_cost (₹ at 5.5/kWh if the current draw ran all month)
+SUGGESTION_TEMPLATES = {
+  'AC': {
+      'low_efficiency': (
+          "AC efficiency at {efficiency:.1f}% indicates potential 35-40% cost savings through inverter upgrade. ROI: 4.2 years with ₹800/month savings.",
+          "Implement smart scheduling: Pre-cool during off-peak hours (2-5PM) and raise thermostat 2°C during peak hours. Immediate 25% cost reduction.",
+          "Install programmable thermostat with occupancy sensors. Reduces runtime by 30% through zone-based cooling optimization."
+      ),
+      'standby_power': (
+          "AC consuming {power:.1f}W in standby mode costs ₹{monthly_cost:.0f}/month. Install smart switch for 100% elimination.",
+          "Phantom load detected. Smart power management can eliminate this ₹200+/month waste through automated standby control."
+      ),
+      'optimization': (
+          "Consider variable refrigerant flow (VRF) system for 40% efficiency improvement and precise temperature control.",
+          "Implement demand response automation: Shift 60% of cooling load to off-peak hours for 30% cost reduction."
+      )
+  },
+  'Fridge': {
+      'low_efficiency': (
+          "Fridge efficiency at {efficiency:.1f}% suggests compressor optimization needed. Professional maintenance can improve efficiency by 15-20%.",
+          "Consider upgrading to 5-star BEE rated model. Investment: ₹35,000, Annual savings: ₹4,200, Payback: 8.3 years.",
+          "Implement smart temperature monitoring: Optimal 3-4°C reduces energy consumption by 12% while maintaining food safety."
+      ),
+      'optimization': (
+          "Install door seal sensors and temperature alerts for 8-10% efficiency improvement through proactive maintenance.",
+          "Optimize placement: Ensure 6-inch clearance from walls and away from heat sources for 15% efficiency gain."
+      )
+  },
+  'Television': {
+      'standby_power': (
+          "TV standby consumption of {power:.1f}W costs ₹{monthly_cost:.0f}/month. Smart power strips eliminate 100% of phantom load.",
+          "Entertainment center phantom loads typically waste ₹300-500/month. Automated power management ROI: 3-4 months."
+      ),
+      'optimization': (
+          "Implement viewing time automation: Auto-shutdown after 2 hours of inactivity saves 20-25% on entertainment energy costs.",
+          "Optimize display settings: Reduce brightness by 20% for 15% power reduction with minimal visual impact."
+      )
+  },
+  'Light': {
+      'optimization': (
+          "LED upgrade opportunity: Current lighting efficiency at {efficiency:.1f}% vs 95%+ for premium LEDs. 60-70% energy reduction possible.",
+          "Smart lighting automation: Occupancy sensors and daylight harvesting can reduce lighting costs by 40-50%.",
+          "Implement circadian lighting: Automated dimming schedules reduce energy by 25% while improving sleep quality."
+      ),
+      'low_efficiency': (
+          "Incandescent/CFL detected. LED conversion: ₹2,000 investment, ₹400/month savings, 5-month payback period.",
+          "Smart dimming systems can extend LED life by 3x while reducing energy consumption by 30-40%."
+      )
+  },
+  'Fan': {
+      'optimization': (
+          "Fan efficiency at {efficiency:.1f}% indicates BLDC motor upgrade opportunity. 50% energy savings with variable speed control.",
+          "Smart fan automation: Temperature-based speed control reduces energy by 35% while maintaining comfort.",
+          "Ceiling fan optimization: Proper blade angle and regular cleaning improves efficiency by 15-20%."
+      ),
+      'low_efficiency': (
+          "Consider BLDC fan upgrade: ₹8,000 investment, ₹200/month savings, 3.3-year payback with superior performance.",
+          "Variable speed drives can optimize fan performance for 25-30% energy reduction through demand-based operation."
+      )
+  },
+  'Washing Machine': {
+      'optimization': (
+          "Washing machine efficiency at {efficiency:.1f}% suggests load optimization needed. Full loads reduce per-kg energy cost by 40%.",
+          "Cold water washing: 90% of energy goes to heating. Cold wash reduces energy by 85% with modern detergents.",
+          "Time-of-use optimization: Shift washing to off-peak hours for 35% cost reduction on heating elements."
+      ),
+      'low_efficiency': (
+          "Front-loading upgrade opportunity: 40% less water, 25% less energy, ₹300/month savings with ₹45,000 investment.",
+          "Smart load sensing technology can optimize water and energy usage for 20-25% efficiency improvement."
+      )
   }
-  
-  # Get device-specific strategies
-  device_tips = device_strategies.get(device_name, {})
-  
-  # Add efficiency-based suggestions with financial impact
+}
+
+# Used when a device has no templates for the situation
+DEFAULT_SUGGESTION_TEMPLATES = {
+  'low_efficiency': (
+      "Critical efficiency alert: {device} at {efficiency:.1f}% requires immediate attention. Professional audit recommended for 20-30% improvement.",
+  ),
+  'optimization': (
+      "{device} efficiency at {efficiency:.1f}% has 15-20% improvement potential through smart optimization strategies.",
+  ),
+  'standby_power': (
+      "{device} phantom load: {power:.1f}W costs ₹{monthly_cost:.0f}/month. Smart automation eliminates 100% waste.",
+  ),
+  'performing_well': (
+      "{device} performing well at {efficiency:.1f}% efficiency. Consider smart automation for 10-15% additional optimization.",
+  ),
+}
+
+STRATEGIC_INSIGHTS = (
+  "IoT integration opportunity: Smart sensors can optimize {device} performance through predictive maintenance and usage analytics.",
+  "Energy storage synergy: Battery backup system can shift {device} usage to stored solar energy, reducing grid dependency by 60-80%.",
+  "Demand response potential: {device} automation can participate in utility programs for ₹500-1000/month additional savings."
+)
+
+MAX_DEVICE_SUGGESTIONS = 3
+SUGGESTION_CACHE_SIZE = 65_536
+
+def _efficiency_band(efficiency: float) -> str | None:
   if efficiency < 70:
-      suggestions.extend(device_tips.get('low_efficiency', [
-          f"Critical efficiency alert: {device_name} at {efficiency:.1f}% requires immediate attention. Professional audit recommended for 20-30% improvement."
-      ]))
-  elif efficiency < 85:
-      suggestions.extend(device_tips.get('optimization', [
-          f"{device_name} efficiency at {efficiency:.1f}% has 15-20% improvement potential through smart optimization strategies."
-      ]))
-  
-  # Add standby power suggestions with cost impact
-  if not is_active and current_power > 5:
-      suggestions.extend(device_tips.get('standby_power', [
-          f"{device_name} phantom load: {current_power:.1f}W costs ₹{(current_power * 24 * 30 * 5.5 / 1000):.0f}/month. Smart automation eliminates 100% waste."
-      ]))
-  
-  # Add general optimization if no specific issues
-  if not suggestions:
-      suggestions.extend(device_tips.get('optimization', [
-          f"{device_name} performing well at {efficiency:.1f}% efficiency. Consider smart automation for 10-15% additional optimization."
-      ]))
-  
-  # Add strategic insights
-  strategic_insights = [
-      f"IoT integration opportunity: Smart sensors can optimize {device_name} performance through predictive maintenance and usage analytics.",
-      f"Energy storage synergy: Battery backup system can shift {device_name} usage to stored solar energy, reducing grid dependency by 60-80%.",
-      f"Demand response potential: {device_name} automation can participate in utility programs for ₹500-1000/month additional savings."
-  ]
-  
-  # Add one strategic insight
-  if len(suggestions) < 3:
-      suggestions.append(strategic_insights[hash(device_name) % len(strategic_insights)])
-  
-  return suggestions[:3]  # Return top 3 sophisticated suggestions
+      return 'low_efficiency'
+  if efficiency < 85:
+      return 'optimization'
+  return None
+
+@lru_cache(maxsize=4096)
+def _suggestion_templates(device_name: str, band: str | None, standby: bool) -> tuple[str, ...]:
+  """The templates a device gets in a situation, resolved from the rule tables once per situation."""
+  device_tips = SUGGESTION_TEMPLATES.get(device_name, {})
+  templates = []
+  if band is not None:
+      templates.extend(device_tips.get(band, DEFAULT_SUGGESTION_TEMPLATES[band]))
+  if standby:
+      templates.extend(device_tips.get('standby_power', DEFAULT_SUGGESTION_TEMPLATES['standby_power']))
+  # General optimization if no specific issues
+  if not templates:
+      templates.extend(device_tips.get('optimization', DEFAULT_SUGGESTION_TEMPLATES['performing_well']))
+  if len(templates) < MAX_DEVICE_SUGGESTIONS:
+      # One strategic insight, chosen by a hash that is stable across processes
+      templates.append(STRATEGIC_INSIGHTS[zlib.crc32(device_name.encode()) % len(STRATEGIC_INSIGHTS)])
+  return tuple(templates[:MAX_DEVICE_SUGGESTIONS])
+
+@lru_cache(maxsize=SUGGESTION_CACHE_SIZE)
+def _formatted_suggestions(device_name: str, band: str | None, standby: bool, efficiency: float,
+                           power: float | None, monthly_cost: float | None) -> tuple[str, ...]:
+  """Format only the selected templates; values arrive rounded to the precision they are printed with."""
+  values = {"device": device_name, "efficiency": efficiency, "power": power, "monthly_cost": monthly_cost}
+  return tuple(template.format(**values) for template in _suggestion_templates(device_name, band, standby))
+
+def generate_device_suggestions(device_name: str, current_power: float, efficiency: float, is_active: bool) -> list[str]:
+  """Generate sophisticated AI-powered suggestions with financial impact and technical depth."""
+  band = _efficiency_band(efficiency)
+  standby = not is_active and current_power > 5
+  # Memoized per device, situation and printed values (efficiency and power to 0.1, cost to ₹1);
+  # rounding first gives the same text as formatting the raw values
+  power = monthly_cost = None
+  if standby:
+      power = round(current_power, 1)
+      monthly_cost = round(_standby_monthly_cost(current_power))
+  return list(_formatted_suggestions(device_name, band, standby, round(efficiency, 1), power, monthly_cost))
 
 # Tariff slabs
 SLABS_UPTO_500 = [
@@ -292,54 +1812,133 @@ SLABS_ABOVE_500 = [
   (800, 9.45), (1000, 10.5), (float("inf"), 11.55)
 ]
 
+def _slab_table(slabs: list[tuple]) -> dict:
+  """Precompute slab bounds and the cumulative cost of all slabs below each one."""
+  uppers = np.array([upper for upper, _ in slabs], dtype=np.float64)
+  rates = np.array([rate for _, rate in slabs], dtype=np.float64)
+  lowers = np.concatenate(([0.0], uppers[:-1]))
+  full_slab_cost = np.cumsum((uppers - lowers) * rates)
+  return {
+      "slabs": slabs,
+      "uppers": uppers,
+      "lowers": lowers,
+      "rates": rates,
+      "cost_below": np.concatenate(([0.0], full_slab_cost[:-1])),
+  }
+
+# Keyed by whether the bill is above 500 units
+TARIFF_TABLES = {False: _slab_table(SLABS_UPTO_500), True: _slab_table(SLABS_ABOVE_500)}
+MAX_SLABS = max(len(table["slabs"]) for table in TARIFF_TABLES.values())
+# Largest consumption /api/bill/batch accepts; far beyond any meter and safe to cast to int64
+MAX_BILL_UNITS = 1e9
+
+def calculate_bills(units) -> dict[str, np.ndarray]:
+  """
+  Slab-wise bills for an array of consumption values.
+
+  Returns arrays aligned with the input: billed units (rounded up), whether the above-500
+  tariff applies, the unrounded total, and units billed in each slab of the applied tariff.
+  """
+  units_int = np.ceil(np.asarray(units, dtype=np.float64)).astype(np.int64)
+  above_500 = units_int > 500
+  totals = np.zeros(units_int.shape, dtype=np.float64)
+  slab_units = np.zeros(units_int.shape + (MAX_SLABS,), dtype=np.int64)
+  
+  for is_above, table in TARIFF_TABLES.items():
+      rows = above_500 == is_above
+      if not rows.any():
+          continue
+      billable = np.maximum(units_int[rows], 0).astype(np.float64)
+      # Index of the slab each value ends in; every slab below it is billed in full
+      slab = np.searchsorted(table["uppers"], billable, side="left")
+      totals[rows] = table["cost_below"][slab] + (billable - table["lowers"][slab]) * table["rates"][slab]
+      per_slab = np.clip(billable[:, None] - table["lowers"], 0, table["uppers"] - table["lowers"])
+      slab_units[rows, :len(table["slabs"])] = per_slab.astype(np.int64)
+  
+  return {"units": units_int, "above_500": above_500, "total": totals, "slab_units": slab_units}
+
+def _bill_breakup(is_above: bool, slab_units: list[int]) -> list[dict]:
+  """Per-slab detail rows for one bill, for the slabs that were actually used."""
+  details = []
+  prev_limit = 0
+  for (upper, rate), units_in_slab in zip(TARIFF_TABLES[is_above]["slabs"], slab_units):
+      if units_in_slab > 0:
+          details.append({
+              "from": prev_limit + 1,
+              "to": upper if upper != float("inf") else "Above",
+              "units": units_in_slab,
+              "rate": rate,
+              "amount": round(units_in_slab * rate, 2)
+          })
+      prev_limit = upper
+  return details
+
 def calculate_bill(units: float) -> dict:
   """Return slab-wise calculation dict for the given units."""
+  # Same table lookup as calculate_bills, done on Python scalars to avoid array overhead
   units_int = int(np.ceil(units))
-  slabs = SLABS_UPTO_500 if units_int <= 500 else SLABS_ABOVE_500
+  is_above = units_int > 500
+  table = TARIFF_TABLES[is_above]
+  billable = max(units_int, 0)
+  slab = bisect.bisect_left(table["uppers"], billable)
+  total = float(table["cost_below"][slab]) + (billable - float(table["lowers"][slab])) * float(table["rates"][slab])
   
+  slab_units = []
   prev_limit = 0
-  details = []
-  total = 0.0
-  remaining = units_int
-  
-  for upper, rate in slabs:
-      slab_units = min(remaining, upper - prev_limit)
-      if slab_units <= 0:
-          prev_limit = upper
-          continue
-      
-      cost = slab_units * rate
-      details.append({
-          "from": prev_limit + 1,
-          "to": upper if upper != float("inf") else "Above",
-          "units": slab_units,
-          "rate": rate,
-          "amount": round(cost, 2)
-      })
-      
-      total += cost
-      remaining -= slab_units
+  for upper, _ in table["slabs"]:
+      slab_units.append(min(max(billable - prev_limit, 0), upper - prev_limit))
       prev_limit = upper
-      
-      if remaining <= 0:
-          break
-  
-  return {"units": units_int, "total_amount": round(total, 2), "breakup": details}
+  return {"units": units_int, "total_amount": round(total, 2), "breakup": _bill_breakup(is_above, slab_units)}
 
-def _period(hour: int) -> str:
-  if 5 <= hour <= 10:
-      return "morning"
-  if 11 <= hour <= 16:
-      return "afternoon"
-  if 17 <= hour <= 21:
-      return "evening"
-  return "night"
+# Inclusive hour ranges for each named period; hours not covered belong to DEFAULT_PERIOD.
+# A range whose start is after its end wraps past midnight.
+PERIOD_HOURS = {"morning": (5, 10), "afternoon": (11, 16), "evening": (17, 21)}
+DEFAULT_PERIOD = "night"
 
-def compute_peak_period() -> dict[str, float | dict]:
-  if df is None:
+def _build_period_lookup(period_hours: dict[str, tuple[int, int]], default: str) -> tuple[list[str], np.ndarray]:
+  """Period names (sorted) and a 24-entry array mapping each hour to its period's position."""
+  names = sorted(set(period_hours) | {default})
+  lookup = np.full(24, names.index(default), dtype=np.int8)
+  for name, (start, end) in period_hours.items():
+      hours = range(start, end + 1) if start <= end else [*range(start, 24), *range(0, end + 1)]
+      lookup[list(hours)] = names.index(name)
+  return names, lookup
+
+PERIOD_NAMES, PERIOD_LOOKUP = _build_period_lookup(PERIOD_HOURS, DEFAULT_PERIOD)
+
+def configure_periods(period_hours: dict[str, tuple[int, int]], default: str = DEFAULT_PERIOD):
+  """Change the period boundaries used by /api/peak."""
+  global PERIOD_HOURS, DEFAULT_PERIOD, PERIOD_NAMES, PERIOD_LOOKUP
+  PERIOD_NAMES, PERIOD_LOOKUP = _build_period_lookup(period_hours, default)
+  PERIOD_HOURS, DEFAULT_PERIOD = dict(period_hours), default
+  # Period totals are cached per boundaries (see compute_peak_period), but cached responses
+  # only per data version
+  for tenant_id in list(tenants):
+      _invalidate_responses(tenant_id)
+
+def _household_hourly_energy(tenant: dict) -> tuple[np.ndarray, np.ndarray]:
+  """kWh and reading counts per hour of day across all devices, from the device index."""
+  energy, counts = np.zeros(24), np.zeros(24, dtype=np.int64)
+  for stats in tenant["device_index"].values():
+      energy += stats["hourly_energy_sum"]
+      counts += stats["hourly_count"]
+  return energy, counts
+
+def _period_totals(tenant: dict, names: list[str], lookup: np.ndarray) -> pd.Series:
+  """kWh per period for the periods that have readings, indexed by period name."""
+  energy, counts = _household_hourly_energy(tenant)
+  totals = np.bincount(lookup, weights=energy, minlength=len(names))
+  has_rows = np.bincount(lookup, weights=counts, minlength=len(names)) > 0
+  return pd.Series(totals, index=names)[has_rows]
+
+def compute_peak_period(tenant: dict) -> dict[str, float | dict]:
+  if tenant["df"] is None:
       return {"error": "data_not_loaded"}
   
-  tot = df.groupby(df["hour"].apply(_period))["electricity"].sum()
+  names, lookup = PERIOD_NAMES, PERIOD_LOOKUP
+  # Keyed by the boundaries too, so configure_periods takes effect without a new snapshot
+  tot = _versioned(tenant, ("period_totals", tuple(names), lookup.tobytes()),
+                   lambda: _period_totals(tenant, names, lookup))
   if tot.empty:
       return {"error": "no_energy_column"}
   
@@ -353,39 +1952,340 @@ def _train_regressor(data_frame: pd.DataFrame):
   if data_frame.empty:
       return None, None
 
-  # Ensure 'timestamp' is datetime and 'electricity' is numeric
-  data_frame['timestamp'] = pd.to_datetime(data_frame['timestamp'])
-  data_frame['electricity'] = pd.to_numeric(data_frame['electricity'])
+  # Ensure 'timestamp' is datetime and 'electricity' is numeric, without modifying the caller's frame
+  timestamps = pd.to_datetime(data_frame['timestamp'])
+  electricity = pd.to_numeric(data_frame['electricity'])
   
-  daily = data_frame.groupby(data_frame["timestamp"].dt.date)["electricity"].sum().reset_index()
+  daily = electricity.groupby(timestamps.dt.date).sum()
+  return _fit_daily_trend(daily)
+
+def _fit_daily_trend(daily_energy: pd.Series):
+  """Fits the linear regression model to a date-indexed series of daily kWh totals."""
+  daily = daily_energy.rename("electricity").rename_axis("timestamp").reset_index()
   daily["day_num"] = np.arange(len(daily))
   
   if len(daily) < 2: # Need at least 2 points to train a linear model
-      print("DEBUG: Not enough unique days for prediction model training.") # NEW DEBUG
+      log_event(logging.DEBUG, "forecast.not_enough_days", days=len(daily))
       return None, None
       
-  model = LinearRegression().fit(daily[["day_num"]], daily["electricity"])
+  with stage("model_fit"):
+      model = LinearRegression().fit(daily[["day_num"]], daily["electricity"])
   return model, daily
 
+# ---------------------------------------------------------------------------
+# CACHED TREND FORECASTS
+# ---------------------------------------------------------------------------
+FORECAST_DAYS = 30
+HOUSEHOLD_SCOPE = ("household", None)
+
+def _trend_state(daily_energy: pd.Series) -> dict:
+  """Running sums for a least-squares line through (day_num, kWh) for each day in the series."""
+  y = daily_energy.to_numpy(dtype=np.float64)
+  x = np.arange(len(y), dtype=np.float64)
+  return {
+      "dates": daily_energy.index,
+      "y": y,
+      "n": len(y),
+      "sx": float(x.sum()),
+      "sxx": float((x * x).sum()),
+      "sy": float(y.sum()),
+      "sxy": float((x * y).sum()),
+  }
+
+def _advance_trend_state(state: dict, daily_energy: pd.Series) -> dict:
+  """Fold changed and newly added days into the running sums of a previous trend state."""
+  n_old = state["n"]
+  dates = daily_energy.index
+  if len(dates) < n_old or not dates[:n_old].equals(state["dates"]):
+      # A day was inserted before existing ones, so day numbers shifted; start over
+      return _trend_state(daily_energy)
+  
+  y = daily_energy.to_numpy(dtype=np.float64)
+  changed = np.flatnonzero(y[:n_old] != state["y"])
+  delta = y[changed] - state["y"][changed]
+  x_new = np.arange(n_old, len(y), dtype=np.float64)
+  y_new = y[n_old:]
+  return {
+      "dates": dates,
+      "y": y,
+      "n": len(y),
+      "sx": state["sx"] + float(x_new.sum()),
+      "sxx": state["sxx"] + float((x_new * x_new).sum()),
+      "sy": state["sy"] + float(delta.sum()) + float(y_new.sum()),
+      "sxy": state["sxy"] + float((changed * delta).sum()) + float((x_new * y_new).sum()),
+  }
+
+def _trend_forecast(state: dict, horizon: int = FORECAST_DAYS) -> float | None:
+  """Total kWh predicted for the next `horizon` days by the fitted line, or None with under 2 days."""
+  n = state["n"]
+  if n < 2:
+      return None
+  slope = (n * state["sxy"] - state["sx"] * state["sy"]) / (n * state["sxx"] - state["sx"] ** 2)
+  intercept = (state["sy"] - slope * state["sx"]) / n
+  # Sum of the line over day numbers n .. n + horizon - 1
+  future_x_sum = horizon * n + horizon * (horizon - 1) / 2
+  return float(horizon * intercept + slope * future_x_sum)
+
+def _household_daily(tenant: dict) -> pd.Series:
+  """Daily kWh totals across all devices, assembled from the device index."""
+  daily = [stats["daily_energy"] for stats in tenant["device_index"].values()]
+  if not daily:
+      return pd.Series(dtype=np.float64)
+  return pd.concat(daily).groupby(level=0).sum()
+
+def _forecast_kwh(tenant: dict, scope: tuple) -> float | None:
+  """Predicted kWh for the next FORECAST_DAYS days for a scope, reusing the cached fit when possible."""
+  version = tenant["ingest_stats"]["data_version"]
+  cached = tenant["forecast_cache"].get(scope)
+  if cached is not None and cached["version"] == version:
+      return cached["predicted_kwh"]
+  
+  if scope == HOUSEHOLD_SCOPE:
+      daily = _household_daily(tenant)
+  else:
+      daily = tenant["device_index"][scope[1]]["daily_energy"]
+  with stage("model_fit"):
+      state = _advance_trend_state(cached["state"], daily) if cached is not None else _trend_state(daily)
+      predicted_kwh = _trend_forecast(state)
+  tenant["forecast_cache"][scope] = {"version": version, "state": state, "predicted_kwh": predicted_kwh}
+  return predicted_kwh
+
+@stage("model_fit")
+def _batch_trend_forecasts(daily_matrix: np.ndarray, horizon: int = FORECAST_DAYS) -> np.ndarray:
+  """
+  Least-squares trend forecasts for every row of a (series x day) matrix at once.
+
+  Missing days are NaN. As with _trend_forecast, each row's days are numbered by position
+  among the days it has data for, and rows with fewer than 2 days forecast NaN.
+  """
+  present = ~np.isnan(daily_matrix)
+  y = np.where(present, daily_matrix, 0.0)
+  x = np.where(present, np.cumsum(present, axis=1) - 1, 0).astype(np.float64)
+  
+  n = present.sum(axis=1).astype(np.float64)
+  sx, sy = x.sum(axis=1), y.sum(axis=1)
+  sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+  
+  with np.errstate(divide="ignore", invalid="ignore"):
+      slope = (n * sxy - sx * sy) / (n * sxx - sx ** 2)
+      intercept = (sy - slope * sx) / n
+  future_x_sum = horizon * n + horizon * (horizon - 1) / 2
+  return np.where(n >= 2, horizon * intercept + slope * future_x_sum, np.nan)
+
+# ---------------------------------------------------------------------------
+# PERSISTENT STORAGE (date-partitioned Parquet)
+# ---------------------------------------------------------------------------
+STORED_COLUMNS = ["timestamp", "device_name", "power", "voltage", "current", "electricity", "switch_status"]
+# Rows per Parquet row group; time-ordered groups let time-range filters skip whole groups
+STORAGE_ROW_GROUP_ROWS = 64_000
+
+def _storage_enabled() -> bool:
+  return STORAGE_DIR is not None and ds is not None
+
+def _readings_path(tenant_id: str = DEFAULT_TENANT) -> str:
+  # The default tenant keeps the single-tenant layout so existing stores are still found
+  if tenant_id == DEFAULT_TENANT:
+      return os.path.join(STORAGE_DIR, "readings")
+  return os.path.join(STORAGE_DIR, "tenants", tenant_id, "readings")
+
+def _storage_partitioning():
+  """Hive-style partitions: date=YYYY-MM-DD, plus device_name=... when enabled."""
+  fields = [pa.field("date", pa.date32())]
+  if STORAGE_PARTITION_BY_DEVICE:
+      fields.append(pa.field("device_name", pa.string()))
+  return ds.partitioning(pa.schema(fields), flavor="hive")
+
+def _readings_table(frame: pd.DataFrame) -> pa.Table:
+  """Arrow table of the stored columns, with exact float64 measurements and the partition key."""
+  columns = {column: frame[column] for column in STORED_COLUMNS}
+  columns["device_name"] = frame["device_name"].astype(str)
+  columns.update({column: _measurement(frame, column) for column in FLOAT32_COLUMNS})
+  # Position in the store breaks timestamp ties on reload, so device order survives restarts
+  columns["seq"] = np.arange(len(frame), dtype=np.int64)
+  table = pa.Table.from_pandas(pd.DataFrame(columns), preserve_index=False)
+  dates = frame["timestamp"].to_numpy().astype("datetime64[D]")
+  return table.append_column("date", pa.array(dates, type=pa.date32()))
+
+def _write_partitions(frame: pd.DataFrame, base_dir: str, existing_data_behavior: str):
+  ds.write_dataset(
+      _readings_table(frame), base_dir, format="parquet",
+      partitioning=_storage_partitioning(),
+      basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+      existing_data_behavior=existing_data_behavior,
+      max_rows_per_group=STORAGE_ROW_GROUP_ROWS,
+  )
+
+@stage("persist")
+def _persist_all(frame: pd.DataFrame, tenant_id: str = DEFAULT_TENANT):
+  """Replace a tenant's stored readings with frame, swapping directories so a crash never leaves a mix."""
+  path = _readings_path(tenant_id)
+  staging, retired = f"{path}.staging", f"{path}.old"
+  shutil.rmtree(staging, ignore_errors=True)
+  _write_partitions(frame, staging, "error")
+  shutil.rmtree(retired, ignore_errors=True)
+  if os.path.isdir(path):
+      os.replace(path, retired)
+  os.replace(staging, path)
+  shutil.rmtree(retired, ignore_errors=True)
+
+@stage("persist")
+def _persist_dates(frame: pd.DataFrame, dates, tenant_id: str = DEFAULT_TENANT):
+  """Rewrite only the date partitions touched by an append."""
+  dates = pd.DatetimeIndex(dates)
+  timestamps = frame["timestamp"]
+  # The store is time-sorted, so the touched days lie inside one contiguous slice
+  lo = timestamps.searchsorted(dates.min(), side="left")
+  hi = timestamps.searchsorted(dates.max() + pd.Timedelta(days=1), side="left")
+  touched = frame.iloc[lo:hi]
+  touched = touched[touched["date"].isin(dates)]
+  _write_partitions(touched, _readings_path(tenant_id), "delete_matching")
+
+def _has_stored_readings(tenant_id: str = DEFAULT_TENANT) -> bool:
+  return _storage_enabled() and os.path.isdir(_readings_path(tenant_id))
+
+def _storage_dataset(tenant_id: str = DEFAULT_TENANT):
+  return ds.dataset(_readings_path(tenant_id), format="parquet", partitioning=_storage_partitioning())
+
+def scan_readings(device_name: str | None = None, start: datetime | None = None,
+                  end: datetime | None = None, tenant_id: str = DEFAULT_TENANT) -> pd.DataFrame:
+  """
+  Read stored readings for an optional device and [start, end) window.
+
+  The filters are pushed down to the dataset scan: date (and device) partitions outside
+  them are never opened, and row groups are skipped using their timestamp statistics.
+  """
+  conditions = []
+  if device_name is not None:
+      conditions.append(ds.field("device_name") == device_name)
+  if start is not None:
+      conditions.append(ds.field("date") >= pa.scalar(start.date(), pa.date32()))
+      conditions.append(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("ns")))
+  if end is not None:
+      conditions.append(ds.field("date") <= pa.scalar(end.date(), pa.date32()))
+      conditions.append(ds.field("timestamp") < pa.scalar(end, pa.timestamp("ns")))
+
+  table = _storage_dataset(tenant_id).to_table(
+      columns=STORED_COLUMNS + ["seq"],
+      filter=reduce(lambda a, b: a & b, conditions) if conditions else None,
+  )
+  frame = table.to_pandas()
+  frame["device_name"] = frame["device_name"].astype(str)
+  frame = frame.sort_values(["timestamp", "seq"], kind="stable", ignore_index=True)
+  return frame.drop(columns="seq")
+
+def restore_from_storage(tenant_id: str = DEFAULT_TENANT) -> dict | None:
+  """Load a tenant's persisted readings into memory; returns the published snapshot, if any."""
+  if not _has_stored_readings(tenant_id):
+      return None
+  frame = scan_readings(tenant_id=tenant_id)
+  if frame.empty:
+      return None
+  return _set_data(tenant_id, _add_derived_columns(frame), "storage", persist=False)
+
 # ---------------------------------------------------------------------------
 # API ROUTES
 # ---------------------------------------------------------------------------
 @app.route("/api/upload", methods=["POST"])
 def r_upload():
-  print("DEBUG: /api/upload endpoint hit.") # DEBUG
   try:
-      payload = request.get_json(force=True)
-      print(f"DEBUG: Received payload with {len(payload)} items.") # DEBUG
-      load_data_from_json(payload)
-      print(f"DEBUG: Data loaded successfully. Total rows in df: {len(df) if df is not None else 0}") # DEBUG
+      with stage("parse"):
+          payload = request.get_json(force=True)
+      df = load_data_from_json(payload, _request_tenant_id())
       return jsonify({"rows_loaded": len(df), "status": "success"})
   except Exception as e:
-      print(f"ERROR: Upload failed: {e}") # DEBUG
+      log_event(logging.WARNING, "upload.failed", tenant=_request_tenant_id(), error=str(e))
+      return jsonify({"error": str(e), "status": "error"}), 400
+
+@app.route("/api/upload/stream", methods=["POST"])
+def r_upload_stream():
+  """Ingest a JSON array or NDJSON body incrementally in fixed-size batches."""
+  started = time.perf_counter()
+  try:
+      if request.mimetype in NDJSON_MIMETYPES:
+          records = _iter_ndjson(request.stream)
+      else:
+          records = _iter_json_array(request.stream)
+      batch_size = request.args.get("batch_size", UPLOAD_BATCH_SIZE, type=int)
+      # Records are parsed and converted batch by batch, so this stage covers both
+      with stage("parse"):
+          frame, batches = _frame_from_stream(records, batch_size=max(batch_size, 1))
+      if frame.empty:
+          raise ValueError("No valid rows in payload")
+      with stage("frame"):
+          frame = _add_derived_columns(frame)
+      df = _set_data(_request_tenant_id(), frame, "stream")["df"]
+      
+      elapsed = time.perf_counter() - started
+      return jsonify({
+          "rows_loaded": len(df),
+          "status": "success",
+          "batches": batches,
+          "elapsed_sec": round(elapsed, 3),
+          "rows_per_sec": round(len(df) / elapsed, 1) if elapsed > 0 else None,
+          "peak_rss_mb": _peak_rss_mb()
+      })
+  except Exception as e:
+      log_event(logging.WARNING, "upload.failed", tenant=_request_tenant_id(), mode="stream", error=str(e))
+      return jsonify({"error": str(e), "status": "error"}), 400
+
+@app.route("/api/upload/append", methods=["POST"])
+def r_upload_append():
+  """Merge a batch of new readings into the loaded data instead of replacing it."""
+  try:
+      with stage("parse"):
+          if request.mimetype in NDJSON_MIMETYPES:
+              payload = list(_iter_ndjson(request.stream))
+          else:
+              payload = request.get_json(force=True)
+      with stage("frame"):
+          batch = _frame_from_records(payload)
+          if batch.empty:
+              raise ValueError("No valid rows in payload")
+          received = len(batch)
+          batch = _add_derived_columns(batch).drop_duplicates(["device_name", "timestamp"], keep="last")
+      
+      tenant_id = _request_tenant_id()
+      # Appends build on the current version, so they run one at a time per tenant
+      with _tenant_lock(tenant_id):
+          tenant = get_tenant(tenant_id)
+          df = tenant["df"]
+          if df is None or df.empty:
+              merged, replaced = batch.reset_index(drop=True), batch.iloc[0:0]
+              device_index = _build_device_index(merged)
+              rollups = _build_rollups(merged)
+          else:
+              with stage("frame"):
+                  merged, replaced = _merge_readings(df, batch)
+              device_index = _appended_device_index(tenant["device_index"], batch, replaced, merged)
+              rollups = _appended_rollups(tenant["rollups"], merged, batch["timestamp"].min())
+          # The detector only needs the new readings
+          anomalies = _detect_anomalies(tenant["anomalies"], batch)
+          rows_added = len(merged) - (len(df) if df is not None else 0)
+          if df is None:
+              memory_bytes = _frame_memory_bytes(merged)
+          else:
+              # Adjust the footprint by the batch instead of re-measuring the whole store
+              memory_bytes = tenant["ingest_stats"]["memory_bytes"] + _frame_memory_bytes(batch) - _frame_memory_bytes(replaced)
+          if _storage_enabled():
+              _persist_dates(merged, batch["date"].unique(), tenant_id)
+          _publish(_snapshot(tenant_id, merged, device_index, "append", memory_bytes, tenant["forecast_cache"],
+                             rollups, anomalies))
+      
+      return jsonify({
+          "rows_received": received,
+          "rows_added": rows_added,
+          "rows_replaced": len(replaced),
+          "total_rows": len(merged),
+          "status": "success"
+      })
+  except Exception as e:
+      log_event(logging.WARNING, "upload.failed", tenant=_request_tenant_id(), mode="append", error=str(e))
       return jsonify({"error": str(e), "status": "error"}), 400
 
 @app.route("/api/peak")
+@cached_response()
 def r_peak():
-  return jsonify(compute_peak_period())
+  return jsonify(compute_peak_period(get_tenant(_request_tenant_id())))
 
 @app.route("/api/bill")
 def r_bill():
@@ -394,35 +2294,98 @@ def r_bill():
       return jsonify({"error": "units query-param missing"}), 400
   return jsonify(calculate_bill(units))
 
+@app.route("/api/bill/batch", methods=["POST"])
+def r_bill_batch():
+  """Bill many consumption values at once; send {"units": [...], "breakup": false}."""
+  payload = request.get_json(force=True, silent=True)
+  if not isinstance(payload, dict):
+      return jsonify({"error": "body must be a JSON object"}), 400
+  units = payload.get("units")
+  if not isinstance(units, list) or not units:
+      return jsonify({"error": "units must be a non-empty list"}), 400
+  # bool is an int subclass, and NaN, infinities or huge values would wrap in the int64 cast
+  invalid = [
+      i for i, value in enumerate(units)
+      if isinstance(value, bool) or not isinstance(value, (int, float))
+      or not -MAX_BILL_UNITS <= value <= MAX_BILL_UNITS
+  ]
+  if invalid:
+      return jsonify({"error": f"units must be finite numbers within +/-{MAX_BILL_UNITS:.0e}",
+                      "invalid_indices": invalid[:10]}), 400
+  bills = calculate_bills(units)
+  
+  response = {
+      "count": len(units),
+      "units": bills["units"].tolist(),
+      "total_amount": [round(total, 2) for total in bills["total"].tolist()]
+  }
+  if payload.get("breakup", False):
+      response["breakup"] = [
+          _bill_breakup(is_above, slab_units)
+          for is_above, slab_units in zip(bills["above_500"].tolist(), bills["slab_units"].tolist())
+      ]
+  return jsonify(response)
+
 @app.route("/api/predict")
+@cached_response()
 def r_predict():
-  if df is None:
-      return jsonify({"error": "data_not_loaded"}), 400
+  body, status = _household_prediction(get_tenant(_request_tenant_id()))
+  return jsonify(body), status
+
+def _household_prediction(tenant: dict) -> tuple[dict, int]:
+  """The /api/predict body and status code for a tenant snapshot."""
+  if tenant["df"] is None:
+      return {"error": "data_not_loaded"}, 400
   
-  model, daily = _train_regressor(df)
-  if model is None:
-      return jsonify({"error": "not_enough_data_for_prediction"}), 400
+  pred_kwh = _forecast_kwh(tenant, HOUSEHOLD_SCOPE)
+  if pred_kwh is None:
+      return {"error": "not_enough_data_for_prediction"}, 400
       
-  last_day = daily["day_num"].max()
-  future = np.arange(last_day + 1, last_day + 31).reshape(-1, 1)
-  pred_kwh = float(model.predict(future).sum())
   bill = calculate_bill(pred_kwh)
   
-  return jsonify({"predicted_kwh": round(pred_kwh, 2), "bill": bill})
+  return {"predicted_kwh": round(pred_kwh, 2), "bill": bill}, 200
+
+@app.route("/api/predict/devices")
+@cached_response()
+def r_predict_devices():
+  """Forecast every device in one vectorized pass instead of one request per device."""
+  tenant = get_tenant(_request_tenant_id())
+  if tenant["df"] is None:
+      return jsonify({"error": "data_not_loaded"}), 400
+  
+  index = tenant["device_index"]
+  # Device x day matrix of daily kWh, NaN where a device has no readings that day
+  daily_matrix = pd.DataFrame({name: stats["daily_energy"] for name, stats in index.items()}).sort_index().T
+  predictions = _batch_trend_forecasts(daily_matrix.to_numpy(dtype=np.float64))
+  
+  forecasts = {}
+  for device_name, predicted_kwh in zip(daily_matrix.index, predictions.tolist()):
+      has_forecast = not np.isnan(predicted_kwh)
+      forecasts[device_name] = {
+          "predicted_kwh": round(predicted_kwh, 2) if has_forecast else 0.0,
+          "predicted_bill": calculate_bill(predicted_kwh) if has_forecast else None
+      }
+  
+  return jsonify({"horizon_days": FORECAST_DAYS, "devices": len(forecasts), "forecasts": forecasts})
 
 @app.route("/api/suggestions")
+@cached_response()
 def r_suggestions():
-  if df is None or df.empty:
-      return jsonify({"suggestions": [
+  return jsonify({"suggestions": household_suggestions(get_tenant(_request_tenant_id()))})
+
+def household_suggestions(tenant: dict) -> list[str]:
+  """Household-level suggestions from the peak periods and device analytics of a snapshot."""
+  if tenant["df"] is None or tenant["df"].empty:
+      return [
           "🚀 Upload device data to unlock AI-powered energy optimization with ROI analysis and strategic recommendations.",
           "💡 Smart energy management can typically reduce costs by 25-40% through data-driven optimization strategies.",
           "⚡ Professional energy audit available: Identify ₹500-2000/month savings opportunities through advanced analytics."
-      ]})
+      ]
   
   suggestions = []
   
   # Strategic peak usage analysis
-  peak_data = compute_peak_period()
+  peak_data = compute_peak_period(tenant)
   if "peak_period" in peak_data:
       peak = peak_data["peak_period"]
       period_kwh = peak_data.get("period_kwh", {})
@@ -439,7 +2402,7 @@ def r_suggestions():
           suggestions.append("🌅 Morning Peak Detected: Implement smart water heating schedules and delayed appliance starts for 20-25% cost reduction during high-demand periods.")
   
   # Advanced device analytics
-  device_data = generate_device_data()
+  device_data = _device_data(tenant)
   total_power = sum(data['currentPower'] for data in device_data.values())
   high_consumers = [(name, data) for name, data in device_data.items() if data['currentPower'] > total_power * 0.2]
   
@@ -479,56 +2442,55 @@ def r_suggestions():
           "💡 Strategic Upgrade Path: Energy monitoring analytics suggest smart grid integration opportunities for enhanced performance."
       ])
   
-  return jsonify({"suggestions": suggestions[:5]})  # Return top 5 strategic suggestions
+  return suggestions[:5]  # Return top 5 strategic suggestions
 
 @app.route("/api/devices")
+@cached_response()
 def r_devices():
   """Get device-specific data and analysis."""
-  device_data = generate_device_data()
-  print(f"DEBUG: r_devices data before JSON serialization:") # DEBUG
-  for device_name, details in device_data.items(): # DEBUG
-      print(f"  Device: {device_name}") # DEBUG
-      for key, value in details.items(): # DEBUG
-          print(f"    Key: {key}, Type: {type(value)}, Value: {value}") # DEBUG
+  device_data = _device_data(get_tenant(_request_tenant_id()))
   try:
-      json_output = json.dumps(device_data) # Use json.dumps directly for more control
-      print(f"DEBUG: r_devices successfully serialized data.") # DEBUG
+      with stage("serialize"):
+          json_output = json_dumps(device_data) # Keeps the devices in index order (jsonify sorts keys)
       return app.response_class(
           response=json_output,
           status=200,
           mimetype='application/json'
       )
-  except TypeError as e:
-      print(f"ERROR: JSON serialization failed in r_devices: {e}") # DEBUG
+  except TypeError as e:  # orjson.JSONEncodeError is a TypeError too
+      log_event(logging.ERROR, "devices.serialization_failed", error=str(e))
       return jsonify({"error": f"Serialization error: {e}", "status": "error"}), 500
 
 @app.route("/api/device/<device_name>")
+@cached_response()
 def r_device_details(device_name):
   """Get detailed analysis for a specific device."""
-  if df is None:
-      return jsonify({"error": "data_not_loaded"}), 400
+  body, status = _device_details(get_tenant(_request_tenant_id()), device_name)
+  return jsonify(body), status
+
+def _device_details(tenant: dict, device_name: str) -> tuple[dict, int]:
+  """The /api/device/<name> body and status code for a tenant snapshot."""
+  if tenant["df"] is None:
+      return {"error": "data_not_loaded"}, 400
   
-  device_df = df[df['device_name'] == device_name]
+  stats = tenant["device_index"].get(device_name)
   
-  if device_df.empty:
-      return jsonify({"error": f"No data found for device: {device_name}"}), 404
+  if stats is None:
+      return {"error": f"No data found for device: {device_name}"}, 404
   
   # Calculate device metrics
-  latest_reading = device_df.iloc[-1]
-  current_power = float(latest_reading['power'])
-  total_energy = float(device_df['electricity'].sum())
-  peak_usage = float(device_df['power'].max())
-  avg_power = float(device_df['power'].mean())
-  efficiency = calculate_device_efficiency(device_df, device_name)
-  print(f"DEBUG: Type of switch_status in DataFrame for {device_name} (details before assignment): {type(latest_reading['switch_status'])}") # NEW DEBUG
-  is_active = bool(latest_reading['switch_status']) # Should already be Python bool
+  current_power = stats['latest_power']
+  total_energy = stats['total_energy']
+  peak_usage = stats['peak_usage']
+  avg_power = stats['power_sum'] / stats['count']
+  efficiency = _device_efficiencies(tenant)[device_name]
+  is_active = stats['latest_switch']
   
   # Usage patterns
-  hourly_usage = {int(k): float(v) for k, v in device_df.groupby('hour')['power'].mean().to_dict().items()} # Ensure int keys, float values
-  daily_usage = device_df.groupby(device_df["timestamp"].dt.date)['electricity'].sum().to_dict()
+  hourly_usage = _hourly_means(stats)
   
   # Convert date keys to strings for JSON serialization
-  daily_usage_str = {str(k): float(v) for k, v in daily_usage.items()} # Ensure float values
+  daily_usage_str = {k.strftime("%Y-%m-%d"): float(v) for k, v in stats['daily_energy'].items()} # Ensure float values
   
   # Get data-driven suggestions for this specific device
   suggestions = generate_device_suggestions(device_name, current_power, efficiency, is_active)
@@ -536,14 +2498,12 @@ def r_device_details(device_name):
   # Device-specific prediction
   predicted_kwh = 0.0
   predicted_bill = None
-  model, daily_device_data = _train_regressor(device_df)
-  if model is not None and daily_device_data is not None:
-      last_day = daily_device_data["day_num"].max()
-      future = np.arange(last_day + 1, last_day + 31).reshape(-1, 1)
-      predicted_kwh = float(model.predict(future).sum())
+  device_forecast = _forecast_kwh(tenant, ("device", device_name))
+  if device_forecast is not None:
+      predicted_kwh = device_forecast
       predicted_bill = calculate_bill(predicted_kwh)
   
-  return jsonify({
+  return {
       "device_name": device_name,
       "current_power": current_power,
       "total_energy": total_energy,
@@ -554,16 +2514,236 @@ def r_device_details(device_name):
       "hourly_usage": hourly_usage,
       "daily_usage": daily_usage_str,
       "suggestions": suggestions,
-      "data_points": len(device_df),
+      "data_points": stats['count'],
       "predicted_kwh": round(predicted_kwh, 2),
       "predicted_bill": predicted_bill
+  }, 200
+
+def _query_datetime(name: str) -> datetime | None:
+  """An ISO date/time query parameter as naive UTC, the way readings are stored."""
+  value = request.args.get(name)
+  if value is None:
+      return None
+  parsed = datetime.fromisoformat(value)
+  if parsed.tzinfo is not None:
+      parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+  return parsed
+
+@app.route("/api/device/<device_name>/series")
+@cached_response()
+def r_device_series(device_name):
+  """
+  Power/energy history of one device: ?from=&to= (ISO dates, to exclusive), ?bucket=15m|1h|1d
+  to resample (mean power, summed energy) and ?max_points= to cap the points (LTTB, 0 = no cap).
+  """
+  try:
+      start, end = _query_datetime("from"), _query_datetime("to")
+  except ValueError as e:
+      return jsonify({"error": f"invalid date: {e}"}), 400
+  if start is not None and end is not None and start > end:
+      return jsonify({"error": "from must not be after to"}), 400
+  bucket = request.args.get("bucket")
+  if bucket is not None and bucket not in SERIES_BUCKETS:
+      return jsonify({"error": f"unknown bucket: {bucket}", "available": list(SERIES_BUCKETS)}), 400
+  max_points = request.args.get("max_points", SERIES_MAX_POINTS, type=int)
+  if max_points < 0 or 0 < max_points < 3:
+      return jsonify({"error": "max_points must be 0 (no cap) or at least 3"}), 400
+  
+  tenant = get_tenant(_request_tenant_id())
+  if tenant["df"] is None:
+      return jsonify({"error": "data_not_loaded"}), 400
+  if device_name not in tenant["device_index"]:
+      return jsonify({"error": f"No data found for device: {device_name}"}), 404
+  return jsonify(device_series(tenant, device_name, start, end, bucket, max_points))
+
+@app.route("/api/usage")
+@cached_response()
+def r_usage():
+  """
+  Energy and power statistics for ?from=&to= (ISO, to exclusive), optionally one ?device=,
+  from the rollups; ?by=hour|day|month breaks the range into buckets.
+  """
+  try:
+      start, end = _query_datetime("from"), _query_datetime("to")
+  except ValueError as e:
+      return jsonify({"error": f"invalid date: {e}"}), 400
+  if start is not None and end is not None and start > end:
+      return jsonify({"error": "from must not be after to"}), 400
+  by = request.args.get("by")
+  if by is not None and by not in ROLLUP_GRAINS:
+      return jsonify({"error": f"unknown grain: {by}", "available": list(ROLLUP_GRAINS)}), 400
+  
+  tenant = get_tenant(_request_tenant_id())
+  if tenant["df"] is None:
+      return jsonify({"error": "data_not_loaded"}), 400
+  device_name = request.args.get("device")
+  if device_name is not None and device_name not in tenant["device_index"]:
+      return jsonify({"error": f"No data found for device: {device_name}"}), 404
+  return jsonify(query_usage(tenant, start, end, device_name, by))
+
+@app.route("/api/anomalies")
+@cached_response()
+def r_anomalies():
+  """
+  Recent anomaly events detected at ingest, oldest first: ?device= and ?kind= filter them,
+  ?since=<id> returns only later events and ?limit= keeps the most recent ones.
+  """
+  kind = request.args.get("kind")
+  if kind is not None and kind not in ANOMALY_KINDS:
+      return jsonify({"error": f"unknown kind: {kind}", "available": list(ANOMALY_KINDS)}), 400
+  since = request.args.get("since", 0, type=int)
+  limit = request.args.get("limit", ANOMALY_FEED_SIZE, type=int)
+  
+  tenant = get_tenant(_request_tenant_id())
+  if tenant["df"] is None:
+      return jsonify({"error": "data_not_loaded"}), 400
+  device_name = request.args.get("device")
+  if device_name is not None and device_name not in tenant["device_index"]:
+      return jsonify({"error": f"No data found for device: {device_name}"}), 404
+  
+  state = tenant["anomalies"]
+  events = [event for event in state["events"] if event["id"] > since
+            and (device_name is None or event["device"] == device_name) and (kind is None or event["kind"] == kind)]
+  detectors = state["devices"] if device_name is None else {device_name: state["devices"][device_name]}
+  return jsonify({
+      "events": events[-limit:] if limit > 0 else [],
+      "last_id": state["next_id"] - 1,
+      "counts": state["counts"],
+      "devices": {
+          name: {
+              "power_mean": round(detector["power_mean"], 2),
+              "power_std": round(float(np.sqrt(detector["power_var"])), 2),
+              "standby_power": None if detector["standby_power"] is None else round(detector["standby_power"], 2),
+              "phantom_load": detector["phantom"],
+              "voltage": VOLTAGE_BAND_NAMES[detector["voltage_band"]],
+          }
+          for name, detector in detectors.items()
+      },
+  })
+
+# Parts /api/summary can return; all but "suggestions" (the bare list) are their endpoint's body
+SUMMARY_FIELDS = ("peak", "devices", "predict", "suggestions", "device", "weather")
+DEFAULT_SUMMARY_FIELDS = ("peak", "devices", "predict", "suggestions")
+
+@app.route("/api/summary")
+@cached_response(bypass=lambda: "weather" in request.args.get("fields", ""))  # weather is simulated per call
+def r_summary():
+  """
+  Everything one assistant turn needs, computed from a single snapshot in one round trip.
+
+  ?fields= picks parts (default peak,devices,predict,suggestions); "device" adds the
+  /api/device/<name> body for ?device=, and "weather" the /api/weather body for ?city=.
+  The parts share the snapshot's cached period totals, device analytics and forecasts,
+  so nothing is computed twice, and each is serialized exactly as its endpoint returns it.
+  A part that fails carries its endpoint's error body.
+  """
+  requested = request.args.get("fields")
+  fields = [field.strip() for field in requested.split(",") if field.strip()] if requested else list(DEFAULT_SUMMARY_FIELDS)
+  unknown = [field for field in fields if field not in SUMMARY_FIELDS]
+  if unknown:
+      return jsonify({"error": f"unknown fields: {', '.join(unknown)}", "available": list(SUMMARY_FIELDS)}), 400
+  if "device" in fields and not request.args.get("device"):
+      return jsonify({"error": "the device field needs ?device=<name>"}), 400
+  
+  tenant = get_tenant(_request_tenant_id())
+  parts = {
+      "peak": lambda: compute_peak_period(tenant),
+      "devices": lambda: _device_data(tenant),
+      "predict": lambda: _household_prediction(tenant)[0],
+      "suggestions": lambda: household_suggestions(tenant),
+      "device": lambda: _device_details(tenant, request.args["device"])[0],
+      "weather": lambda: simulate_weather(request.args.get("city", "Chennai")),
+  }
+  summary = {field: parts[field]() for field in fields}
+  summary["data_version"] = tenant["ingest_stats"]["data_version"]
+  # Each part is encoded like its route: /api/devices keeps index order, jsonify sorts keys
+  with stage("serialize"):
+      body = b",".join(
+          json_dumps(field) + b":" + json_dumps(value, sort_keys=field != "devices" and app.json.sort_keys)
+          for field, value in sorted(summary.items()))
+  return app.response_class(b"{" + body + b"}\n", mimetype="application/json")
+
+@app.route("/api/stats/memory")
+def r_stats_memory():
+  """Memory used by the in-memory readings table, per column."""
+  df = get_tenant(_request_tenant_id())["df"]
+  if df is None:
+      return jsonify({"error": "data_not_loaded"}), 400
+  
+  usage = df.memory_usage(index=True, deep=True)
+  total = int(usage.sum())
+  return jsonify({
+      "rows": len(df),
+      "total_bytes": total,
+      "total_mb": round(total / (1024 * 1024), 2),
+      "bytes_per_row": round(total / len(df), 1) if len(df) else 0.0,
+      "columns": {
+          column: {"dtype": str(df[column].dtype), "bytes": int(usage[column])}
+          for column in df.columns
+      },
+      "index_bytes": int(usage["Index"])
+  })
+
+@app.route("/api/storage")
+def r_storage():
+  """Describe the Parquet store backing the in-memory data."""
+  if not _storage_enabled():
+      return jsonify({"enabled": False})
+  
+  tenant_id = _request_tenant_id()
+  files = _storage_dataset(tenant_id).files if _has_stored_readings(tenant_id) else []
+  return jsonify({
+      "enabled": True,
+      "path": _readings_path(tenant_id),
+      "partition_by_device": STORAGE_PARTITION_BY_DEVICE,
+      "files": len(files),
+      "bytes": sum(os.path.getsize(path) for path in files),
+      "partitions": len({os.path.dirname(path) for path in files})
   })
 
+@app.route("/api/readings")
+def r_readings():
+  """Raw readings for ?device=&from=&to= (ISO dates), read from storage when persistence is on."""
+  device_name = request.args.get("device")
+  try:
+      start, end = _query_datetime("from"), _query_datetime("to")
+  except ValueError as e:
+      return jsonify({"error": f"invalid date: {e}"}), 400
+  try:
+      limit = int(request.args.get("limit", 1000))
+  except ValueError:
+      return jsonify({"error": "limit must be an integer"}), 400
+  
+  tenant_id = _request_tenant_id()
+  df = get_tenant(tenant_id, load=False)["df"]
+  if _has_stored_readings(tenant_id):
+      source, frame = "storage", scan_readings(device_name, start, end, tenant_id)
+  elif df is not None:
+      source, frame = "memory", df
+      if device_name is not None:
+          frame = frame[frame["device_name"] == device_name]
+      if start is not None:
+          frame = frame[frame["timestamp"] >= start]
+      if end is not None:
+          frame = frame[frame["timestamp"] < end]
+  else:
+      return jsonify({"error": "data_not_loaded"}), 400
+  
+  rows = frame[STORED_COLUMNS].head(max(limit, 0)).copy()
+  rows["device_name"] = rows["device_name"].astype(str)
+  rows["timestamp"] = rows["timestamp"].dt.strftime(TIMESTAMP_FORMAT)
+  for column in FLOAT32_COLUMNS:
+      rows[column] = _measurement(rows, column)
+  return jsonify({"source": source, "total": len(frame), "readings": rows.to_dict(orient="records")})
+
 @app.route("/api/weather")
 def r_weather():
     """Simulate fetching current weather data for a given city."""
     city = request.args.get("city", "Chennai") # Default to Chennai if no city is provided
-    
+    return jsonify(simulate_weather(city))
+
+def simulate_weather(city: str) -> dict:
+    """Simulated current weather for a city."""
     # Simulate weather conditions
     temperatures = {
         "Chennai": random.uniform(28, 35),
@@ -579,36 +2759,277 @@ def r_weather():
     condition = random.choice(conditions)
     humidity = random.randint(60, 95)
     
-    return jsonify({
+    return {
         "city": city,
         "temperature_celsius": temp,
         "condition": condition,
         "humidity_percent": humidity,
         "message": f"Simulated weather for {city}"
-    })
+    }
 
 @app.route("/api/health")
 def health_check():
+  """Cheap liveness/readiness probe from ingest counters; ?deep=1 also exercises the analytics."""
   try:
-      total_records = len(df) if df is not None else 0
-      devices_detected = len(generate_device_data()) if df is not None else 0
-      return jsonify({
+      # Peek rather than get_tenant: probes should neither load tenants nor skew the LRU order
+      tenant_id = _request_tenant_id()
+      tenant = tenants.get(tenant_id) or _new_tenant(tenant_id)
+      ingest_stats = tenant["ingest_stats"]
+      response = {
           "status": "healthy",
-          "data_loaded": df is not None,
-          "total_records": total_records,
-          "devices_detected": devices_detected
-      })
+          "tenant": tenant_id,
+          "data_loaded": tenant["df"] is not None,
+          "total_records": ingest_stats["rows"],
+          "devices_detected": ingest_stats["devices"],
+          "data_version": ingest_stats["data_version"],
+          "memory_mb": round(ingest_stats["memory_bytes"] / (1024 * 1024), 2),
+          "last_ingest_time": ingest_stats["last_ingest_time"],
+          "last_ingest_mode": ingest_stats["last_ingest_mode"]
+      }
+      if request.args.get("deep", "").lower() in ("1", "true", "yes"):
+          response["checks"] = _deep_health_checks(tenant)
+          if any(check["status"] != "ok" for check in response["checks"].values()):
+              response["status"] = "unhealthy"
+              return jsonify(response), 500
+      return jsonify(response)
   except Exception as e:
-      app.logger.error(f"Error in health_check: {e}")
+      log_event(logging.ERROR, "health.failed", error=str(e))
       return jsonify({
           "status": "unhealthy",
           "data_loaded": False,
           "error": str(e)
       }), 500
 
+def _deep_health_checks(tenant: dict) -> dict[str, dict]:
+  """Run each analytics stage once against a tenant's loaded data and time it."""
+  if tenant["df"] is None:
+      return {}
+  
+  stages = {
+      "device_analytics": lambda: generate_device_data(tenant),
+      "peak_period": lambda: compute_peak_period(tenant),
+      "forecast": lambda: _trend_forecast(_trend_state(_household_daily(tenant))),
+  }
+  checks = {}
+  for name, stage in stages.items():
+      started = time.perf_counter()
+      try:
+          stage()
+          checks[name] = {"status": "ok"}
+      except Exception as e:
+          checks[name] = {"status": "error", "error": str(e)}
+      checks[name]["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+  return checks
+
+@app.route("/api/tenants")
+def r_tenants():
+  """Resident tenants in LRU order (least recent first) with the registry's cache counters."""
+  lookups = registry_stats["hits"] + registry_stats["misses"]
+  return jsonify({
+      "resident": len(tenants),
+      "memory_mb": round(_registry_memory_bytes() / (1024 * 1024), 2),
+      "budget_mb": TENANT_MEMORY_BUDGET_MB,
+      **registry_stats,
+      "hit_rate": round(registry_stats["hits"] / lookups, 4) if lookups else None,
+      "tenants": [
+          {
+              "tenant": tenant_id,
+              "rows": tenant["ingest_stats"]["rows"],
+              "devices": tenant["ingest_stats"]["devices"],
+              "memory_mb": round(tenant["ingest_stats"]["memory_bytes"] / (1024 * 1024), 2),
+              "rollup_mb": round(tenant["ingest_stats"]["rollup_bytes"] / (1024 * 1024), 2),
+              "last_ingest_time": tenant["ingest_stats"]["last_ingest_time"]
+          }
+          for tenant_id, tenant in list(tenants.items())
+      ]
+  })
+
+@app.route("/api/cache")
+def r_cache():
+  """Response cache size and hit rate; ?clear=1 empties it first."""
+  if request.args.get("clear", "").lower() in ("1", "true", "yes"):
+      with _response_cache_lock:
+          response_cache.clear()
+          response_cache_stats["bytes"] = 0
+  lookups = response_cache_stats["hits"] + response_cache_stats["misses"]
+  return jsonify({
+      "entries": len(response_cache),
+      "memory_mb": round(response_cache_stats["bytes"] / (1024 * 1024), 3),
+      "budget_mb": RESPONSE_CACHE_MB,
+      **response_cache_stats,
+      "hit_rate": round(response_cache_stats["hits"] / lookups, 4) if lookups else None,
+  })
+
+def _prometheus_labels(**labels) -> str:
+  """Label pairs for a sample line, with backslashes, quotes and newlines escaped."""
+  escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+  return ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+
+def _prometheus_histogram(lines: list[str], name: str, help_text: str, series: list[tuple[dict, dict]]):
+  lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+  for labels, histogram in series:
+      cumulative = 0
+      for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram["counts"]):
+          cumulative += count
+          lines.append(f"{name}_bucket{{{_prometheus_labels(**labels, le=bound)}}} {cumulative}")
+      lines.append(f"{name}_sum{{{_prometheus_labels(**labels)}}} {histogram['sum']:.6f}")
+      lines.append(f"{name}_count{{{_prometheus_labels(**labels)}}} {cumulative}")
+
+@app.route("/api/metrics")
+def r_metrics():
+  """Request latency and stage duration histograms plus cache and registry counters, in Prometheus text format."""
+  with _metrics_lock:
+      requests_by_route = [({"method": method, "route": route}, {"counts": list(h["counts"]), "sum": h["sum"]})
+                           for (method, route), h in sorted(request_histograms.items())]
+      stages = [({"stage": name}, {"counts": list(h["counts"]), "sum": h["sum"]})
+                for name, h in sorted(stage_histograms.items())]
+      counts = sorted(request_counts.items())
+  
+  lines = ["# HELP energy_http_requests_total Requests served, by route and status.",
+           "# TYPE energy_http_requests_total counter"]
+  lines += [f"energy_http_requests_total{{{_prometheus_labels(method=method, route=route, status=status)}}} {count}"
+            for (method, route, status), count in counts]
+  _prometheus_histogram(lines, "energy_http_request_duration_seconds", "Request latency, by route.", requests_by_route)
+  _prometheus_histogram(lines, "energy_stage_duration_seconds", "Time spent in named stages of request work.", stages)
+  
+  counters = {
+      "energy_response_cache_hits_total": ("Responses served from the response cache.", response_cache_stats["hits"]),
+      "energy_response_cache_misses_total": ("Cacheable responses that had to be computed.", response_cache_stats["misses"]),
+      "energy_tenant_registry_hits_total": ("Tenant lookups served from memory.", registry_stats["hits"]),
+      "energy_tenant_registry_misses_total": ("Tenant lookups for tenants not in memory.", registry_stats["misses"]),
+      "energy_tenant_evictions_total": ("Tenants evicted to stay within the memory budget.", registry_stats["evictions"]),
+  }
+  gauges = {
+      "energy_tenants_resident": ("Tenants held in memory.", len(tenants)),
+      "energy_tenant_memory_bytes": ("Memory held by resident tenants' readings and rollups.", _registry_memory_bytes()),
+      "energy_response_cache_bytes": ("Size of the cached response bodies.", response_cache_stats["bytes"]),
+  }
+  for kind, metrics in (("counter", counters), ("gauge", gauges)):
+      for name, (help_text, value) in metrics.items():
+          lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+  response = app.response_class("\n".join(lines) + "\n", mimetype="text/plain")
+  response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+  return response
+
+# ---------------------------------------------------------------------------
+# ASYNC SERVING (ASGI)
+# ---------------------------------------------------------------------------
+# Routes run on executor threads: reads and ingests get separate pools, so slow uploads
+# can never occupy the threads that serve reads, and the event loop only moves bytes.
+ASGI_READ_WORKERS = int(os.environ.get("ENERGY_ASGI_READ_WORKERS", "16"))
+ASGI_INGEST_WORKERS = int(os.environ.get("ENERGY_ASGI_INGEST_WORKERS", "2"))
+# Routes that parse, merge and re-index uploaded data
+INGEST_ROUTE_PREFIX = "/api/upload"
+
+_asgi_executors: dict[str, ThreadPoolExecutor] = {}
+
+def _asgi_executor(kind: str) -> ThreadPoolExecutor:
+  if kind not in _asgi_executors:
+      workers = ASGI_INGEST_WORKERS if kind == "ingest" else ASGI_READ_WORKERS
+      _asgi_executors[kind] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"asgi-{kind}")
+  return _asgi_executors[kind]
+
+class _ReceiveStream(io.RawIOBase):
+  """wsgi.input for an ASGI request: pulls body chunks from the event loop as the route reads them."""
+
+  def __init__(self, receive, loop):
+      self._receive = receive
+      self._loop = loop
+      self._pending = memoryview(b"")
+      self._more_body = True
+
+  def readable(self):
+      return True
+
+  def readinto(self, buffer):
+      while not self._pending and self._more_body:
+          message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+          if message["type"] == "http.disconnect":
+              self._more_body = False
+              break
+          self._pending = memoryview(message.get("body", b""))
+          self._more_body = message.get("more_body", False)
+      size = min(len(buffer), len(self._pending))
+      buffer[:size] = self._pending[:size]
+      self._pending = self._pending[size:]
+      return size
+
+def _wsgi_environ(scope: dict, body) -> dict:
+  """Translate an ASGI HTTP scope into the WSGI environ Flask expects."""
+  server_name, server_port = scope.get("server") or ("localhost", 80)
+  environ = {
+      "REQUEST_METHOD": scope["method"],
+      "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+      "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+      "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+      "SERVER_NAME": server_name,
+      "SERVER_PORT": str(server_port),
+      "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+      "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+      "wsgi.version": (1, 0),
+      "wsgi.url_scheme": scope.get("scheme", "http"),
+      "wsgi.input": body,
+      # The stream ends with the request body, so chunked uploads can be read without a length
+      "wsgi.input_terminated": True,
+      "wsgi.errors": sys.stderr,
+      "wsgi.multithread": True,
+      "wsgi.multiprocess": False,
+      "wsgi.run_once": False,
+  }
+  for name, value in scope.get("headers", []):
+      key = name.decode("latin-1").upper().replace("-", "_")
+      if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+          key = f"HTTP_{key}"
+      value = value.decode("latin-1")
+      environ[key] = f"{environ[key]},{value}" if key in environ else value
+  return environ
+
+def _run_wsgi(environ: dict) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+  """Run the Flask app for one request on the calling (executor) thread."""
+  started = {}
+  def start_response(status, headers, exc_info=None):
+      started["status"], started["headers"] = int(status.split(" ", 1)[0]), headers
+  
+  result = app(environ, start_response)
+  try:
+      body = b"".join(result)
+  finally:
+      if hasattr(result, "close"):
+          result.close()
+  headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in started["headers"]]
+  return started["status"], headers, body
+
+async def asgi_app(scope, receive, send):
+  """ASGI entry point, e.g. `uvicorn backend_app:asgi_app`, serving the Flask routes from executors."""
+  if scope["type"] == "lifespan":
+      while True:
+          message = await receive()
+          if message["type"] == "lifespan.startup":
+              await send({"type": "lifespan.startup.complete"})
+          elif message["type"] == "lifespan.shutdown":
+              for executor in _asgi_executors.values():
+                  executor.shutdown(wait=False)
+              _asgi_executors.clear()
+              await send({"type": "lifespan.shutdown.complete"})
+              return
+  if scope["type"] != "http":
+      return
+  
+  loop = asyncio.get_running_loop()
+  environ = _wsgi_environ(scope, io.BufferedReader(_ReceiveStream(receive, loop)))
+  kind = "ingest" if scope["path"].startswith(INGEST_ROUTE_PREFIX) else "read"
+  status, headers, body = await loop.run_in_executor(_asgi_executor(kind), _run_wsgi, environ)
+  await send({"type": "http.response.start", "status": status, "headers": headers})
+  await send({"type": "http.response.body", "body": body})
+
 if __name__ == "__main__":
   print("🚀 Smart Energy Tracker Backend Starting...")
   print("📊 Dashboard available at: http://localhost:5000")
   print("🔗 API endpoints available at: http://localhost:5000/api/")
   print("🤖 Device monitoring and AI suggestions enabled")
-  app.run(debug=True, port=5000, host='0.0.0.0')
+  if "--asgi" in sys.argv:
+      import uvicorn  # optional dependency, only needed for the async serving mode
+      print("⚡ Async serving mode (ASGI via uvicorn)")
+      uvicorn.run(asgi_app, host='0.0.0.0', port=5000)
+  else:
+      app.run(debug=True, port=5000, host='0.0.0.0')
@@ -0,0 +1,123 @@
+"""Benchmark the ingest-time anomaly detector and check it against a reading-by-reading loop.
+
+Injects power spikes, standby draw and voltage sags into synthetic hourly readings, then:
+  - runs _detect_anomalies over the whole history (what a full upload does) and over the same
+    readings appended in chunks, which must produce the same detector state and events;
+  - replays the readings one at a time through the scalar EWMA updates the detector is
+    defined by, which must find the same events;
+  - reports the detector's memory, which stays flat as the history grows.
+
+Usage:
+    python scripts/bench_anomalies.py                       # 100 devices; 30 and 365 days
+    python scripts/bench_anomalies.py --devices 1000 --days 7 30 --chunks 24
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app, synthetic_frame  # noqa: E402
+
+
+def inject_anomalies(frame, seed: int = 11):
+    """Spike 0.1% of readings, leave some devices drawing standby power, sag the supply now and then."""
+    rng = np.random.default_rng(seed)
+    power = backend_app._measurement(frame, "power").to_numpy().copy()
+    voltage = backend_app._measurement(frame, "voltage").to_numpy().copy()
+    switch = frame["switch_status"].to_numpy()
+    spikes = switch & (rng.random(len(frame)) < 0.001)
+    power[spikes] *= 6
+    leaky = frame["device_name"].cat.codes.to_numpy() % 7 == 0
+    power[leaky & ~switch] = rng.uniform(4, 9, int((leaky & ~switch).sum())).round(2)
+    sags = rng.random(len(frame)) < 0.002
+    voltage[sags] = rng.uniform(190, 205, int(sags.sum())).round(2)
+    return frame.assign(power=power, voltage=voltage)
+
+
+def streaming_reference(frame) -> tuple[dict, dict]:
+    """The detector's definition, one reading at a time: per-kind counts and final device states."""
+    alpha = backend_app.ANOMALY_ALPHA
+    sag, surge = backend_app.VOLTAGE_BANDS["voltage_sag"], backend_app.VOLTAGE_BANDS["voltage_surge"]
+    power = backend_app._measurement(frame, "power").tolist()
+    voltage = backend_app._measurement(frame, "voltage").tolist()
+    counts = dict.fromkeys(backend_app.ANOMALY_KINDS, 0)
+    devices = {}
+    for name, volts, watts, on in zip(frame["device_name"].tolist(), voltage, power,
+                                      frame["switch_status"].tolist()):
+        state = devices.setdefault(name, backend_app._new_detector())
+        if on:
+            mean = state["power_mean"] if state["on_count"] else watts
+            deviation = watts - mean
+            spread = np.sqrt(state["power_var"])
+            if (state["on_count"] >= backend_app.ANOMALY_WARMUP_READINGS and abs(deviation) >
+                    max(backend_app.ANOMALY_Z_THRESHOLD * spread, backend_app.ANOMALY_MIN_DEVIATION_W)):
+                counts["power_spike" if deviation > 0 else "power_drop"] += 1
+            state["power_mean"] = alpha * watts + (1 - alpha) * mean
+            state["power_var"] = alpha * ((1 - alpha) * deviation * deviation) + (1 - alpha) * state["power_var"]
+            state["on_count"] += 1
+        else:
+            baseline = state["standby_power"] if state["standby_power"] is not None else watts
+            state["standby_power"] = alpha * watts + (1 - alpha) * baseline
+            phantom = state["standby_power"] > backend_app.STANDBY_THRESHOLD_W
+            if phantom and not state["phantom"]:
+                counts["phantom_load"] += 1
+            state["phantom"] = phantom
+        if volts > 0:
+            band = -1 if volts < sag else 1 if volts > surge else 0
+            if band and band != state["voltage_band"]:
+                counts["voltage_sag" if band < 0 else "voltage_surge"] += 1
+            state["voltage_band"] = band
+    return counts, devices
+
+
+def _same_devices(expected: dict, actual: dict) -> bool:
+    return expected.keys() == actual.keys() and all(
+        np.isclose(expected[name][key], actual[name][key], rtol=1e-9)
+        for name in expected for key in ("on_count", "power_mean", "power_var", "standby_power")
+        if expected[name][key] is not None) and all(
+        expected[name][key] == actual[name][key] for name in expected for key in ("phantom", "voltage_band"))
+
+
+def run(num_devices: int, day_counts: list[int], chunks: int):
+    print(f"{'days':>5} {'rows':>10} {'events':>8} {'detect (ms)':>12} {'rows/s':>12} "
+          f"{'reference (s)':>14} {'state KB':>9} {'B/device':>9}")
+    for num_days in day_counts:
+        frame = inject_anomalies(synthetic_frame(num_devices, num_days))
+        started = time.perf_counter()
+        whole = backend_app._detect_anomalies(None, frame)
+        detect_s = time.perf_counter() - started
+
+        # The same readings arriving as a series of appends
+        state = None
+        for part in np.array_split(np.arange(len(frame)), chunks):
+            state = backend_app._detect_anomalies(state, frame.iloc[part[0]:part[-1] + 1])
+        if state["devices"] != whole["devices"] or list(state["events"]) != list(whole["events"]):
+            print(f"{num_days} days: appending in {chunks} chunks changed the detector's result")
+            sys.exit(1)
+
+        started = time.perf_counter()
+        counts, devices = streaming_reference(frame)
+        reference_s = time.perf_counter() - started
+        if counts != whole["counts"] or not _same_devices(devices, whole["devices"]):
+            print(f"{num_days} days: reference counts {counts}, detector {whole['counts']}")
+            sys.exit(1)
+
+        state_bytes = len(pickle.dumps(whole["devices"]))
+        print(f"{num_days:>5} {len(frame):>10,} {sum(whole['counts'].values()):>8,} {detect_s * 1000:>12.1f} "
+              f"{len(frame) / detect_s:>12,.0f} {reference_s:>14.2f} {state_bytes / 1024:>9.1f} "
+              f"{state_bytes / num_devices:>9.0f}")
+    print(f"Appends in {chunks} chunks and the reading-by-reading reference agree with a single pass; "
+          f"the feed keeps at most {backend_app.ANOMALY_FEED_SIZE} events.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365])
+    parser.add_argument("--chunks", type=int, default=10)
+    args = parser.parse_args()
+    run(args.devices, args.days, args.chunks)
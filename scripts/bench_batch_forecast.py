@@ -0,0 +1,46 @@
+"""Benchmark /api/predict/devices against one /api/device/<name> call per device.
+
+Usage:
+    python scripts/bench_batch_forecast.py                  # 10, 100 and 1000 devices
+    python scripts/bench_batch_forecast.py --devices 10 100 --days 30
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app, synthetic_frame  # noqa: E402
+
+
+def run(device_counts: list[int], num_days: int):
+    client = backend_app.app.test_client()
+    print(f"{'devices':>8} {'rows':>10} {'sequential (ms)':>16} {'batch (ms)':>11} {'speedup':>9}")
+    for num_devices in device_counts:
+        frame = synthetic_frame(num_devices, num_days)
+        names = list(frame["device_name"].unique())
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Fresh ingest for each side so neither starts with warm forecast caches
+            backend_app._set_data(backend_app.DEFAULT_TENANT, frame, "benchmark")
+            start = time.perf_counter()
+            sequential = {name: client.get(f"/api/device/{name}").get_json()["predicted_kwh"] for name in names}
+            sequential_ms = (time.perf_counter() - start) * 1000
+
+            backend_app._set_data(backend_app.DEFAULT_TENANT, frame, "benchmark")
+            start = time.perf_counter()
+            batch = client.get("/api/predict/devices").get_json()["forecasts"]
+            batch_ms = (time.perf_counter() - start) * 1000
+
+        assert all(batch[name]["predicted_kwh"] == sequential[name] for name in names)
+        print(f"{num_devices:>8} {len(frame):>10,} {sequential_ms:>16.1f} {batch_ms:>11.1f} "
+              f"{sequential_ms / batch_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+    run(args.devices, args.days)
@@ -0,0 +1,45 @@
+"""Microbenchmark the array tariff engine against calling calculate_bill in a loop.
+
+Usage:
+    python scripts/bench_bill.py                       # 0-2000 units in steps of 0.01
+    python scripts/bench_bill.py --step 0.1 --max-units 5000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+with contextlib.redirect_stdout(io.StringIO()):
+    import backend_app  # noqa: E402
+
+
+def run(max_units: float, step: float):
+    units = np.arange(0, max_units, step)
+
+    start = time.perf_counter()
+    scalar_totals = [backend_app.calculate_bill(float(value))["total_amount"] for value in units]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bills = backend_app.calculate_bills(units)
+    array_s = time.perf_counter() - start
+    array_totals = [round(total, 2) for total in bills["total"].tolist()]
+
+    assert array_totals == scalar_totals
+    print(f"{len(units):,} bills from 0 to {max_units:g} units")
+    print(f"  calculate_bill loop : {scalar_s * 1000:10.1f} ms ({scalar_s / len(units) * 1e6:.2f} us/bill)")
+    print(f"  calculate_bills     : {array_s * 1000:10.1f} ms ({array_s / len(units) * 1e6:.3f} us/bill)")
+    print(f"  speedup             : {scalar_s / array_s:10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-units", type=float, default=2000)
+    parser.add_argument("--step", type=float, default=0.01)
+    args = parser.parse_args()
+    run(args.max_units, args.step)
@@ -0,0 +1,110 @@
+"""Benchmark per-request latency of the device endpoints with and without the device index.
+
+Usage:
+    python scripts/bench_device_index.py                     # 100, 250 and 500 devices
+    python scripts/bench_device_index.py --devices 100 1000 --days 30
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import backend_app  # noqa: E402
+
+CATEGORIES = ["AC", "Fridge", "Television", "Light", "Fan", "Washing Machine"]
+
+
+def synthetic_frame(num_devices: int, num_days: int, seed: int = 7) -> pd.DataFrame:
+    """Hourly readings for num_devices devices, in the same schema load_data_from_json produces."""
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range("2024-07-01", periods=num_days * 24, freq="h")
+    names = [f"{CATEGORIES[i % len(CATEGORIES)]} {i // len(CATEGORIES) + 1}" for i in range(num_devices)]
+    switch = rng.random(len(hours) * num_devices) < 0.6
+    power = np.where(switch, rng.uniform(20, 2000, switch.size), 0.0).round(2)
+    voltage = rng.uniform(220, 245, switch.size).round(2)
+    frame = pd.DataFrame({
+        "timestamp": np.repeat(hours.values, num_devices),
+        "device_name": np.tile(np.array(names, dtype=object), len(hours)),
+        "power": power,
+        "voltage": voltage,
+        "current": (power / voltage).round(2),
+        "electricity": (power / 1000).round(3),
+        "switch_status": switch,
+    })
+    return backend_app._add_derived_columns(frame)
+
+
+def legacy_generate_device_data(frame: pd.DataFrame) -> dict:
+    """The original implementation: one boolean scan and several aggregations per device."""
+    device_data = {}
+    for device_name in frame["device_name"].unique():
+        device_df = frame[frame["device_name"] == device_name]
+        latest = device_df.iloc[-1]
+        efficiency = backend_app.calculate_device_efficiency(device_df, device_name)
+        device_data[device_name] = {
+            "currentPower": float(latest["power"]),
+            "totalEnergy": float(device_df["electricity"].sum()),
+            "peakUsage": float(device_df["power"].max()),
+            "averagePower": float(device_df["power"].mean()),
+            "isActive": bool(latest["switch_status"]),
+            "efficiency": efficiency,
+            "suggestions": backend_app.generate_device_suggestions(
+                device_name, float(latest["power"]), efficiency, bool(latest["switch_status"])),
+            "hourlyUsage": device_df.groupby("hour")["power"].mean().to_dict(),
+            "dataPoints": len(device_df),
+        }
+    return device_data
+
+
+def legacy_device_details(frame: pd.DataFrame, device_name: str):
+    """The original scan-per-request work behind /api/device/<name>."""
+    device_df = frame[frame["device_name"] == device_name]
+    backend_app.calculate_device_efficiency(device_df, device_name)
+    device_df.groupby("hour")["power"].mean()
+    device_df.groupby(device_df["timestamp"].dt.date)["electricity"].sum()
+    backend_app._train_regressor(device_df.copy())
+
+
+def _median_ms(func, repeat: int) -> float:
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def run(device_counts: list[int], num_days: int, repeat: int):
+    client = backend_app.app.test_client()
+    print(f"{'devices':>8} {'rows':>10} {'endpoint':>22} {'scan (ms)':>11} {'index (ms)':>11}")
+    for num_devices in device_counts:
+        frame = synthetic_frame(num_devices, num_days)
+        build_ms = _median_ms(lambda: backend_app._set_data(backend_app.DEFAULT_TENANT, frame, "benchmark"), 1)
+        name = frame["device_name"].iloc[0]
+        cases = [
+            ("/api/devices", lambda: legacy_generate_device_data(frame), lambda: client.get("/api/devices")),
+            ("/api/suggestions", lambda: legacy_generate_device_data(frame), lambda: client.get("/api/suggestions")),
+            ("/api/health", lambda: legacy_generate_device_data(frame), lambda: client.get("/api/health")),
+            ("/api/device/<name>", lambda: legacy_device_details(frame, name),
+             lambda: client.get(f"/api/device/{name}")),
+        ]
+        for endpoint, before, after in cases:
+            print(f"{num_devices:>8} {len(frame):>10,} {endpoint:>22} "
+                  f"{_median_ms(before, repeat):>11.1f} {_median_ms(after, repeat):>11.1f}")
+        print(f"{'':>8} {'':>10} {'(index build at ingest)':>22} {'':>11} {build_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[100, 250, 500])
+    parser.add_argument("--days", type=int, default=21)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.devices, args.days, args.repeat)
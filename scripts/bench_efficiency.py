@@ -0,0 +1,61 @@
+"""Benchmark batch efficiency scoring against calling calculate_device_efficiency per device.
+
+Three ways to score every device of a frame:
+  per device   calculate_device_efficiency on each device's slice (the original call pattern)
+  batch        calculate_efficiencies: one grouped pass over the readings
+  from index   what the routes do: a vectorized pass over the snapshot's device index
+The batch results must equal the per-device ones exactly.
+
+Usage:
+    python scripts/bench_efficiency.py                      # 1k and 10k devices
+    python scripts/bench_efficiency.py --devices 500 5000 --days 14
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app, synthetic_frame  # noqa: E402
+
+
+def _timed(fn) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def run(device_counts: list[int], num_days: int):
+    print(f"{'devices':>8} {'rows':>11} {'per device (s)':>15} {'batch (s)':>10} {'from index (ms)':>16} {'speedup':>8}")
+    for num_devices in device_counts:
+        frame = synthetic_frame(num_devices, num_days)
+        with contextlib.redirect_stdout(io.StringIO()):
+            tenant = backend_app._set_data(backend_app.DEFAULT_TENANT, frame, "benchmark")
+
+        per_device_s, expected = _timed(lambda: {
+            name: backend_app.calculate_device_efficiency(device_df, name)
+            for name, device_df in frame.groupby("device_name", sort=False, observed=True)})
+        batch_s, batch = _timed(lambda: backend_app.calculate_efficiencies(frame))
+
+        def from_index():
+            tenant["derived_cache"].pop("efficiency", None)
+            return backend_app._device_efficiencies(tenant)
+        index_s, indexed = _timed(from_index)
+
+        for name, score in expected.items():
+            if batch[name] != score or indexed[name] != score:
+                print(f"{name}: per device {score!r}, batch {batch[name]!r}, from index {indexed[name]!r}")
+                sys.exit(1)
+        print(f"{num_devices:>8,} {len(frame):>11,} {per_device_s:>15.2f} {batch_s:>10.2f} "
+              f"{index_s * 1000:>16.2f} {per_device_s / batch_s:>7.1f}x")
+    print("Batch and index scores equal the per-device results exactly.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+    run(args.devices, args.days)
@@ -0,0 +1,100 @@
+"""Benchmark the columnar upload ingest against the original per-record loop.
+
+Usage:
+    python scripts/bench_ingest.py                 # 1M, 5M and 10M rows
+    python scripts/bench_ingest.py --sizes 100000 1000000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import backend_app  # noqa: E402
+
+DEVICES = ["AC", "Fridge", "Television", "Light", "Fan", "Washing Machine"]
+
+
+def legacy_load(json_data: list[dict]) -> pd.DataFrame:
+    """The original row-by-row implementation of load_data_from_json."""
+    rows = []
+    for item in json_data:
+        if "result" in item and item.get("success", False):
+            res = item["result"]
+            ts_iso = res.get("update_time")
+            try:
+                ts = datetime.strptime(ts_iso, "%Y-%m-%dT%H:%M:%SZ") if ts_iso else datetime.now()
+            except (ValueError, TypeError):
+                ts = datetime.now()
+            rows.append({
+                "timestamp": ts,
+                "device_name": res.get("device_name", "Unknown"),
+                "power": float(res.get("power", 0.0)),
+                "voltage": float(res.get("voltage", 0.0)),
+                "current": float(res.get("current", 0.0)),
+                "electricity": float(res.get("electricity", 0.0)),
+                "switch_status": bool(res.get("switch", False)),
+            })
+    frame = pd.DataFrame(rows)
+    frame["hour"] = frame["timestamp"].dt.hour
+    frame["date"] = frame["timestamp"].dt.date
+    return frame
+
+
+def synthetic_records(num_rows: int, pool_size: int = 50_000) -> list[dict]:
+    """
+    Build num_rows upload records.
+
+    A pool of distinct records is generated once and referenced cyclically so the
+    payload for 10M rows fits in memory; parsing cost per record is unchanged.
+    """
+    start = datetime(2024, 7, 1)
+    pool = []
+    for i in range(min(pool_size, num_rows)):
+        ts = start + timedelta(hours=i // len(DEVICES))
+        power = float((i * 37) % 2000)
+        pool.append({
+            "success": True,
+            "result": {
+                "device_name": DEVICES[i % len(DEVICES)],
+                "power": power,
+                "voltage": 220.0 + (i % 25),
+                "current": round(power / 230.0, 2),
+                "electricity": round(power / 1000.0, 3),
+                "switch": power > 0,
+                "update_time": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            },
+            "t": int(ts.timestamp() * 1000),
+        })
+    return [pool[i % len(pool)] for i in range(num_rows)]
+
+
+def _time(func, records) -> tuple[float, pd.DataFrame]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        frame = func(records)
+        elapsed = time.perf_counter() - start
+    return elapsed, frame
+
+
+def run(sizes: list[int]):
+    print(f"{'rows':>12} {'legacy (s)':>12} {'columnar (s)':>14} {'speedup':>9}")
+    for size in sizes:
+        records = synthetic_records(size)
+        legacy_s, legacy_frame = _time(legacy_load, records)
+        del legacy_frame
+        columnar_s, frame = _time(backend_app.load_data_from_json, records)
+        assert len(frame) == size
+        print(f"{size:>12,} {legacy_s:>12.2f} {columnar_s:>14.2f} {legacy_s / columnar_s:>8.1f}x")
+        del records, frame
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 5_000_000, 10_000_000])
+    run(parser.parse_args().sizes)
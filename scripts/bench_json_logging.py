@@ -0,0 +1,88 @@
+"""Benchmark the per-request cost of debug printing and JSON encoding on the device endpoints.
+
+"Before" is what /api/devices used to do on every request: print every key, type and value
+of every device to stdout, then encode with the stdlib json module. "After" is a disabled
+log_event call plus json_dumps (orjson when installed). End-to-end request times are taken
+through the Flask test client with the response cache cleared, so every request re-encodes.
+
+Usage:
+    python scripts/bench_json_logging.py                     # 10, 100 and 1000 devices
+    python scripts/bench_json_logging.py --devices 50 500 --days 14 --repeat 200
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app, synthetic_frame  # noqa: E402
+
+
+def legacy_debug_dump(device_data: dict):
+    """The per-request stdout dump r_devices used to do before serializing."""
+    print(f"DEBUG: r_devices data before JSON serialization:")
+    for device_name, details in device_data.items():
+        print(f"  Device: {device_name}")
+        for key, value in details.items():
+            print(f"    Key: {key}, Type: {type(value)}, Value: {value}")
+    print(f"DEBUG: r_devices successfully serialized data.")
+
+
+def _per_call_ms(fn, repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def _request_ms(client, path: str, repeat: int) -> float:
+    def call():
+        backend_app.response_cache.clear()
+        client.get(path)
+    return _per_call_ms(call, repeat)
+
+
+def run(device_counts: list[int], num_days: int, repeat: int):
+    client = backend_app.app.test_client()
+    fast_json = backend_app.FAST_JSON
+    # The old prints went wherever stdout pointed; a file is the cheapest realistic target
+    with tempfile.TemporaryFile("w") as sink:
+        disabled_ns = _per_call_ms(lambda: backend_app.log_event(logging.DEBUG, "devices.served", devices=0),
+                                   100_000) * 1e6
+        print(f"Disabled log_event call: {disabled_ns:.0f} ns. orjson {'installed' if fast_json else 'not installed'}.")
+        print(f"{'devices':>8} {'payload KB':>11} {'debug dump':>11} {'json.dumps':>11} {'json_dumps':>11} "
+              f"{'before req':>11} {'after req':>10} {'speedup':>8}   (ms per request)")
+        for num_devices in device_counts:
+            frame = synthetic_frame(num_devices, num_days)
+            with contextlib.redirect_stdout(io.StringIO()):
+                tenant = backend_app._set_data(backend_app.DEFAULT_TENANT, frame, "benchmark")
+            device_data = backend_app._device_data(tenant)
+            payload_kb = len(json.dumps(device_data)) / 1024
+
+            with contextlib.redirect_stdout(sink):
+                dump_ms = _per_call_ms(lambda: legacy_debug_dump(device_data), repeat)
+            stdlib_ms = _per_call_ms(lambda: json.dumps(device_data), repeat)
+            fast_ms = _per_call_ms(lambda: backend_app.json_dumps(device_data), repeat)
+
+            backend_app.FAST_JSON = False
+            stdlib_request_ms = _request_ms(client, "/api/devices", repeat)
+            backend_app.FAST_JSON = fast_json
+            fast_request_ms = _request_ms(client, "/api/devices", repeat)
+            before_ms = stdlib_request_ms + dump_ms
+            print(f"{num_devices:>8} {payload_kb:>11.1f} {dump_ms:>11.3f} {stdlib_ms:>11.3f} {fast_ms:>11.3f} "
+                  f"{before_ms:>11.3f} {fast_request_ms:>10.3f} {before_ms / fast_request_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    run(args.devices, args.days, args.repeat)
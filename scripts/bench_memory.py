@@ -0,0 +1,102 @@
+"""Compare memory of the original object-based readings table with the compact typed layout.
+
+Also checks that the analytics computed on the compact layout match the original
+per-device computations on the original layout, and exits non-zero if they do not.
+
+Usage:
+    python scripts/bench_memory.py                        # the 21-day sample file
+    python scripts/bench_memory.py --rows 1000000         # synthetic records
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+from bench_device_index import backend_app, legacy_generate_device_data  # noqa: E402
+from bench_ingest import legacy_load, synthetic_records  # noqa: E402
+from bench_peak import legacy_peak  # noqa: E402
+
+SAMPLE_FILE = os.path.join(SCRIPTS_DIR, "..", "sample-energy-data-21-days.json")
+
+
+def _same(expected, actual, path: str, mismatches: list):
+    if isinstance(expected, dict):
+        if set(map(str, expected)) != set(map(str, actual)):
+            mismatches.append(f"{path}: keys differ")
+            return
+        actual_by_key = {str(key): value for key, value in actual.items()}
+        for key, value in expected.items():
+            _same(value, actual_by_key[str(key)], f"{path}.{key}", mismatches)
+    elif isinstance(expected, float):
+        if not math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9):
+            mismatches.append(f"{path}: {expected!r} != {actual!r}")
+    elif expected != actual:
+        mismatches.append(f"{path}: {expected!r} != {actual!r}")
+
+
+def check_analytics(legacy_frame) -> list[str]:
+    """Compare the served analytics with the original implementations run on the original layout."""
+    client = backend_app.app.test_client()
+    mismatches = []
+
+    expected_devices = legacy_generate_device_data(legacy_frame)
+    actual_devices = client.get("/api/devices").get_json()
+    for device in expected_devices.values():
+        device.pop("suggestions")
+    for device in actual_devices.values():
+        device.pop("suggestions")
+    _same(expected_devices, actual_devices, "devices", mismatches)
+
+    _same(legacy_peak(legacy_frame), client.get("/api/peak").get_json(), "peak", mismatches)
+
+    model, daily = backend_app._train_regressor(legacy_frame)
+    if model is not None:
+        future = np.arange(len(daily), len(daily) + backend_app.FORECAST_DAYS).reshape(-1, 1)
+        expected_kwh = round(float(model.predict(future).sum()), 2)
+        _same(expected_kwh, client.get("/api/predict").get_json()["predicted_kwh"], "predicted_kwh", mismatches)
+    return mismatches
+
+
+def run(rows: int | None):
+    if rows:
+        records = synthetic_records(rows)
+    else:
+        with open(SAMPLE_FILE) as f:
+            records = json.load(f)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy_frame = legacy_load(records)
+        compact_frame = backend_app.load_data_from_json(records)
+
+    legacy_bytes = legacy_frame.memory_usage(index=True, deep=True)
+    compact_bytes = compact_frame.memory_usage(index=True, deep=True)
+    print(f"{len(compact_frame):,} rows")
+    print(f"{'column':>14} {'original':>24} {'compact':>24}")
+    for column in compact_frame.columns:
+        before = (f"{legacy_frame[column].dtype} {legacy_bytes[column] / 1e6:.2f} MB"
+                  if column in legacy_frame else "-")
+        print(f"{column:>14} {before:>24} {f'{compact_frame[column].dtype} {compact_bytes[column] / 1e6:.2f} MB':>24}")
+    print(f"{'total':>14} {legacy_bytes.sum() / 1e6:>21.2f} MB {compact_bytes.sum() / 1e6:>21.2f} MB "
+          f"({legacy_bytes.sum() / compact_bytes.sum():.1f}x smaller)")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mismatches = check_analytics(legacy_frame)
+    if mismatches:
+        print("Analytics differ between layouts:")
+        for mismatch in mismatches[:20]:
+            print(f"  {mismatch}")
+        sys.exit(1)
+    print("Analytics outputs unchanged.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=None)
+    run(parser.parse_args().rows)
@@ -0,0 +1,96 @@
+"""Benchmark building the device index in-process versus across 1..N worker processes.
+
+Also measures how responsive the server stays while an index build runs: a second thread
+keeps calling /api/health and the script reports its latency with each build mode.
+
+Usage:
+    python scripts/bench_parallel_index.py                         # 1000 devices, 1..cpu_count workers
+    python scripts/bench_parallel_index.py --devices 1000 --days 90 --workers 1 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app, synthetic_frame  # noqa: E402
+
+
+def _same_index(expected: dict, actual: dict) -> bool:
+    if list(expected) != list(actual):
+        return False
+    for device_name, stats in expected.items():
+        for key, value in stats.items():
+            other = actual[device_name][key]
+            if isinstance(value, np.ndarray):
+                same = np.array_equal(value, other)
+            elif isinstance(value, pd.Series):
+                same = value.equals(other)
+            else:
+                same = value == other
+            if not same:
+                return False
+    return True
+
+
+def _probe_latency(build) -> tuple[float, float, float]:
+    """Run build() while another thread polls /api/health; returns (build s, p50 ms, max ms)."""
+    client = backend_app.app.test_client()
+    done = threading.Event()
+    latencies = []
+
+    def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get("/api/health")
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.005)
+
+    thread = threading.Thread(target=probe)
+    thread.start()
+    started = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - started
+    done.set()
+    thread.join()
+    return elapsed, float(np.percentile(latencies, 50)), float(max(latencies))
+
+
+def run(num_devices: int, num_days: int, worker_counts: list[int]):
+    frame = synthetic_frame(num_devices, num_days)
+    with contextlib.redirect_stdout(io.StringIO()):
+        backend_app._set_data(backend_app.DEFAULT_TENANT, frame.head(1000).copy(), "benchmark")
+    print(f"{len(frame):,} rows, {num_devices} devices, {os.cpu_count()} CPUs")
+
+    expected = backend_app._device_stats(frame)
+    inline_s, inline_p50, inline_max = _probe_latency(lambda: backend_app._device_stats(frame))
+    print(f"{'mode':>12} {'build (s)':>10} {'speedup':>8} {'health p50 (ms)':>16} {'health max (ms)':>16}")
+    print(f"{'in-process':>12} {inline_s:>10.2f} {1.0:>7.1f}x {inline_p50:>16.2f} {inline_max:>16.2f}")
+
+    small = frame.head(num_devices * 24)
+    for workers in worker_counts:
+        # Start the workers (spawn re-imports the backend) before timing
+        backend_app._parallel_device_stats(small, workers)
+        result = {}
+        elapsed, p50, worst = _probe_latency(
+            lambda: result.update(index=backend_app._parallel_device_stats(frame, workers)))
+        if not _same_index(expected, result["index"]):
+            print(f"{workers} workers: index differs from the in-process build")
+            sys.exit(1)
+        print(f"{f'{workers} workers':>12} {elapsed:>10.2f} {inline_s / elapsed:>7.1f}x {p50:>16.2f} {worst:>16.2f}")
+    print("Parallel indexes match the in-process build.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--workers", type=int, nargs="+", default=list(range(1, (os.cpu_count() or 1) + 1)))
+    args = parser.parse_args()
+    run(args.devices, args.days, args.workers)
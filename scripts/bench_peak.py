@@ -0,0 +1,70 @@
+"""Benchmark /api/peak with the per-row period apply versus the hour lookup table.
+
+Usage:
+    python scripts/bench_peak.py                    # 10M rows
+    python scripts/bench_peak.py --rows 1000000 --devices 200
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app, synthetic_frame  # noqa: E402
+
+
+def legacy_peak(frame) -> dict:
+    """The original /api/peak body: one Python _period call per row on every request."""
+    def _period(hour: int) -> str:
+        if 5 <= hour <= 10:
+            return "morning"
+        if 11 <= hour <= 16:
+            return "afternoon"
+        if 17 <= hour <= 21:
+            return "evening"
+        return "night"
+
+    tot = frame.groupby(frame["hour"].apply(_period))["electricity"].sum()
+    return {"peak_period": tot.idxmax(), "period_kwh": tot.round(2).to_dict()}
+
+
+def run(num_rows: int, num_devices: int, repeat: int):
+    num_days = math.ceil(num_rows / (num_devices * 24))
+    frame = synthetic_frame(num_devices, num_days)
+    client = backend_app.app.test_client()
+
+    start = time.perf_counter()
+    expected = legacy_peak(frame)
+    legacy_ms = (time.perf_counter() - start) * 1000
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        backend_app._set_data(backend_app.DEFAULT_TENANT, frame, "benchmark")
+        ingest_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    first = client.get("/api/peak").get_json()
+    first_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        client.get("/api/peak")
+    warm_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    assert first["peak_period"] == expected["peak_period"]
+    print(f"{len(frame):,} rows, {num_devices} devices")
+    print(f"  before: per-row apply on every request  {legacy_ms:10.1f} ms")
+    print(f"  after:  ingest (index build)            {ingest_ms:10.1f} ms once")
+    print(f"          first request after ingest      {first_ms:10.2f} ms")
+    print(f"          cached request                  {warm_ms:10.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.rows, args.devices, args.repeat)
@@ -0,0 +1,107 @@
+"""Benchmark usage queries answered from the rollups against raw scans as history grows.
+
+For each history length, loads hourly readings for a number of devices, times the rollup
+build at ingest and a set of query_usage calls, and times the same questions answered by
+scanning the raw readings with pandas. Rollup answers are checked against the raw scans.
+
+Usage:
+    python scripts/bench_rollups.py                         # 10 devices; 1 month, 1 year, 5 years
+    python scripts/bench_rollups.py --devices 50 --days 30 365 --repeat 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app, synthetic_frame  # noqa: E402
+
+
+def _queries(frame: pd.DataFrame, device: str) -> dict[str, dict]:
+    """query_usage arguments per scenario; the recent window has edges off the hour."""
+    end = frame["timestamp"].max() + pd.Timedelta(hours=1)
+    recent = end - pd.Timedelta(days=30, hours=7, minutes=13)
+    return {
+        "household, all": {},
+        "one device, all": {"device_name": device},
+        "last 30 days": {"start": recent.to_pydatetime(), "end": end.to_pydatetime()},
+        "daily, last 90 days": {"start": (end - pd.Timedelta(days=90)).to_pydatetime(), "end": end.to_pydatetime(),
+                                "by": "day"},
+        "monthly, all": {"by": "month"},
+    }
+
+
+def _raw_scan(frame: pd.DataFrame, power: pd.Series, energy: pd.Series, query: dict) -> dict:
+    """The same statistics straight from the readings."""
+    mask = np.ones(len(frame), dtype=bool)
+    if "start" in query:
+        mask &= (frame["timestamp"] >= query["start"]).to_numpy()
+        mask &= (frame["timestamp"] < query["end"]).to_numpy()
+    if "device_name" in query:
+        mask &= (frame["device_name"] == query["device_name"]).to_numpy()
+    if "by" in query:
+        timestamps = frame["timestamp"][mask]
+        labels = timestamps.dt.floor("D") if query["by"] == "day" else timestamps.dt.to_period("M").dt.start_time
+        grouped = energy[mask].groupby(labels)
+        return {"energy_kwh": grouped.sum().round(4).tolist(), "readings": grouped.size().tolist()}
+    return {"energy_kwh": round(float(energy[mask].sum()), 4), "readings": int(mask.sum()),
+            "power_max": round(float(power[mask].max()), 3)}
+
+
+def _agrees(raw: dict, rolled: dict) -> bool:
+    return all(np.allclose(value, rolled[key]) for key, value in raw.items())
+
+
+def _per_call_ms(fn, repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run(num_devices: int, day_counts: list[int], repeat: int):
+    results = {}
+    for num_days in day_counts:
+        frame = synthetic_frame(num_devices, num_days)
+        started = time.perf_counter()
+        rollups = backend_app._build_rollups(frame)
+        build_s = time.perf_counter() - started
+        with contextlib.redirect_stdout(io.StringIO()):
+            tenant = backend_app._set_data(backend_app.DEFAULT_TENANT, frame, "benchmark")
+        power, energy = backend_app._measurement(frame, "power"), backend_app._measurement(frame, "electricity")
+        print(f"{num_days:>5} days: {len(frame):>9,} rows, rollups built in {build_s * 1000:.0f} ms, "
+              f"{backend_app._rollups_memory_bytes(rollups) / 2**20:.1f} MB")
+
+        device = next(iter(tenant["device_index"]))
+        for label, query in _queries(frame, device).items():
+            rolled = backend_app.query_usage(tenant, **query)
+            raw = _raw_scan(frame, power, energy, query)
+            if not _agrees(raw, rolled):
+                print(f"{label}: rollup answer differs from the raw scan")
+                sys.exit(1)
+            results.setdefault(label, {})[num_days] = (
+                _per_call_ms(lambda: backend_app.query_usage(tenant, **query), repeat),
+                _per_call_ms(lambda: _raw_scan(frame, power, energy, query), max(repeat // 10, 1)),
+            )
+
+    header = "".join(f"{f'{days} d rollup':>14}{f'{days} d raw':>12}" for days in day_counts)
+    print(f"\n{'query (ms)':>22}{header}")
+    for label, timings in results.items():
+        row = "".join(f"{timings[days][0]:>14.2f}{timings[days][1]:>12.2f}" for days in day_counts)
+        print(f"{label:>22}{row}")
+    print("Rollup answers match the raw scans.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365, 5 * 365])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.devices, args.days, args.repeat)
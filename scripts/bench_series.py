@@ -0,0 +1,67 @@
+"""Benchmark /api/device/<name>/series: latency and response size per window, versus full history.
+
+Loads hourly readings for a number of devices over several years, then requests one device's
+series for windows from a day to the whole history, raw and resampled, and compares with
+/api/device/<name>, which always returns the whole daily history.
+
+Usage:
+    python scripts/bench_series.py                          # 20 devices, 5 years
+    python scripts/bench_series.py --devices 50 --days 730 --repeat 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app, synthetic_frame  # noqa: E402
+
+WINDOWS = {"1 day": 1, "1 week": 7, "1 month": 30, "1 year": 365, "all": None}
+
+
+def _timed(client, path: str, repeat: int) -> tuple[float, int]:
+    """Mean latency in ms and response size, with the response cache cleared before each request."""
+    backend_app.response_cache.clear()
+    size = len(client.get(path).data)  # also builds the per-snapshot series index
+    started = time.perf_counter()
+    for _ in range(repeat):
+        backend_app.response_cache.clear()
+        client.get(path)
+    return (time.perf_counter() - started) / repeat * 1000, size
+
+
+def run(num_devices: int, num_days: int, repeat: int):
+    frame = synthetic_frame(num_devices, num_days)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tenant = backend_app._set_data(backend_app.DEFAULT_TENANT, frame, "benchmark")
+    client = backend_app.app.test_client()
+    device = next(iter(tenant["device_index"]))
+    quoted = device.replace(" ", "%20")
+    started = time.perf_counter()
+    backend_app._series_index(tenant)
+    print(f"{len(frame):,} rows, {num_devices} devices over {num_days} days; "
+          f"series index built in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    details_ms, details_size = _timed(client, f"/api/device/{quoted}", repeat)
+    print(f"/api/device/{device}: {details_ms:.2f} ms, {details_size / 1024:.1f} KB (whole history)")
+    print(f"{'window':>8} {'bucket':>7} {'readings':>9} {'points':>7} {'ms':>8} {'KB':>8}")
+    end = frame["timestamp"].max() + timedelta(hours=1)
+    for label, days in WINDOWS.items():
+        window = "" if days is None else f"from={(end - timedelta(days=days)).isoformat()}&to={end.isoformat()}&"
+        for bucket in (None, "1h", "1d"):
+            path = f"/api/device/{quoted}/series?{window}" + (f"bucket={bucket}" if bucket else "")
+            body = client.get(path).get_json()
+            ms, size = _timed(client, path, repeat)
+            print(f"{label:>8} {bucket or 'raw':>7} {body['readings']:>9,} {body['points']:>7,} {ms:>8.2f} {size / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.devices, args.days, args.repeat)
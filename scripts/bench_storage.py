@@ -0,0 +1,102 @@
+"""Compare cold start from the Parquet store with re-uploading the JSON history.
+
+Each scenario runs in a fresh interpreter. Library imports are done before the clock
+starts, so the timings cover only getting the data loaded and answering one query.
+
+Usage:
+    python scripts/bench_storage.py
+    python scripts/bench_storage.py --file my-export.json --partition-by-device
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SAMPLE_FILE = os.path.join(REPO_DIR, "sample-energy-data-21-days.json")
+
+PRELUDE = """
+import contextlib, io, json, sys, time
+sys.path.insert(0, {repo!r})
+import flask, numpy, pandas, pyarrow.dataset, sklearn.linear_model  # imported before timing
+"""
+
+REUPLOAD = PRELUDE + """
+with contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    import backend_app
+    with open({file!r}) as f:
+        frame = backend_app.load_data_from_json(json.load(f))
+    loaded = time.perf_counter()
+    backend_app.app.test_client().get("/api/devices")
+    done = time.perf_counter()
+print(json.dumps({{"rows": len(frame), "load_s": loaded - start, "first_query_s": done - start}}))
+"""
+
+COLD_START = PRELUDE + """
+with contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    import backend_app
+    tenant = backend_app.get_tenant()  # restores from ENERGY_STORAGE_DIR on first use
+    loaded = time.perf_counter()
+    backend_app.app.test_client().get("/api/devices")
+    done = time.perf_counter()
+print(json.dumps({{"rows": len(tenant["df"]), "load_s": loaded - start, "first_query_s": done - start}}))
+"""
+
+PUSHDOWN = PRELUDE + """
+import backend_app
+from datetime import timedelta
+frame = backend_app.get_tenant()["df"]
+first = frame["timestamp"].min()
+device = str(frame["device_name"].iloc[0])
+dataset = backend_app._storage_dataset()
+results = {{"files_total": len(dataset.files)}}
+for label, args in (("all", (None, None, None)), ("one_device_one_week", (device, first, first + timedelta(days=7)))):
+    start = time.perf_counter()
+    rows = len(backend_app.scan_readings(*args))
+    results[label] = {{"rows": rows, "seconds": time.perf_counter() - start}}
+fragments = dataset.get_fragments(filter=(backend_app.ds.field("date") < (first + timedelta(days=7)).date()))
+results["files_one_week"] = sum(1 for _ in fragments)
+print(json.dumps(results))
+"""
+
+
+def _run(code: str, env: dict) -> dict:
+    output = subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(path: str, partition_by_device: bool):
+    with tempfile.TemporaryDirectory() as storage_dir:
+        plain_env = {k: v for k, v in os.environ.items() if not k.startswith("ENERGY_STORAGE")}
+        storage_env = dict(plain_env, ENERGY_STORAGE_DIR=storage_dir)
+        if partition_by_device:
+            storage_env["ENERGY_STORAGE_PARTITION_BY_DEVICE"] = "1"
+
+        reupload = _run(REUPLOAD.format(repo=REPO_DIR, file=path), plain_env)
+        _run(REUPLOAD.format(repo=REPO_DIR, file=path), storage_env)  # persists the upload
+        cold = _run(COLD_START.format(repo=REPO_DIR), storage_env)
+        pushdown = _run(PUSHDOWN.format(repo=REPO_DIR), storage_env)
+
+    print(f"{reupload['rows']:,} rows from {os.path.basename(path)}")
+    print(f"{'':>26} {'loaded (s)':>11} {'first query (s)':>16}")
+    for label, result in (("re-upload JSON", reupload), ("restore from Parquet", cold)):
+        print(f"{label:>26} {result['load_s']:>11.3f} {result['first_query_s']:>16.3f}")
+    print(f"{'speedup':>26} {reupload['load_s'] / cold['load_s']:>10.1f}x "
+          f"{reupload['first_query_s'] / cold['first_query_s']:>15.1f}x")
+    print(f"Predicate pushdown: one device, one week read {pushdown['one_device_one_week']['rows']:,} of "
+          f"{pushdown['all']['rows']:,} rows from {pushdown['files_one_week']} of {pushdown['files_total']} files "
+          f"({pushdown['one_device_one_week']['seconds'] * 1000:.1f} ms vs "
+          f"{pushdown['all']['seconds'] * 1000:.1f} ms for a full scan)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", default=SAMPLE_FILE)
+    parser.add_argument("--partition-by-device", action="store_true")
+    args = parser.parse_args()
+    run(args.file, args.partition_by_device)
@@ -0,0 +1,188 @@
+"""Benchmark the compiled suggestion engine against rebuilding the rule dict on every call.
+
+Scores a fleet of devices the way /api/suggestions does, once per device, with the original
+generate_device_suggestions (kept below, with its insight pick switched from hash() to the
+stable crc32 the engine uses) and with the current one, cold (caches cleared) and warm.
+Every device's suggestions must be identical.
+
+Usage:
+    python scripts/bench_suggestions.py                      # 1k and 10k devices
+    python scripts/bench_suggestions.py --devices 500 50000 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_device_index import backend_app  # noqa: E402
+
+DEVICE_TYPES = ["AC", "Fridge", "Television", "Light", "Fan", "Washing Machine", "Geyser", "Microwave"]
+
+
+def legacy_suggestions(device_name: str, current_power: float, efficiency: float, is_active: bool) -> list[str]:
+    """generate_device_suggestions as it was, rebuilding its rule dict per call; the insight pick uses crc32."""
+    suggestions = []
+
+    # Device-specific optimization strategies with ROI calculations
+    device_strategies = {
+        'AC': {
+            'low_efficiency': [
+                f"AC efficiency at {efficiency:.1f}% indicates potential 35-40% cost savings through inverter upgrade. ROI: 4.2 years with ₹800/month savings.",
+                "Implement smart scheduling: Pre-cool during off-peak hours (2-5PM) and raise thermostat 2°C during peak hours. Immediate 25% cost reduction.",
+                "Install programmable thermostat with occupancy sensors. Reduces runtime by 30% through zone-based cooling optimization."
+            ],
+            'standby_power': [
+                f"AC consuming {current_power:.1f}W in standby mode costs ₹{(current_power * 24 * 30 * 5.5 / 1000):.0f}/month. Install smart switch for 100% elimination.",
+                "Phantom load detected. Smart power management can eliminate this ₹200+/month waste through automated standby control."
+            ],
+            'optimization': [
+                "Consider variable refrigerant flow (VRF) system for 40% efficiency improvement and precise temperature control.",
+                "Implement demand response automation: Shift 60% of cooling load to off-peak hours for 30% cost reduction."
+            ]
+        },
+        'Fridge': {
+            'low_efficiency': [
+                f"Fridge efficiency at {efficiency:.1f}% suggests compressor optimization needed. Professional maintenance can improve efficiency by 15-20%.",
+                "Consider upgrading to 5-star BEE rated model. Investment: ₹35,000, Annual savings: ₹4,200, Payback: 8.3 years.",
+                "Implement smart temperature monitoring: Optimal 3-4°C reduces energy consumption by 12% while maintaining food safety."
+            ],
+            'optimization': [
+                "Install door seal sensors and temperature alerts for 8-10% efficiency improvement through proactive maintenance.",
+                "Optimize placement: Ensure 6-inch clearance from walls and away from heat sources for 15% efficiency gain."
+            ]
+        },
+        'Television': {
+            'standby_power': [
+                f"TV standby consumption of {current_power:.1f}W costs ₹{(current_power * 24 * 30 * 5.5 / 1000):.0f}/month. Smart power strips eliminate 100% of phantom load.",
+                "Entertainment center phantom loads typically waste ₹300-500/month. Automated power management ROI: 3-4 months."
+            ],
+            'optimization': [
+                "Implement viewing time automation: Auto-shutdown after 2 hours of inactivity saves 20-25% on entertainment energy costs.",
+                "Optimize display settings: Reduce brightness by 20% for 15% power reduction with minimal visual impact."
+            ]
+        },
+        'Light': {
+            'optimization': [
+                f"LED upgrade opportunity: Current lighting efficiency at {efficiency:.1f}% vs 95%+ for premium LEDs. 60-70% energy reduction possible.",
+                "Smart lighting automation: Occupancy sensors and daylight harvesting can reduce lighting costs by 40-50%.",
+                "Implement circadian lighting: Automated dimming schedules reduce energy by 25% while improving sleep quality."
+            ],
+            'low_efficiency': [
+                "Incandescent/CFL detected. LED conversion: ₹2,000 investment, ₹400/month savings, 5-month payback period.",
+                "Smart dimming systems can extend LED life by 3x while reducing energy consumption by 30-40%."
+            ]
+        },
+        'Fan': {
+            'optimization': [
+                f"Fan efficiency at {efficiency:.1f}% indicates BLDC motor upgrade opportunity. 50% energy savings with variable speed control.",
+                "Smart fan automation: Temperature-based speed control reduces energy by 35% while maintaining comfort.",
+                "Ceiling fan optimization: Proper blade angle and regular cleaning improves efficiency by 15-20%."
+            ],
+            'low_efficiency': [
+                "Consider BLDC fan upgrade: ₹8,000 investment, ₹200/month savings, 3.3-year payback with superior performance.",
+                "Variable speed drives can optimize fan performance for 25-30% energy reduction through demand-based operation."
+            ]
+        },
+        'Washing Machine': {
+            'optimization': [
+                f"Washing machine efficiency at {efficiency:.1f}% suggests load optimization needed. Full loads reduce per-kg energy cost by 40%.",
+                "Cold water washing: 90% of energy goes to heating. Cold wash reduces energy by 85% with modern detergents.",
+                "Time-of-use optimization: Shift washing to off-peak hours for 35% cost reduction on heating elements."
+            ],
+            'low_efficiency': [
+                "Front-loading upgrade opportunity: 40% less water, 25% less energy, ₹300/month savings with ₹45,000 investment.",
+                "Smart load sensing technology can optimize water and energy usage for 20-25% efficiency improvement."
+            ]
+        }
+    }
+
+    # Get device-specific strategies
+    device_tips = device_strategies.get(device_name, {})
+
+    # Add efficiency-based suggestions with financial impact
+    if efficiency < 70:
+        suggestions.extend(device_tips.get('low_efficiency', [
+            f"Critical efficiency alert: {device_name} at {efficiency:.1f}% requires immediate attention. Professional audit recommended for 20-30% improvement."
+        ]))
+    elif efficiency < 85:
+        suggestions.extend(device_tips.get('optimization', [
+            f"{device_name} efficiency at {efficiency:.1f}% has 15-20% improvement potential through smart optimization strategies."
+        ]))
+
+    # Add standby power suggestions with cost impact
+    if not is_active and current_power > 5:
+        suggestions.extend(device_tips.get('standby_power', [
+            f"{device_name} phantom load: {current_power:.1f}W costs ₹{(current_power * 24 * 30 * 5.5 / 1000):.0f}/month. Smart automation eliminates 100% waste."
+        ]))
+
+    # Add general optimization if no specific issues
+    if not suggestions:
+        suggestions.extend(device_tips.get('optimization', [
+            f"{device_name} performing well at {efficiency:.1f}% efficiency. Consider smart automation for 10-15% additional optimization."
+        ]))
+
+    # Add strategic insights
+    strategic_insights = [
+        f"IoT integration opportunity: Smart sensors can optimize {device_name} performance through predictive maintenance and usage analytics.",
+        f"Energy storage synergy: Battery backup system can shift {device_name} usage to stored solar energy, reducing grid dependency by 60-80%.",
+        f"Demand response potential: {device_name} automation can participate in utility programs for ₹500-1000/month additional savings."
+    ]
+
+    # Add one strategic insight
+    if len(suggestions) < 3:
+        suggestions.append(strategic_insights[zlib.crc32(device_name.encode()) % len(strategic_insights)])
+
+    return suggestions[:3]  # Return top 3 sophisticated suggestions
+
+
+def synthetic_fleet(num_devices: int, seed: int = 0) -> list[tuple]:
+    """(device, current power, efficiency, active) per device, spread over every rule band."""
+    rng = random.Random(seed)
+    return [(rng.choice(DEVICE_TYPES), rng.choice([0.0, rng.uniform(0, 15), rng.uniform(20, 2500)]),
+             rng.uniform(40, 99), rng.random() < 0.6) for _ in range(num_devices)]
+
+
+def _clear_caches():
+    backend_app._suggestion_templates.cache_clear()
+    backend_app._formatted_suggestions.cache_clear()
+
+
+def _per_pass_ms(fn, fleet: list[tuple], repeat: int, cold: bool) -> float:
+    total = 0.0
+    for _ in range(repeat):
+        if cold:
+            _clear_caches()
+        started = time.perf_counter()
+        for device in fleet:
+            fn(*device)
+        total += time.perf_counter() - started
+    return total / repeat * 1000
+
+
+def run(device_counts: list[int], repeat: int):
+    print(f"{'devices':>8} {'legacy (ms)':>12} {'cold (ms)':>10} {'warm (ms)':>10} {'cold':>7} {'warm':>7}")
+    for num_devices in device_counts:
+        fleet = synthetic_fleet(num_devices)
+        _clear_caches()
+        for device in fleet:
+            expected, got = legacy_suggestions(*device), backend_app.generate_device_suggestions(*device)
+            if expected != got:
+                print(f"{device}: legacy {expected!r}, engine {got!r}")
+                sys.exit(1)
+        legacy_ms = _per_pass_ms(legacy_suggestions, fleet, repeat, cold=False)
+        cold_ms = _per_pass_ms(backend_app.generate_device_suggestions, fleet, repeat, cold=True)
+        warm_ms = _per_pass_ms(backend_app.generate_device_suggestions, fleet, repeat, cold=False)
+        print(f"{num_devices:>8,} {legacy_ms:>12.2f} {cold_ms:>10.2f} {warm_ms:>10.2f} "
+              f"{legacy_ms / cold_ms:>6.1f}x {legacy_ms / warm_ms:>6.1f}x")
+    print("Engine suggestions equal the original rules for every device.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.devices, args.repeat)
@@ -0,0 +1,257 @@
+"""Time every /api route and the core analytics functions across data sizes; save and compare baselines.
+
+Readings come from generate_sample_data (seeded, so every run times the same data). For each
+scale the readings are uploaded with load_data_from_json, the core functions are timed
+directly and every /api route is requested through the Flask test client. Responses are not
+served from the response cache, and the core functions run with the snapshot's derived caches
+cleared, so each sample does its full work; "first" is a route's first request on a snapshot
+with nothing derived yet, as right after an upload.
+Uploads go to a separate tenant.
+
+Results are written as JSON with --save. --baseline compares the median of each timing with an
+earlier file, flags those slower by more than --threshold (and by at least --min-ms, to stay
+above timer noise) and exits with status 1 if any regressed.
+
+Usage:
+    python scripts/bench_suite.py --save baseline.json                   # record a baseline
+    python scripts/bench_suite.py --baseline baseline.json               # compare against it
+    python scripts/bench_suite.py --scales small medium --repeat 10 --threshold 0.25
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, ".."))
+sys.path.insert(0, SCRIPTS_DIR)
+import backend_app  # noqa: E402
+from generate_sample_data import generate_readings, readings_records, record_lines  # noqa: E402
+
+# Devices and days per scale: about 3k, 130k and 1.3M readings
+SCALES = {"small": (6, 21), "medium": (60, 90), "large": (600, 90)}
+START_DATE = "2024-07-01"
+UPLOAD_TENANT = "bench-suite-upload"
+# Uploads rebuild everything, so they are timed fewer times
+UPLOAD_REPEAT = 3
+
+
+def _timings(fn, repeat: int, setup=None) -> list[float]:
+    """Milliseconds per call of fn, with setup (untimed) before each."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _summary(samples: list[float], first: float | None = None) -> dict:
+    result = {"median_ms": round(float(np.median(samples)), 3), "min_ms": round(min(samples), 3),
+              "runs": len(samples)}
+    if first is not None:
+        result["first_ms"] = round(first, 3)
+    return result
+
+
+def route_requests(device: str, end: datetime, upload_body: bytes, stream_body: bytes) -> dict[str, tuple]:
+    """(method, path, body, content type) for every /api route, keyed by its rule."""
+    device_path = quote(device)
+    month_ago = (end - timedelta(days=30)).isoformat()
+    return {
+        "/api/upload": ("POST", f"/api/upload?tenant={UPLOAD_TENANT}", upload_body, "application/json"),
+        "/api/upload/stream": ("POST", f"/api/upload/stream?tenant={UPLOAD_TENANT}", stream_body,
+                               "application/x-ndjson"),
+        "/api/upload/append": ("POST", f"/api/upload/append?tenant={UPLOAD_TENANT}", None, "application/json"),
+        "/api/peak": ("GET", "/api/peak", None, None),
+        "/api/bill": ("GET", "/api/bill?units=742.5", None, None),
+        "/api/bill/batch": ("POST", "/api/bill/batch", json.dumps({"units": list(range(0, 2000, 2))}).encode(),
+                            "application/json"),
+        "/api/predict": ("GET", "/api/predict", None, None),
+        "/api/predict/devices": ("GET", "/api/predict/devices", None, None),
+        "/api/suggestions": ("GET", "/api/suggestions", None, None),
+        "/api/devices": ("GET", "/api/devices", None, None),
+        "/api/device/<device_name>": ("GET", f"/api/device/{device_path}", None, None),
+        "/api/device/<device_name>/series": ("GET", f"/api/device/{device_path}/series?from={month_ago}&bucket=1h",
+                                             None, None),
+        "/api/usage": ("GET", f"/api/usage?from={month_ago}&by=day", None, None),
+        "/api/anomalies": ("GET", "/api/anomalies", None, None),
+        "/api/summary": ("GET", f"/api/summary?fields=peak,devices,predict,suggestions,device&device={device_path}",
+                         None, None),
+        "/api/stats/memory": ("GET", "/api/stats/memory", None, None),
+        "/api/storage": ("GET", "/api/storage", None, None),
+        "/api/readings": ("GET", f"/api/readings?device={device_path}&limit=1000", None, None),
+        "/api/weather": ("GET", "/api/weather?city=Delhi", None, None),
+        "/api/health": ("GET", "/api/health", None, None),
+        "/api/tenants": ("GET", "/api/tenants", None, None),
+        "/api/cache": ("GET", "/api/cache", None, None),
+        "/api/metrics": ("GET", "/api/metrics", None, None),
+    }
+
+
+def _append_bodies(num_devices: int, num_days: int, count: int) -> list[bytes]:
+    """One day of new readings per append, each newer than the last."""
+    start = pd.Timestamp(START_DATE) + pd.Timedelta(days=num_days)
+    bodies = []
+    for day in range(count):
+        frame = generate_readings((start + pd.Timedelta(days=day)).strftime("%Y-%m-%d"), 1, num_devices,
+                                  household=day + 1)
+        bodies.append(("[" + ",".join(record_lines(frame)) + "]").encode())
+    return bodies
+
+
+def time_routes(client, tenant: dict, requests: dict[str, tuple], append_bodies: list[bytes],
+                repeat: int) -> dict[str, dict]:
+    def fresh_snapshot():
+        # As if the data had just been uploaded: nothing derived or cached yet
+        backend_app.response_cache.clear()
+        tenant["derived_cache"].clear()
+        tenant["forecast_cache"].clear()
+
+    results = {}
+    for rule, (method, path, body, content_type) in requests.items():
+        bodies = iter(append_bodies)
+
+        def call():
+            response = client.open(path, method=method, data=body if body is not None else next(bodies, None),
+                                   content_type=content_type)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {path}: {response.status_code} {response.get_data(as_text=True)[:200]}")
+        if rule.startswith("/api/upload"):
+            # Appends go on top of a full upload of the same readings
+            client.open(requests["/api/upload"][1], method="POST", data=requests["/api/upload"][2],
+                        content_type="application/json")
+            samples = _timings(call, UPLOAD_REPEAT)
+            first = samples[0]
+        else:
+            first = _timings(call, 1, fresh_snapshot)[0]
+            samples = _timings(call, repeat, backend_app.response_cache.clear)
+        results[f"{method} {rule}"] = _summary(samples, first)
+    return results
+
+
+def time_core(tenant_id: str, records: list[dict], repeat: int) -> dict[str, dict]:
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["load_data_from_json"] = _summary(
+            _timings(lambda: backend_app.load_data_from_json(records, tenant_id), UPLOAD_REPEAT))
+    tenant = backend_app.get_tenant(tenant_id)
+    clear = tenant["derived_cache"].clear
+    results["generate_device_data"] = _summary(_timings(lambda: backend_app.generate_device_data(tenant), repeat, clear))
+    results["compute_peak_period"] = _summary(_timings(lambda: backend_app.compute_peak_period(tenant), repeat, clear))
+    results["_train_regressor"] = _summary(_timings(lambda: backend_app._train_regressor(tenant["df"]), repeat))
+    results["calculate_bill"] = _summary(_timings(lambda: backend_app.calculate_bill(742.5), repeat))
+    return results
+
+
+def run_scale(name: str, repeat: int) -> dict:
+    num_devices, num_days = SCALES[name]
+    frame = generate_readings(START_DATE, num_days, num_devices)
+    lines = record_lines(frame)
+    upload_body = ("[" + ",".join(lines) + "]").encode()
+    stream_body = ("\n".join(lines) + "\n").encode()
+    records = readings_records(frame)
+    print(f"{name}: {len(frame):,} readings, {num_devices} devices over {num_days} days", file=sys.stderr)
+
+    timings = time_core(backend_app.DEFAULT_TENANT, records, repeat)
+    tenant = backend_app.get_tenant(backend_app.DEFAULT_TENANT)
+    requests = route_requests(next(iter(tenant["device_index"])), frame["timestamp"].max().to_pydatetime(),
+                              upload_body, stream_body)
+    missing = [rule.rule for rule in backend_app.app.url_map.iter_rules()
+               if rule.rule.startswith("/api/") and rule.rule not in requests]
+    if missing:
+        print(f"  not benchmarked (add them to route_requests): {', '.join(missing)}", file=sys.stderr)
+    timings.update(time_routes(backend_app.app.test_client(), tenant, requests,
+                               _append_bodies(num_devices, num_days, UPLOAD_REPEAT), repeat))
+    backend_app.tenants.pop(UPLOAD_TENANT, None)
+    return {"readings": len(frame), "devices": num_devices, "days": num_days, "timings": timings}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_ms: float) -> list[str]:
+    """Print each timing against the baseline; returns the regressed ones."""
+    regressions = []
+    print(f"\n{'scale':>7} {'timing':<40} {'baseline':>10} {'now':>10} {'change':>8}")
+    for scale, result in current["results"].items():
+        before = baseline.get("results", {}).get(scale, {}).get("timings", {})
+        for name, timing in result["timings"].items():
+            if name not in before:
+                print(f"{scale:>7} {name:<40} {'-':>10} {timing['median_ms']:>10.2f} {'new':>8}")
+                continue
+            old, new = before[name]["median_ms"], timing["median_ms"]
+            change = (new - old) / old if old else 0.0
+            flag = ""
+            if change > threshold and new - old >= min_ms:
+                flag = "  REGRESSION"
+                regressions.append(f"{scale} {name}")
+            elif change < -threshold and old - new >= min_ms:
+                flag = "  faster"
+            print(f"{scale:>7} {name:<40} {old:>10.2f} {new:>10.2f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def run(scales: list[str], repeat: int, save: str | None, baseline_path: str | None, threshold: float, min_ms: float):
+    current = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": {scale: run_scale(scale, repeat) for scale in scales},
+    }
+    if save:
+        with open(save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved {sum(len(r['timings']) for r in current['results'].values())} timings to {save}")
+
+    if baseline_path is None:
+        print(f"\n{'scale':>7} {'timing':<40} {'median':>10} {'min':>10} {'first':>10}   (ms)")
+        for scale, result in current["results"].items():
+            for name, timing in result["timings"].items():
+                first = f"{timing['first_ms']:>10.2f}" if "first_ms" in timing else f"{'':>10}"
+                print(f"{scale:>7} {name:<40} {timing['median_ms']:>10.2f} {timing['min_ms']:>10.2f} {first}")
+        return
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"Baseline from {baseline['meta'].get('created')} (commit {baseline['meta'].get('commit')})")
+    regressions = compare(current, baseline, threshold, min_ms)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo regressions over {threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare with results saved earlier")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged as a regression")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+    run(args.scales, args.repeat, args.save, args.baseline, args.threshold, args.min_ms)
@@ -1,84 +1,186 @@
+"""Generate synthetic smart-plug readings in the upload format, vectorized with NumPy.
+
+Each household has num_devices devices cycling through the appliance profiles below (the
+first six keep the plain names AC, Fridge, ...), with one reading per device per interval.
+The output is reproducible for a seed; households draw from independent streams of it.
+Files are written as a JSON array (the /api/upload body), NDJSON (/api/upload/stream) or
+Parquet (the stored reading columns), chosen by extension or --format. With several
+households each gets its own file, suffixed -h1, -h2, ...
+
+Usage:
+    python scripts/generate_sample_data.py                          # 21 days, 6 devices
+    python scripts/generate_sample_data.py --days 365 --devices 60 -o year.ndjson
+    python scripts/generate_sample_data.py --households 10 --interval-minutes 15 -o homes.parquet
+"""
+import argparse
 import json
-import random
-from datetime import datetime, timedelta
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Per appliance: power drawn when on (base +/- variance, in W), the hours it is usually on and
+# the chance it is on regardless of the hour; AC and fridge power also varies +/-20% per reading
+DEVICE_PROFILES = {
+    "AC": {"base_power": 1500, "variance": 500, "active_hours": range(10, 23), "always_on_prob": 0.1},
+    "Fridge": {"base_power": 150, "variance": 50, "active_hours": range(0, 24), "always_on_prob": 0.95},
+    "Television": {"base_power": 100, "variance": 30, "active_hours": range(17, 23), "always_on_prob": 0.2},
+    "Light": {"base_power": 40, "variance": 10, "active_hours": list(range(18, 24)) + list(range(0, 6)), "always_on_prob": 0.3},
+    "Fan": {"base_power": 60, "variance": 20, "active_hours": range(10, 24), "always_on_prob": 0.4},
+    "Washing Machine": {"base_power": 500, "variance": 100, "active_hours": [9, 10, 11, 18, 19], "always_on_prob": 0.05},
+}
+VARYING_DEVICES = {"AC", "Fridge"}
+# Chance of being on inside and outside a device's usual hours
+ACTIVE_HOUR_PROB, IDLE_HOUR_PROB = 0.7, 0.1
+VOLTAGE_RANGE = (220.0, 245.0)
+
+FORMATS = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".parquet": "parquet"}
+RECORD_TEMPLATE = ('{{"success": true, "result": {{"device_name": {}, "power": {}, "voltage": {}, "current": {}, '
+                   '"electricity": {}, "switch": {}, "update_time": "{}Z"}}, "t": {}}}')
+WRITE_CHUNK_ROWS = 500_000
+
+
+def device_kinds(num_devices: int) -> list[str]:
+    """The profile of each device: AC, Fridge, ... repeating."""
+    return [list(DEVICE_PROFILES)[i % len(DEVICE_PROFILES)] for i in range(num_devices)]
+
+
+def device_names(num_devices: int) -> list[str]:
+    """AC, Fridge, ... for the first of each profile, then AC 2, Fridge 2, ..."""
+    return [kind + (f" {i // len(DEVICE_PROFILES) + 1}" if i >= len(DEVICE_PROFILES) else "")
+            for i, kind in enumerate(device_kinds(num_devices))]
+
+
+def generate_readings(start_date_str: str, num_days: int, num_devices: int = len(DEVICE_PROFILES),
+                      interval_minutes: int = 60, seed: int = 42, household: int = 0) -> pd.DataFrame:
+    """One household's readings as a frame, time-major with devices in a fixed order per timestamp."""
+    rng = np.random.default_rng([seed, household])
+    timestamps = pd.date_range(start_date_str, periods=num_days * 24 * 60 // interval_minutes,
+                               freq=f"{interval_minutes}min")
+    names, kinds = device_names(num_devices), device_kinds(num_devices)
+    profiles = [DEVICE_PROFILES[kind] for kind in kinds]
+    shape = (len(timestamps), num_devices)
+
+    # Which hours each device is usually on, looked up for every (timestamp, device)
+    usual_hours = np.array([[hour in profile["active_hours"] for hour in range(24)] for profile in profiles])
+    in_usual_hours = usual_hours.T[timestamps.hour.to_numpy()]
+    always_on = np.array([profile["always_on_prob"] for profile in profiles])
+    is_active = (rng.random(shape) < always_on) | (
+        rng.random(shape) < np.where(in_usual_hours, ACTIVE_HOUR_PROB, IDLE_HOUR_PROB))
+
+    base = np.array([profile["base_power"] for profile in profiles], dtype=np.float64)
+    variance = np.array([profile["variance"] for profile in profiles], dtype=np.float64)
+    power = np.maximum(0.0, base + rng.uniform(-1.0, 1.0, shape) * variance)
+    varying = np.array([kind in VARYING_DEVICES for kind in kinds])
+    power *= np.where(varying, 0.8 + rng.random(shape) * 0.4, 1.0)
+    power = np.where(is_active, power, 0.0)
+    voltage = rng.uniform(*VOLTAGE_RANGE, shape).round(2)
+
+    return pd.DataFrame({
+        "timestamp": np.repeat(timestamps.to_numpy(), num_devices),
+        "device_name": pd.Categorical(np.tile(np.array(names, dtype=object), len(timestamps)), categories=names),
+        "power": power.round(2).ravel(),
+        "voltage": voltage.ravel(),
+        "current": (power / voltage).round(2).ravel(),
+        "electricity": (power / 1000.0 * (interval_minutes / 60)).round(3).ravel(),
+        "switch": is_active.ravel(),
+    })
+
+
+def record_lines(frame: pd.DataFrame) -> list[str]:
+    """Upload records for a frame of readings, one JSON object per string."""
+    quoted = {name: json.dumps(name) for name in frame["device_name"].cat.categories}
+    stamps = frame["timestamp"].to_numpy()
+    return [
+        RECORD_TEMPLATE.format(quoted[name], power, voltage, current, electricity, "true" if switch else "false",
+                               update_time, t)
+        for name, power, voltage, current, electricity, switch, update_time, t in zip(
+            frame["device_name"].tolist(), frame["power"].tolist(), frame["voltage"].tolist(),
+            frame["current"].tolist(), frame["electricity"].tolist(), frame["switch"].tolist(),
+            np.datetime_as_string(stamps, unit="s").tolist(),
+            stamps.astype("datetime64[ms]").astype(np.int64).tolist())
+    ]
+
+
+def readings_records(frame: pd.DataFrame) -> list[dict]:
+    """The upload records as Python objects, as load_data_from_json receives them."""
+    return json.loads("[" + ",".join(record_lines(frame)) + "]")
+
+
+def write_readings(frame: pd.DataFrame, path: str, fmt: str):
+    """Write readings as a JSON array, NDJSON or Parquet, formatting JSON a chunk of rows at a time."""
+    if fmt == "parquet":
+        frame.rename(columns={"switch": "switch_status"}).to_parquet(path, index=False)
+        return
+    with open(path, "w") as f:
+        if fmt == "json":
+            f.write("[\n")
+        for start in range(0, len(frame), WRITE_CHUNK_ROWS):
+            lines = record_lines(frame.iloc[start:start + WRITE_CHUNK_ROWS])
+            if fmt == "json":
+                f.write((",\n" if start else "") + ",\n".join(lines))
+            else:
+                f.write("\n".join(lines) + "\n")
+        if fmt == "json":
+            f.write("\n]\n")
+
 
 def generate_energy_data(
     start_date_str: str,
     num_days: int,
-    output_filename: str = "sample-energy-data.json"
-):
+    output_filename: str = "sample-energy-data.json",
+    num_devices: int = len(DEVICE_PROFILES),
+    num_households: int = 1,
+    interval_minutes: int = 60,
+    seed: int = 42,
+    fmt: str | None = None,
+) -> list[str]:
     """
-    Generates sample energy consumption data for multiple devices over a period.
+    Generate sample readings for one or more households and write them to files.
 
     Args:
         start_date_str: Start date in 'YYYY-MM-DD' format.
         num_days: Number of days to generate data for.
-        output_filename: Name of the JSON file to save the data.
+        output_filename: File to write; with several households, one file per household is
+            written with -h1, -h2, ... before the extension.
+        num_devices: Devices per household.
+        num_households: Households to generate.
+        interval_minutes: Minutes between a device's readings.
+        seed: Seed for the random generator; the same seed gives the same readings.
+        fmt: "json", "ndjson" or "parquet"; by default taken from the file extension.
+
+    Returns the paths written.
     """
-    devices = {
-        "AC": {"base_power": 1500, "variance": 500, "active_hours": range(10, 23), "always_on_prob": 0.1},
-        "Fridge": {"base_power": 150, "variance": 50, "active_hours": range(0, 24), "always_on_prob": 0.95},
-        "Television": {"base_power": 100, "variance": 30, "active_hours": range(17, 23), "always_on_prob": 0.2},
-        "Light": {"base_power": 40, "variance": 10, "active_hours": list(range(18, 24)) + list(range(0, 6)), "always_on_prob": 0.3},
-        "Fan": {"base_power": 60, "variance": 20, "active_hours": range(10, 24), "always_on_prob": 0.4},
-        "Washing Machine": {"base_power": 500, "variance": 100, "active_hours": [9, 10, 11, 18, 19], "always_on_prob": 0.05},
-    }
-
-    all_records = []
-    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-
-    print(f"Generating {num_days} days of data starting from {start_date_str}...")
-
-    for day_offset in range(num_days):
-        current_date = start_date + timedelta(days=day_offset)
-        for hour in range(24):
-            current_time = current_date.replace(hour=hour, minute=0, second=0, microsecond=0)
-
-            for device_name, props in devices.items():
-                # Simulate device activity
-                is_active = False
-                if random.random() < props["always_on_prob"]: # Chance to be always on (e.g., fridge)
-                    is_active = True
-                elif hour in props["active_hours"]: # Active during specific hours
-                    is_active = random.random() < 0.7 # 70% chance to be on during active hours
-                else:
-                    is_active = random.random() < 0.1 # Small chance to be on during inactive hours (standby)
-
-                power = 0.0
-                if is_active:
-                    power = max(0, props["base_power"] + random.uniform(-props["variance"], props["variance"]))
-                    # Add some hourly variation for devices like AC/Fridge
-                    if device_name in ["AC", "Fridge"]:
-                        power *= (0.8 + random.random() * 0.4) # Vary by +/- 20%
-
-                voltage = round(random.uniform(220.0, 245.0), 2)
-                current = round(power / voltage if voltage > 0 else 0.0, 2)
-                electricity = round(power / 1000.0, 3) # Convert Watts to kWh
-
-                record = {
-                    "success": True,
-                    "result": {
-                        "device_name": device_name,
-                        "power": round(power, 2),
-                        "voltage": voltage,
-                        "current": current,
-                        "electricity": electricity,
-                        "switch": is_active,
-                        "update_time": current_time.isoformat(timespec='seconds') + 'Z'
-                    },
-                    "t": int(current_time.timestamp() * 1000) # Unix timestamp in milliseconds
-                }
-                all_records.append(record)
-
-    with open(output_filename, 'w') as f:
-        json.dump(all_records, f, indent=2)
-
-    print(f"Generated {len(all_records)} records and saved to {output_filename}")
-
-# --- How to use the function ---
-if __name__ == "__main__":
-    # Generate 21 days of data starting from July 1, 2024
-    generate_energy_data(start_date_str="2024-07-01", num_days=21, output_filename="sample-energy-data-21-days.json")
+    stem, extension = os.path.splitext(output_filename)
+    fmt = fmt or FORMATS.get(extension.lower(), "json")
+    started = time.perf_counter()
+    print(f"Generating {num_days} days of data for {num_households} household(s) of {num_devices} devices "
+          f"starting from {start_date_str}...")
+
+    paths, total = [], 0
+    for household in range(num_households):
+        frame = generate_readings(start_date_str, num_days, num_devices, interval_minutes, seed, household)
+        path = output_filename if num_households == 1 else f"{stem}-h{household + 1}{extension}"
+        write_readings(frame, path, fmt)
+        paths.append(path)
+        total += len(frame)
 
-    # You can generate a smaller file for quick testing too
-    # generate_energy_data(start_date_str="2024-07-15", num_days=2, output_filename="sample-energy-data-2-days.json")
+    print(f"Generated {total:,} records in {time.perf_counter() - started:.1f} s and saved to {', '.join(paths)}")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--start", default="2024-07-01", help="first day, YYYY-MM-DD")
+    parser.add_argument("--days", type=int, default=21)
+    parser.add_argument("--devices", type=int, default=len(DEVICE_PROFILES), help="devices per household")
+    parser.add_argument("--households", type=int, default=1)
+    parser.add_argument("--interval-minutes", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), default=None,
+                        help="output format (default: from the file extension)")
+    parser.add_argument("-o", "--output", default="sample-energy-data-21-days.json")
+    args = parser.parse_args()
+    generate_energy_data(args.start, args.days, args.output, args.devices, args.households,
+                         args.interval_minutes, args.seed, args.format)
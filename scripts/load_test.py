@@ -0,0 +1,177 @@
+"""Replay the chat assistant's API fan-out against the backend and report latency percentiles.
+
+Each simulated chat turn issues the calls lib/ai-tools.ts makes, all in parallel:
+/peak, /devices, /predict, /device/<name>, /suggestions and /weather. Several chat
+clients run turns back to back while, optionally, another client keeps posting a large
+upload to a separate tenant. The script reports p50/p99 per route and per turn.
+
+With --pattern summary each turn is instead a single /api/summary call for the same data.
+
+By default it starts the backend itself, once with the threaded Flask server and once
+in ASGI mode under uvicorn, on free local ports. Use --url to test a running server.
+
+Usage:
+    python scripts/load_test.py                                # both modes, with uploads
+    python scripts/load_test.py --clients 16 --seconds 20 --upload-records 0
+    python scripts/load_test.py --url http://localhost:5000
+    python scripts/load_test.py --modes asgi --pattern fanout summary
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(SCRIPTS_DIR, "..")
+SAMPLE_FILE = os.path.join(REPO_DIR, "sample-energy-data-21-days.json")
+DEVICES = ["AC", "Fridge", "Television", "Light", "Fan", "Washing%20Machine"]
+CITIES = ["Chennai", "Delhi", "Mumbai", "Bangalore"]
+UPLOAD_TENANT = "loadtest-bulk"
+
+SERVERS = {
+    "flask": [sys.executable, "-c", "import sys, backend_app; backend_app.app.run(port=int(sys.argv[1]), threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "backend_app:asgi_app", "--log-level", "warning", "--port"],
+}
+
+
+def fan_out(rng: random.Random, pattern: str = "fanout") -> list[tuple[str, str]]:
+    """The (route label, path) pairs one chat turn requests."""
+    if pattern == "summary":
+        return [("/summary", "/api/summary?fields=peak,devices,predict,suggestions,device,weather"
+                             f"&device={rng.choice(DEVICES)}&city={rng.choice(CITIES)}")]
+    return [
+        ("/peak", "/api/peak"),
+        ("/devices", "/api/devices"),
+        ("/predict", "/api/predict"),
+        ("/device/<name>", f"/api/device/{rng.choice(DEVICES)}"),
+        ("/suggestions", "/api/suggestions"),
+        ("/weather", f"/api/weather?city={rng.choice(CITIES)}"),
+    ]
+
+
+def _request(url: str, body: bytes | None = None) -> float:
+    started = time.perf_counter()
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    process = subprocess.Popen(SERVERS[mode] + [str(port)], cwd=REPO_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            _request(f"{url}/api/health")
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def run_load(url: str, clients: int, seconds: float, upload_body: bytes | None, pattern: str = "fanout") -> dict:
+    with open(SAMPLE_FILE, "rb") as f:
+        _request(f"{url}/api/upload", f.read())
+
+    stop = threading.Event()
+    route_latencies = {label: [] for label, _ in fan_out(random.Random(0), pattern)}
+    turn_latencies = []
+    uploads = []
+
+    def chat_client(seed: int):
+        rng = random.Random(seed)
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            while not stop.is_set():
+                calls = fan_out(rng, pattern)
+                started = time.perf_counter()
+                results = list(pool.map(lambda call: (call[0], _request(url + call[1])), calls))
+                turn_latencies.append(time.perf_counter() - started)
+                for label, latency in results:
+                    route_latencies[label].append(latency)
+
+    def uploader():
+        while not stop.is_set():
+            uploads.append(_request(f"{url}/api/upload?tenant={UPLOAD_TENANT}", upload_body))
+
+    threads = [threading.Thread(target=chat_client, args=(seed,)) for seed in range(clients)]
+    if upload_body:
+        threads.append(threading.Thread(target=uploader))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    def percentiles(values):
+        values = np.array(values) * 1000
+        return {"n": len(values), "p50": float(np.percentile(values, 50)), "p99": float(np.percentile(values, 99))}
+
+    return {
+        "routes": {label: percentiles(values) for label, values in route_latencies.items()},
+        "turn": percentiles(turn_latencies),
+        "turns_per_sec": len(turn_latencies) / seconds,
+        "uploads": len(uploads),
+        "upload_s": float(np.mean(uploads)) if uploads else None,
+    }
+
+
+def report(mode: str, result: dict):
+    uploads = (f", {result['uploads']} uploads of {result['upload_s']:.1f} s each" if result["uploads"] else "")
+    print(f"\n{mode}: {result['turns_per_sec']:.1f} chat turns/s{uploads}")
+    print(f"{'route':>16} {'calls':>7} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for label, stats in list(result["routes"].items()) + [("whole turn", result["turn"])]:
+        print(f"{label:>16} {stats['n']:>7} {stats['p50']:>9.1f} {stats['p99']:>9.1f}")
+
+
+def run(url: str | None, modes: list[str], patterns: list[str], clients: int, seconds: float, upload_records: int):
+    upload_body = None
+    if upload_records:
+        sys.path.insert(0, SCRIPTS_DIR)
+        from bench_ingest import synthetic_records
+        upload_body = json.dumps(synthetic_records(upload_records)).encode()
+    print(f"{clients} chat clients for {seconds:g} s, "
+          f"{f'{upload_records:,}-record uploads in the background' if upload_records else 'no uploads'}")
+
+    if url:
+        for pattern in patterns:
+            report(f"{url} {pattern}", run_load(url, clients, seconds, upload_body, pattern))
+        return
+    for mode in modes:
+        process, server_url = start_server(mode)
+        try:
+            for pattern in patterns:
+                report(f"{mode} {pattern}", run_load(server_url, clients, seconds, upload_body, pattern))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="test a running server instead of starting one")
+    parser.add_argument("--modes", nargs="+", choices=sorted(SERVERS), default=["flask", "asgi"])
+    parser.add_argument("--pattern", nargs="+", choices=["fanout", "summary"], default=["fanout"])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--upload-records", type=int, default=200_000)
+    args = parser.parse_args()
+    run(args.url, args.modes, args.pattern, args.clients, args.seconds, args.upload_records)
@@ -0,0 +1,129 @@
+"""Stress the backend with parallel uploads and reads and check every read sees one whole version.
+
+Writer threads keep re-uploading one of two datasets (the 21-day sample and its first half)
+while reader threads hit the analytics endpoints. Every response must equal the response
+computed single-threaded for one of the two datasets; a mix of the two means a reader saw
+half-published state. Exits non-zero on any inconsistent or failed response.
+
+Usage:
+    python scripts/stress_concurrency.py                    # 1, 4 and 16 reader threads
+    python scripts/stress_concurrency.py --threads 8 --seconds 10 --writers 2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+with contextlib.redirect_stdout(io.StringIO()):
+    import backend_app  # noqa: E402
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sample-energy-data-21-days.json")
+READ_PATHS = ["/api/devices", "/api/peak", "/api/predict", "/api/predict/devices", "/api/suggestions",
+              "/api/device/AC", "/api/device/Fridge", "/api/health"]
+# Fields that legitimately differ between two uploads of the same data
+VOLATILE_FIELDS = {"data_version", "last_ingest_time"}
+
+
+def _canonical(path: str, body: dict) -> str:
+    if path == "/api/health":
+        body = {key: value for key, value in body.items() if key not in VOLATILE_FIELDS}
+    return json.dumps(body, sort_keys=True)
+
+
+def expected_responses(datasets: list[list[dict]]) -> dict[str, set[str]]:
+    """The response each read path gives for each dataset, computed with no concurrency."""
+    client = backend_app.app.test_client()
+    expected = {path: set() for path in READ_PATHS}
+    for records in datasets:
+        client.post("/api/upload", json=records)
+        for path in READ_PATHS:
+            expected[path].add(_canonical(path, client.get(path).get_json()))
+    return expected
+
+
+def run_once(num_readers: int, num_writers: int, seconds: float, datasets: list, expected: dict) -> dict:
+    stop = threading.Event()
+    latencies = [[] for _ in range(num_readers)]
+    uploads = [0] * num_writers
+    failures = []
+
+    def reader(slot: int):
+        client = backend_app.app.test_client()
+        rng = random.Random(slot)
+        while not stop.is_set():
+            path = rng.choice(READ_PATHS)
+            started = time.perf_counter()
+            response = client.get(path)
+            latencies[slot].append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures.append(f"{path}: HTTP {response.status_code}")
+            elif _canonical(path, response.get_json()) not in expected[path]:
+                failures.append(f"{path}: response matches neither dataset")
+
+    def writer(slot: int):
+        client = backend_app.app.test_client()
+        while not stop.is_set():
+            response = client.post("/api/upload", json=datasets[uploads[slot] % len(datasets)])
+            if response.status_code != 200:
+                failures.append(f"upload: HTTP {response.status_code}")
+            uploads[slot] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(num_readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(num_writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    all_latencies = np.concatenate([np.array(slot) for slot in latencies])
+    return {
+        "reads": len(all_latencies),
+        "reads_per_sec": len(all_latencies) / seconds,
+        "uploads": sum(uploads),
+        "p50_ms": float(np.percentile(all_latencies, 50) * 1000) if len(all_latencies) else 0.0,
+        "p99_ms": float(np.percentile(all_latencies, 99) * 1000) if len(all_latencies) else 0.0,
+        "failures": failures,
+    }
+
+
+def run(thread_counts: list[int], num_writers: int, seconds: float):
+    with open(SAMPLE_FILE) as f:
+        full = json.load(f)
+    datasets = [full, full[: len(full) // 2]]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = expected_responses(datasets)
+        print(f"{'readers':>8} {'writers':>8} {'reads':>8} {'reads/s':>9} {'uploads':>8} "
+              f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'inconsistent':>13}", file=sys.stderr)
+        failed = False
+        for num_readers in thread_counts:
+            result = run_once(num_readers, num_writers, seconds, datasets, expected)
+            print(f"{num_readers:>8} {num_writers:>8} {result['reads']:>8,} {result['reads_per_sec']:>9.1f} "
+                  f"{result['uploads']:>8} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                  f"{len(result['failures']):>13}", file=sys.stderr)
+            for failure in result["failures"][:5]:
+                print(f"  {failure}", file=sys.stderr)
+            failed |= bool(result["failures"])
+
+    if failed:
+        sys.exit(1)
+    print("Every read matched one complete dataset version.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--writers", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    run(args.threads, args.writers, args.seconds)